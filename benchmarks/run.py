@@ -0,0 +1,316 @@
+"""
+Benchmarks for the hot paths of cbp_client.
+
+Micro benchmarks time single functions on in-memory data. Macro benchmarks
+run full backfills and pagination walks against a local MockExchange.
+Deliberate rate limit sleeps inside History and handle_pagination are
+patched out so only client overhead is measured.
+
+Each result records the median and p95 time per call, throughput in items
+per second and peak traced memory. Results are saved per commit to
+benchmarks/results/<commit>.json and can be compared with an earlier run.
+
+Example
+-------
+$ python benchmarks/run.py --save
+$ python benchmarks/run.py --compare 1a2b3c4 --threshold 0.1
+$ python benchmarks/run.py --compare 1a2b3c4 --threshold 0.25 --report-only
+"""
+
+import argparse
+from array import array
+import functools
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cbp_client.api import API  # noqa: E402
+from cbp_client.api_public import PublicAPI  # noqa: E402
+from cbp_client.auth import Auth  # noqa: E402
+from cbp_client.history import History  # noqa: E402
+from cbp_client.indicators import CandleColumns  # noqa: E402
+from cbp_client.mock_server import MockData, MockExchange  # noqa: E402
+from cbp_client.pagination import handle_pagination  # noqa: E402
+from cbp_client.paper import Backtest, PaperTradingAPI  # noqa: E402
+from cbp_client.parallel import ParallelBackfill  # noqa: E402
+from cbp_client.price_board import PriceBoard  # noqa: E402
+from cbp_client.product import Product, is_fully_tradeable, is_live  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+CREDENTIALS = {'api_key': 'key', 'secret': 'c2VjcmV0', 'passphrase': 'pass'}
+BENCHMARKS = {}
+
+
+def benchmark(name, kind, items=1, repeat=5):
+    """Register fn(setup_result) to be timed. items is units per call."""
+    def decorator(fn):
+        BENCHMARKS[name] = (kind, fn, items, repeat)
+        return fn
+    return decorator
+
+
+def no_sleep():
+    return mock.patch('time.sleep', lambda seconds: None)
+
+
+# ------------------------------------------------------------------ micro
+DATA = MockData(order_count=2_000)
+CANDLE_ROWS = DATA.candles('BTC-USD', datetime(2020, 1, 1),
+                           datetime(2020, 1, 13, 11), 3_600)
+ORDER_PAGES = [DATA.orders[i:i + 100] for i in range(0, len(DATA.orders), 100)]
+
+
+@benchmark('history_to_candle', 'micro', items=len(CANDLE_ROWS), repeat=50)
+def bench_to_candle():
+    for row in CANDLE_ROWS:
+        History._to_candle(row)
+
+
+@benchmark('json_decode_candles', 'micro', items=len(CANDLE_ROWS), repeat=50)
+def bench_json_candles(payload=json.dumps(CANDLE_ROWS).encode()):
+    json.loads(payload)
+
+
+@benchmark('json_decode_orders', 'micro', items=100, repeat=50)
+def bench_json_orders(payload=json.dumps(ORDER_PAGES[0]).encode()):
+    json.loads(payload)
+
+
+class _Page:
+    def __init__(self, rows, cursor):
+        self._rows = rows
+        self.headers = {'cb-after': cursor}
+
+    def json(self):
+        return self._rows
+
+
+@benchmark('handle_pagination', 'micro', items=len(DATA.orders), repeat=20)
+def bench_handle_pagination(auth=Auth(**CREDENTIALS)):
+    pages = iter(ORDER_PAGES[::-1] + [[]])
+
+    def get_method(url, params, auth=None):
+        return _Page(next(pages), 'cursor')
+
+    with no_sleep():
+        for _ in handle_pagination('2000-01-01', 'created_at', 'url', {},
+                                   auth, get_method):
+            pass
+
+
+@benchmark('auth_sign', 'micro', items=1_000, repeat=10)
+def bench_auth_sign(auth=Auth(**CREDENTIALS)):
+    request = requests.Request(
+        'POST', 'https://api.exchange.coinbase.com/orders',
+        data=json.dumps({'side': 'buy', 'funds': '10'})
+    ).prepare()
+    for _ in range(1_000):
+        auth(request)
+
+
+@benchmark('products_filter', 'micro', items=100, repeat=20)
+def bench_products_filter():
+    api = PublicAPI.__new__(PublicAPI)
+    api._product_list = [
+        Product(**p, live=is_live(p), fully_tradeable=is_fully_tradeable(p))
+        for p in DATA.products * 20
+    ]
+    for _ in range(100):
+        api.products(quote_currency='usd', fully_tradeable=True)
+
+
+MINUTE_BARS = 525_600
+
+
+@benchmark('paper_backtest_year_of_minutes', 'micro', items=MINUTE_BARS, repeat=3)
+def bench_paper_backtest():
+    columns = CandleColumns(
+        array('d', range(0, MINUTE_BARS * 60, 60)),
+        *(array('d', [100.0]) * MINUTE_BARS for _ in range(5))
+    )
+    paper = PaperTradingAPI({'USD': 1_000_000})
+
+    def on_bar(product_id, i):
+        if i % 1_440 == 0:
+            paper.market_buy(10, product_id, validate=False)
+
+    Backtest(paper, {'BTC-USD': columns}).run(on_bar)
+
+
+BOARD_PATH = Path(tempfile.gettempdir()) / 'cbp_client_benchmark_board'
+
+
+@functools.lru_cache(maxsize=None)
+def board_reader():
+    """Created on first use, so importing this module writes no files"""
+    board = PriceBoard.create(BOARD_PATH, ['BTC-USD'], max_age=float('inf'))
+    board.publish('BTC-USD', price='36401.12000000')
+    return PriceBoard.open(BOARD_PATH, max_age=float('inf'))
+
+
+@benchmark('price_board_price', 'micro', items=10_000, repeat=10)
+def bench_price_board():
+    reader = board_reader()
+    for _ in range(10_000):
+        reader.price('BTC-USD')
+
+
+# ------------------------------------------------------------------ macro
+EXCHANGE = None
+
+
+@benchmark('backfill_hourly_year', 'macro', items=8_760, repeat=3)
+def bench_backfill():
+    api = API(sandbox_mode=False, base_url=EXCHANGE.url)
+    with no_sleep():
+        for _ in History(product_id='BTC-USD', start='2020-01-01',
+                         end='2020-12-31T23:00:00', interval='HOURLY', api=api)():
+            pass
+
+
+@benchmark('parallel_backfill_hourly_year_4_products', 'macro', items=4 * 8_760,
+           repeat=3)
+def bench_parallel_backfill():
+    api = API(sandbox_mode=False, base_url=EXCHANGE.url)
+    ParallelBackfill(api, threads=8).run(
+        ['BTC-USD', 'ETH-USD', 'LTC-USD', 'ETH-BTC'], start='2020-01-01',
+        end='2020-12-31T23:00:00', interval='HOURLY')
+
+
+@benchmark('pagination_walk_orders', 'macro', items=2_000, repeat=3)
+def bench_pagination_walk(auth=Auth(**CREDENTIALS)):
+    api = API(sandbox_mode=False, base_url=EXCHANGE.url)
+    with no_sleep():
+        for _ in api.get_paginated_endpoint('orders', start_date='2000-01-01',
+                                            auth=auth, params={'status': 'all'}):
+            pass
+
+
+@benchmark('pagination_walk_orders_streaming', 'macro', items=2_000, repeat=3)
+def bench_pagination_walk_streaming(auth=Auth(**CREDENTIALS)):
+    api = API(sandbox_mode=False, base_url=EXCHANGE.url, streaming=True)
+    with no_sleep():
+        for _ in api.get_paginated_endpoint('orders', start_date='2000-01-01',
+                                            auth=auth, params={'status': 'all'}):
+            pass
+
+
+def first_order(streaming, auth=Auth(**CREDENTIALS)):
+    api = API(sandbox_mode=False, base_url=EXCHANGE.url, streaming=streaming)
+    rows = api.get_paginated_endpoint('orders', start_date='2000-01-01', auth=auth,
+                                      params={'status': 'all', 'limit': 1_000})
+    next(rows)
+    rows.close()
+
+
+@benchmark('orders_time_to_first_row', 'macro', repeat=20)
+def bench_time_to_first_row():
+    first_order(streaming=False)
+
+
+@benchmark('orders_time_to_first_row_streaming', 'macro', repeat=20)
+def bench_time_to_first_row_streaming():
+    first_order(streaming=True)
+
+
+# ------------------------------------------------------------------ runner
+def measure(fn, items, repeat):
+    fn()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        'median_s': median,
+        'p95_s': sorted(timings)[max(0, int(len(timings) * 0.95) - 1)],
+        'items_per_s': items / median if median else None,
+        'peak_memory_bytes': peak,
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline, threshold):
+    """Returns names of benchmarks slower or hungrier than threshold allows"""
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for metric in ('median_s', 'peak_memory_bytes'):
+            if old[metric] and result[metric] > old[metric] * (1 + threshold):
+                change = result[metric] / old[metric] - 1
+                regressions.append(f'{name}.{metric} +{change:.0%}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run cbp_client benchmarks.')
+    parser.add_argument('--kind', choices=['micro', 'macro', 'all'], default='all')
+    parser.add_argument('--filter', default='', help='Run names containing this.')
+    parser.add_argument('--save', action='store_true',
+                        help='Store results under benchmarks/results/<commit>.json')
+    parser.add_argument('--compare', help='Commit whose saved results to compare.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Allowed slowdown before failing. Default=0.1')
+    parser.add_argument('--report-only', action='store_true',
+                        help='Print regressions without failing.')
+    args = parser.parse_args(argv)
+
+    global EXCHANGE
+    results = {}
+    with MockExchange(order_count=2_000) as EXCHANGE:
+        for name, (kind, fn, items, repeat) in BENCHMARKS.items():
+            if args.kind not in ('all', kind) or args.filter not in name:
+                continue
+            results[name] = measure(fn, items, repeat)
+            r = results[name]
+            print(f'{name:<28} {r["median_s"] * 1e3:10.3f} ms '
+                  f'{r["items_per_s"]:14,.0f} items/s '
+                  f'{r["peak_memory_bytes"] / 1024:10,.0f} KiB')
+
+    if args.save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f'{current_commit()}.json'
+        path.write_text(json.dumps(results, indent=2))
+        print(f'Saved {path}')
+
+    if args.compare:
+        baseline = json.loads((RESULTS_DIR / f'{args.compare}.json').read_text())
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        return 1 if regressions and not args.report_only else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,2 +1,13 @@
-from cbp_client.api_public import PublicAPI
-from cbp_client.api_authenticated import AuthAPI
\ No newline at end of file
+'''Lazily exposes the public clients so light imports stay fast'''
+
+__all__ = ['PublicAPI', 'AuthAPI']
+
+
+def __getattr__(name):
+    if name == 'PublicAPI':
+        from cbp_client.api_public import PublicAPI
+        return PublicAPI
+    if name == 'AuthAPI':
+        from cbp_client.api_authenticated import AuthAPI
+        return AuthAPI
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,3 @@
+from cbp_client.cli import main
+
+raise SystemExit(main())
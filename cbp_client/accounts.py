@@ -0,0 +1,208 @@
+'''Indexed registry of the accounts of an authenticated profile'''
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Iterable, List
+
+
+Account = namedtuple('Account', ['id',
+                                 'currency',
+                                 'balance',
+                                 'available',
+                                 'hold',
+                                 'profile_id',
+                                 'trading_enabled'])
+
+_Snapshot = namedtuple('_Snapshot', ['accounts', 'by_currency', 'by_id'])
+
+BALANCE_FIELDS = ('balance', 'available', 'hold')
+
+
+def _build_snapshot(accounts) -> _Snapshot:
+    accounts = tuple(accounts)
+    by_currency = {}
+    for account in accounts:
+        by_currency.setdefault(account.currency.upper(), account)
+    return _Snapshot(
+        accounts=accounts,
+        by_currency=by_currency,
+        by_id={account.id: account for account in accounts}
+    )
+
+
+class AccountRegistry:
+    """
+    Accounts indexed by currency and account id.
+
+    Lookups are dictionary reads on an immutable snapshot, so they are O(1)
+    and safe from any thread. Updates build a new snapshot and swap it in.
+    Subscribers are called with (old, new) whenever an account's balance,
+    available amount or hold changes.
+
+    Example
+    -------
+    >>> registry = AccountRegistry()
+    >>> registry.replace(accounts)
+    >>> registry.by_currency('btc').balance
+    '0.5000000000000000'
+    """
+
+    def __init__(self, accounts: Iterable[Account] = ()):
+        self._snapshot = _build_snapshot(accounts)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def all(self) -> tuple:
+        return self._snapshot.accounts
+
+    def by_currency(self, currency: str) -> Account:
+        return self._snapshot.by_currency.get(currency.upper())
+
+    def by_id(self, account_id: str) -> Account:
+        return self._snapshot.by_id.get(account_id)
+
+    def subscribe(self, callback: Callable[[Account, Account], None]):
+        """Register callback(old, new). Returns a function that unsubscribes."""
+        with self._lock:
+            self._listeners = [*self._listeners, callback]
+
+        def unsubscribe():
+            with self._lock:
+                self._listeners = [c for c in self._listeners if c is not callback]
+
+        return unsubscribe
+
+    def replace(self, accounts: Iterable[Account]) -> List[Account]:
+        """Swap in a full account list. Returns the accounts that changed."""
+        with self._lock:
+            old = self._snapshot
+            self._snapshot = _build_snapshot(accounts)
+            changes = self._changes(old, self._snapshot.accounts)
+        self._notify(changes)
+        return [new for _, new in changes]
+
+    def update(self, account: Account) -> bool:
+        """Insert or replace a single account. Returns True if it changed."""
+        with self._lock:
+            old = self._snapshot
+            if account.id in old.by_id:
+                accounts = [account if a.id == account.id else a
+                            for a in old.accounts]
+            else:
+                accounts = [*old.accounts, account]
+            self._snapshot = _build_snapshot(accounts)
+            changes = self._changes(old, [account])
+        self._notify(changes)
+        return bool(changes)
+
+    @staticmethod
+    def _changes(old: _Snapshot, accounts):
+        changes = []
+        for new in accounts:
+            previous = old.by_id.get(new.id)
+            if previous is None or any(
+                getattr(previous, f) != getattr(new, f) for f in BALANCE_FIELDS
+            ):
+                changes.append((previous, new))
+        return changes
+
+    def _notify(self, changes):
+        listeners = self._listeners
+        for old, new in changes:
+            for callback in listeners:
+                callback(old, new)
+
+    @staticmethod
+    def currencies_affected(message: dict) -> set:
+        """
+        Currencies whose balances a user channel feed message can move.
+
+        Orders place holds when received, release them when done and move
+        balances on every match, on both sides of the product.
+        """
+        if message.get('type') not in ('received', 'open', 'done', 'match',
+                                       'change', 'activate'):
+            return set()
+        product_id = message.get('product_id')
+        if not product_id or '-' not in product_id:
+            return set()
+        return set(product_id.upper().split('-'))
+
+
+class AccountRefresher:
+    """
+    Refreshes the accounts feed messages affect, off the feed thread.
+
+    Currencies are queued and refreshed by one background thread. A currency
+    queued again before its refresh runs is coalesced, and each currency is
+    refreshed at most once per interval, so the handful of messages one
+    order produces costs about one request per currency instead of one per
+    message, and the feed never waits on REST calls.
+
+    Parameters
+    ----------
+    refresh : callable
+        refresh(currency), for example AuthAPI.refresh_account.
+    interval : float, Optional
+        Minimum seconds between refreshes of one currency. Default=1
+    """
+
+    def __init__(self, refresh: Callable[[str], object], interval: float = 1.0):
+        self.refresh = refresh
+        self.interval = interval
+        self.refreshes = 0
+        self._due = {}
+        self._last = {}
+        self._busy = False
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def handle(self, message: dict):
+        """Queue the currencies a feed message can move"""
+        for currency in AccountRegistry.currencies_affected(message):
+            self.request(currency)
+
+    def request(self, currency: str):
+        currency = currency.upper()
+        with self._condition:
+            if currency not in self._due:
+                last = self._last.get(currency)
+                now = time.monotonic()
+                self._due[currency] = now if last is None else max(now, last + self.interval)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cbp-accounts',
+                                                daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until nothing is queued or refreshing. False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._due and not self._busy,
+                                            timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+                while True:
+                    now = time.monotonic()
+                    ready = [c for c, due in self._due.items() if due <= now]
+                    if ready:
+                        break
+                    wait = min(self._due.values()) - now if self._due else None
+                    self._condition.wait(wait)
+                for currency in ready:
+                    del self._due[currency]
+                self._busy = True
+
+            for currency in ready:
+                try:
+                    self.refresh(currency)
+                    self.refreshes += 1
+                except Exception as e:
+                    logging.warning(f'Refreshing the {currency} account failed: {e}')
+                finally:
+                    self._last[currency] = time.monotonic()
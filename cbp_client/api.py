@@ -1,11 +1,24 @@
 """Base API class for making http requests"""
 
+import functools
 import json
 import re
 import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import requests
+from requests.adapters import HTTPAdapter
 from cbp_client.auth import Auth
 from cbp_client.pagination import handle_pagination
+from cbp_client.rate_limit import RateLimiter
+from cbp_client.cache import ResponseCache
+from cbp_client.single_flight import SingleFlight
+from cbp_client.cassette import Cassette
+from cbp_client.scheduler import Priority, RequestScheduler
+from cbp_client.deadline import Deadline, hedged
+from cbp_client.streaming import ACCEPT_ENCODING, StreamStats, iter_rows
 
 
 def _http_error_message(e, r):
@@ -19,10 +32,11 @@ def _http_error_message(e, r):
     """)
 
 
-def _http_post(url, params={}, data={}, auth=None):
+def _http_post(url, params={}, data={}, auth=None, session=None, timeout=None):
     data = json.dumps(data)
     try:
-        r = requests.post(url=url, auth=auth, params=params, data=data)
+        r = (session or requests).post(
+            url=url, auth=auth, params=params, data=data, timeout=timeout)
         r.raise_for_status()
     except requests.HTTPError as e:
         raise requests.HTTPError(_http_error_message(e, r))
@@ -34,9 +48,12 @@ def _http_post(url, params={}, data={}, auth=None):
         return r
 
 
-def _http_get(url, params={}, auth=None):
+def _http_get(url, params={}, auth=None, headers=None, session=None, timeout=None,
+              stream=False):
     try:
-        r = requests.get(url=url, auth=auth, params=params)
+        r = (session or requests).get(
+            url=url, auth=auth, params=params, headers=headers, timeout=timeout,
+            stream=stream)
         r.raise_for_status()
     except requests.ConnectionError as e:
         raise e
@@ -47,12 +64,120 @@ def _http_get(url, params={}, auth=None):
 
 
 class API:
+    """
+    Sends requests to the coinbase pro api.
+
+    An API instance can be shared by any number of threads. Connections come
+    from one thread safe urllib3 pool of up to pool_size connections, each
+    thread gets its own requests.Session mounted on that pool, and the
+    optional rate limiter and cache are locked internally.
+
+    With a Cassette, GET responses are recorded to or replayed from disk.
+    Replayed responses skip the rate limiter and the pauses between pages.
+
+    With a RequestScheduler, every request waits for admission in its
+    priority class: orders are TRADING, other calls INTERACTIVE, and
+    History, pagination and backfills BULK. The scheduler paces bulk jobs,
+    so their fixed pauses between requests are skipped.
+
+    Every request has a (connect, read) timeout. Pass a Deadline to bound a
+    whole multi-request operation, see cbp_client.deadline. With
+    hedge_after, a GET still unanswered after that many seconds is sent a
+    second time and the first response wins.
+
+    Responses are requested compressed. With streaming=True, pages of
+    paginated endpoints are parsed row by row as they download, see
+    cbp_client.streaming, and measured in stream_stats.
+    """
 
     LIVE_URL = 'https://api.exchange.coinbase.com'
     SANDBOX_URL = 'https://api-public.sandbox.exchange.coinbase.com'
+    POOL_SIZE = 32
+    TIMEOUT = (3.05, 30)
 
-    def __init__(self, sandbox_mode: bool):
+    def __init__(
+        self,
+        sandbox_mode: bool,
+        rate_limiter: RateLimiter = None,
+        cache: ResponseCache = None,
+        base_url: str = None,
+        pool_size: int = POOL_SIZE,
+        single_flight: SingleFlight = None,
+        cassette: Cassette = None,
+        scheduler: RequestScheduler = None,
+        timeout: tuple = TIMEOUT,
+        hedge_after: float = None,
+        streaming: bool = False
+    ):
         self.base_url = API.LIVE_URL if not sandbox_mode else self.SANDBOX_URL
+        if base_url is not None:
+            self.base_url = base_url.rstrip('/')
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.single_flight = single_flight
+        self.cassette = cassette
+        self.scheduler = scheduler
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.streaming = streaming
+        self.stream_stats = StreamStats()
+        self._pool_size = pool_size
+        self._hedge_pool = None
+        self._hedge_lock = threading.Lock()
+        self._adapter = HTTPAdapter(pool_connections=pool_size,
+                                    pool_maxsize=pool_size)
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """Session of the calling thread, sharing the api connection pool"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+        return session
+
+    @contextmanager
+    def _admit(self, priority, deadline=None):
+        if self.scheduler is None:
+            self._throttle()
+            yield
+            return
+        with self.scheduler.slot(priority, deadline):
+            self._throttle()
+            yield
+
+    def _throttle(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+    def pause(self, seconds: float, deadline: Deadline = None):
+        """Sleep between requests, unless the last one was replayed from disk
+        or a scheduler paces requests. Ends early if deadline is cancelled."""
+        if self.scheduler is not None:
+            return
+        if self.cassette is not None and self.cassette.last_played:
+            return
+        if deadline is not None:
+            deadline.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _timeout(self, deadline):
+        if deadline is None or self.timeout is None:
+            return self.timeout
+        return deadline.timeout(self.timeout)
+
+    @property
+    def hedge_pool(self) -> ThreadPoolExecutor:
+        if self._hedge_pool is None:
+            with self._hedge_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(self._pool_size)
+        return self._hedge_pool
 
     def _build_url(self, endpoint):
         """Constructs full url needed for querying api."""
@@ -60,24 +185,90 @@ class API:
         endpoint = re.sub(r'\/*$', '', endpoint)  # remove trailing slash
         return f'{self.base_url}/{endpoint}'
 
-    def get(self, endpoint, params={}, auth=None):
-        return _http_get(self._build_url(endpoint), params=params, auth=auth)
+    def get(self, endpoint, params={}, auth=None, use_cache=True,
+            priority=Priority.INTERACTIVE, deadline=None):
+        """GET endpoint, served from the response cache when one is set.
 
-    def post(self, endpoint, auth, params={}, data={}):
-        return _http_post(
-            url=self._build_url(endpoint),
-            params=params,
-            data=data,
-            auth=auth
-        )
+        Pass use_cache=False for reads that must always be fresh. With a
+        SingleFlight, identical concurrent calls share one request.
+        priority is the scheduler class of the request, deadline an
+        optional Deadline of the operation it belongs to.
+        """
+        url = self._build_url(endpoint)
+
+        def send(headers=None):
+            return self._get_url(url, params=params, auth=auth, headers=headers,
+                                 priority=priority, deadline=deadline)
+
+        def fetch():
+            if self.cache is None or not use_cache:
+                return send()
+            return self.cache.fetch(endpoint, params, auth, send)
+
+        if self.single_flight is None:
+            return fetch()
+
+        return self.single_flight.do(endpoint, params, auth, fetch,
+                                     scope=(self.base_url, use_cache))
+
+    def _get_url(self, url, params={}, auth=None, headers=None,
+                 priority=Priority.INTERACTIVE, deadline=None, stream=False):
+        def request():
+            if deadline is not None:
+                deadline.check()
+            return _http_get(url, params=params, auth=auth, headers=headers,
+                             session=self.session, timeout=self._timeout(deadline),
+                             stream=stream)
+
+        def hedge():
+            self._throttle()
+            return request()
+
+        def send():
+            if deadline is not None:
+                deadline.check()
+            # hedge only the http call, time spent queued is not latency
+            with self._admit(priority, deadline):
+                if self.hedge_after is None:
+                    return request()
+                return hedged(request, self.hedge_after, self.hedge_pool, deadline,
+                              hedge=hedge)
+
+        if self.cassette is None:
+            return send()
+        return self.cassette.get(url, params, auth, send)
+
+    def iter_rows(self, endpoint, params={}, auth=None,
+                  priority=Priority.INTERACTIVE, deadline=None):
+        """Yield the rows of a json array endpoint as they download.
+
+        Bypasses the response cache and SingleFlight, which need whole
+        responses. Counted in stream_stats.
+        """
+        r = self._get_url(self._build_url(endpoint), params=params, auth=auth,
+                          priority=priority, deadline=deadline, stream=True)
+        return iter_rows(r, self.stream_stats)
+
+    def post(self, endpoint, auth, params={}, data={}, priority=Priority.TRADING):
+        with self._admit(priority):
+            return _http_post(
+                url=self._build_url(endpoint),
+                params=params,
+                data=data,
+                auth=auth,
+                session=self.session,
+                timeout=self.timeout
+            )
 
     def get_paginated_endpoint(
         self,
         endpoint: str,
         start_date: str,
-        auth: Auth,
+        auth: Auth = None,
         date_field: str = 'created_at',
-        params: dict = {}
+        params: dict = {},
+        priority: Priority = Priority.BULK,
+        deadline: Deadline = None
     ):
         '''Get paginated endpoint. See documentation in handle_pagination
 
@@ -88,7 +279,13 @@ class API:
         start_date : str
         date_field : str
         params: dict
-        auth: Auth
+        auth: Auth, Optional
+            Omit for public endpoints.
+        priority: Priority, Optional
+            Scheduler class of the page requests. Default=Priority.BULK
+        deadline: Deadline, Optional
+            Bounds the whole walk. Pages fetched in time are yielded, then
+            DeadlineExceeded is raised.
         '''
         return handle_pagination(
             url=self._build_url(endpoint),
@@ -96,5 +293,9 @@ class API:
             date_field=date_field,
             params=params,
             auth=auth,
-            get_method=_http_get
+            get_method=functools.partial(self._get_url, priority=priority,
+                                         deadline=deadline, stream=self.streaming),
+            pause=functools.partial(self.pause, deadline=deadline),
+            rows=(functools.partial(iter_rows, stats=self.stream_stats)
+                  if self.streaming else None)
         )
@@ -1,63 +1,187 @@
+import threading
 import time
 from datetime import datetime, date
 from typing import Union, List
+from decimal import Decimal
 from types import GeneratorType
-from collections import namedtuple
-from cbp_client.helpers import load_credentials
 import logging
 from cbp_client.auth import Auth
+from cbp_client.api import API
+from cbp_client.deadline import Deadline, DeadlineExceeded
 from cbp_client.api_public import PublicAPI
-
-Account = namedtuple('Account', ['id',
-                                 'currency',
-                                 'balance',
-                                 'available',
-                                 'hold',
-                                 'profile_id',
-                                 'trading_enabled'])
+from cbp_client.accounts import Account, AccountRefresher, AccountRegistry
+from cbp_client.numeric import to_decimal
+from cbp_client.orders import OrderValidator
+from cbp_client.archive import end_of
+from cbp_client.helpers import load_credentials, parse_time
+from cbp_client.feed import Feed, OrderTracker
 
 
 class AuthAPI(PublicAPI):
+    """
+    Access account level endpoints and every PublicAPI method.
+
+    Thread safety
+    -------------
+    One instance can be shared by a pool of threads. Accounts are held as an
+    immutable tuple snapshot that refresh_accounts replaces in one step, so
+    readers never see a partially refreshed list. Concurrent refreshes are
+    serialized.
+
+    Accounts live in an AccountRegistry indexed by currency and id, so
+    accounts(currency) and balance(symbol) are dictionary lookups.
 
-    def __init__(self, credentials=None, sandbox_mode=False):
-        super().__init__(sandbox_mode)
+    When an Archive is passed, orders and account_history are read from
+    disk for date ranges it has already synced.
+    """
+
+    def __init__(
+        self,
+        credentials=None,
+        sandbox_mode=False,
+        rate_limiter=None,
+        cache=None,
+        base_url=None,
+        numeric=None,
+        archive=None,
+        single_flight=None,
+        cassette=None,
+        scheduler=None,
+        timeout=API.TIMEOUT,
+        hedge_after=None,
+        sync_clock=False,
+        streaming=False,
+        price_board=None
+    ):
+        super().__init__(
+            sandbox_mode,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            base_url=base_url,
+            numeric=numeric,
+            single_flight=single_flight,
+            cassette=cassette,
+            scheduler=scheduler,
+            timeout=timeout,
+            hedge_after=hedge_after,
+            sync_clock=sync_clock,
+            streaming=streaming,
+            price_board=price_board
+        )
 
         if credentials is None:
             credentials = load_credentials(sandbox_mode)
 
-        self.auth = Auth(**credentials)
-        self._accounts = []
+        self.auth = Auth(**credentials, clock=self.clock)
+        self.archive = archive
+        self.registry = AccountRegistry()
+        self.order_validator = OrderValidator(lambda: self._products,
+                                              reload=self.refresh_products)
+        self.order_tracker = OrderTracker()
+        self.account_refresher = AccountRefresher(self._refresh_if_held)
+        self._refresh_lock = threading.Lock()
         self.refresh_accounts()
         self._this_profile_id = self._accounts[0].profile_id
 
     def accounts(self, currency: str = None) -> Union[List[Account], Account]:
 
         if currency is None:
-            return self._accounts
+            return list(self.registry.all())
 
-        for account in self._accounts:
-            if account.currency.lower() == currency.lower():
-                return account
+        return self.registry.by_currency(currency)
+
+    @property
+    def _accounts(self) -> tuple:
+        return self.registry.all()
 
-    def balance(self, symbol: str) -> str:
+    def balance(self, symbol: str) -> Union[str, Decimal]:
         '''Returns balance for specific currency in coinbase pro'''
         return self.accounts(currency=symbol.lower()).balance
 
     def refresh_accounts(self):
-        self._accounts = [
-            Account(**act)
-            for act in self.api.get('accounts', auth=self.auth).json()
-        ]
+        with self._refresh_lock:
+            self.registry.replace(
+                self._to_account(act)
+                for act in self.api.get('accounts', auth=self.auth).json()
+            )
+
+    def refresh_account(self, currency: str) -> Account:
+        '''Refetch a single account through accounts/{id}'''
+        account_id = self.accounts(currency=currency).id
+        r = self.api.get(f'accounts/{account_id}', auth=self.auth)
+        account = self._to_account(r.json())
+        self.registry.update(account)
+        return account
+
+    def _to_account(self, account: dict) -> Account:
+        account = Account(**account)
+        if self.numeric == 'decimal':
+            account = account._replace(
+                balance=to_decimal(account.balance),
+                available=to_decimal(account.available),
+                hold=to_decimal(account.hold)
+            )
+        return account
+
+    def on_account_change(self, callback):
+        '''Call callback(old, new) when a balance, available or hold moves.
+
+        Returns a function that removes the callback.
+        '''
+        return self.registry.subscribe(callback)
+
+    def handle_feed_message(self, message: dict):
+        '''Queue a refresh of the accounts a user channel feed message can affect.
+
+        Pass this as the message handler of an authenticated feed to keep
+        balances current without polling refresh_accounts. Refreshes run on
+        account_refresher's thread, coalesced per currency, so they cost
+        about one request per currency per second of activity.
+        '''
+        self.account_refresher.handle(message)
+
+    def _refresh_if_held(self, currency: str):
+        if self.accounts(currency=currency) is not None:
+            self.refresh_account(currency)
+
+    def feed(self, product_ids: List[str], channels=('user',), handlers=(),
+             refresh_accounts: bool = False) -> Feed:
+        '''Authenticated websocket feed that keeps orders current.
+
+        Messages update order_tracker before reaching any extra handlers.
+        With refresh_accounts, they also queue refreshes of the affected
+        accounts, see handle_feed_message. Those spend private rate limit,
+        so they are off by default. Call start() on the returned Feed.
+
+        Example
+        -------
+        >>> feed = api.feed(['BTC-USD']).start()
+        >>> order = api.market_buy(funds=50, product_id='btc-usd').json()
+        >>> api.order_tracker.wait(order['id'], timeout=10).status
+        'done'
+        '''
+        return Feed(
+            auth=self.auth,
+            product_ids=product_ids,
+            channels=channels,
+            handlers=[self.order_tracker.handle,
+                      *([self.handle_feed_message] if refresh_accounts else []),
+                      *handlers],
+            sandbox_mode=self.api.base_url == self.api.SANDBOX_URL
+        )
 
     def orders(
         self,
         start_date: str,
         end_date: str = None,
         status: str = None,
-        settled: bool = None
+        settled: bool = None,
+        deadline: Deadline = None
     ):
         '''Get orders related to the authenticated account.
 
+        Orders are dated by done_at, or created_at while they are still open.
+
         Parameters
         ----------
         start_date: str
@@ -69,6 +193,10 @@ class AuthAPI(PublicAPI):
             with this status.
         settled: bool, optional
             If true, returns only orders where: order['settled']=True
+        deadline: Deadline, optional
+            Bounds the whole request. Orders fetched in time are yielded,
+            then DeadlineExceeded is raised. With settled=True it carries
+            them in its partial attribute instead.
         '''
         end_date = date.today().isoformat() if end_date is None else end_date
 
@@ -77,15 +205,15 @@ class AuthAPI(PublicAPI):
 
         def filter_orders_by_date(orders, start_date, end_date):
             for order in orders:
+                # open orders have no done_at yet, date them by creation
+                order_date = order.get('done_at') or order['created_at']
                 try:
-                    order_datetime_str = order['done_at'].split('.')[0].strip('Z')
-                    order_datetime = datetime.strptime(order_datetime_str, '%Y-%m-%dT%H:%M:%S')
-                    order_date_iso = order_datetime.date().isoformat()
+                    order_date_iso = parse_time(order_date).date().isoformat()
                 except ValueError as er:
                     logging.error(
                         'ERROR: Unable to parse date returned by coinbase api'
-                        f'\nUnexpected Order Date: {order["done_at"]}'
-                        f'\nExpected Patterns: %Y-%m-%dT%H:%M:%S.%fZ or %Y-%m-%dT%H:%M:%S'
+                        f'\nUnexpected Order Date: {order_date}'
+                        f'\nExpected Patterns: %Y-%m-%dT%H:%M:%S.%fZ or %Y-%m-%dT%H:%M:%SZ'
                     )
                     raise er
 
@@ -93,11 +221,20 @@ class AuthAPI(PublicAPI):
                     yield order
 
         def _get_orders(params):
+            if self.archive is not None and \
+                    self.archive.covers('orders', start_date, end_date):
+                orders = (o for o in self.archive.query(
+                    'orders', start_date, end_date, descending=True)
+                    if params['status'] in ('all', o['status']))
+                yield from filter_orders_by_date(orders, start_date, end_date)
+                return
+
             orders = self.api.get_paginated_endpoint(
                 endpoint='orders',
                 auth=self.auth,
                 start_date=start_date,
-                params=params
+                params=params,
+                deadline=deadline
             )
             yield from filter_orders_by_date(orders, start_date, end_date)
 
@@ -105,8 +242,15 @@ class AuthAPI(PublicAPI):
             orders = _get_orders({'status': 'all'})
 
         elif settled:
-            orders = _get_orders({'status': 'done'})
-            orders = [o for o in orders if o['settled']]
+            collected = []
+            try:
+                for order in _get_orders({'status': 'done'}):
+                    if order['settled']:
+                        collected.append(order)
+            except DeadlineExceeded as e:
+                e.partial = collected
+                raise
+            orders = collected
 
         elif status_specified:
             orders = _get_orders({'status': status})
@@ -117,20 +261,47 @@ class AuthAPI(PublicAPI):
         self,
         symbol: str,
         start_date: str,
-        end_date=None
+        end_date=None,
+        deadline: Deadline = None
     ) -> GeneratorType:
-        '''Get all activity related to a given asset'''
-        account_id = self.accounts(currency=symbol).id
-        endpoint = f'accounts/{account_id}/ledger'
-        end_date = datetime.now().isoformat() if end_date is None else end_date
+        '''Get all activity related to a given asset, newest first.
 
-        return self.api.get_paginated_endpoint(
-            endpoint=endpoint,
+        Parameters
+        ----------
+        symbol : str
+        start_date : str
+            ISO date or datetime of the oldest entry, inclusive.
+        end_date : str, Optional
+            ISO date or datetime of the newest entry, inclusive. A date
+            without a time includes that whole day. Default=now
+        deadline : Deadline, Optional
+            Bounds the whole walk, see cbp_client.deadline.
+        '''
+        end_date = datetime.utcnow().isoformat() if end_date is None else end_date
+        name = f'ledger-{symbol.upper()}'
+        if self.archive is not None and \
+                self.archive.covers(name, start_date, end_date):
+            return self.archive.query(name, start_date, end_date, descending=True)
+
+        account_id = self.accounts(currency=symbol).id
+        entries = self.api.get_paginated_endpoint(
+            endpoint=f'accounts/{account_id}/ledger',
             auth=self.auth,
-            start_date=start_date
+            start_date=start_date,
+            deadline=deadline
         )
+        start, end = parse_time(start_date), end_of(end_date)
+        return (entry for entry in entries
+                if start <= parse_time(entry['created_at']) <= end)
 
-    def market_buy(self, funds, product_id, delay=False):
+    def market_buy(
+        self,
+        funds,
+        product_id,
+        delay=False,
+        validate=True,
+        auto_round=False
+    ):
         '''Market buy as much crypto as specified funds allow
         Parameters
         ----------
@@ -140,7 +311,15 @@ class AuthAPI(PublicAPI):
             crypto. Fees will be taken out of the specified funds amount.
         product_id : str
         delay : bool, Optional
+        validate : bool, Optional
+            Check funds against the product's quote_increment, market funds
+            limits and trading status before sending. Raises OrderRejected
+            without making a request. Default=True
+        auto_round : bool, Optional
+            Round funds down to the quote_increment instead of rejecting.
         '''
+        if validate:
+            funds = self.order_validator.market_buy(product_id, funds, auto_round)
 
         order_payload = {
             'side': 'buy',
@@ -161,7 +340,14 @@ class AuthAPI(PublicAPI):
 
         return r
 
-    def market_sell(self, size, product_id, delay=False):
+    def market_sell(
+        self,
+        size,
+        product_id,
+        delay=False,
+        validate=True,
+        auto_round=False
+    ):
         '''Market sell specified quantity of crypto.
 
         Parameters
@@ -173,7 +359,15 @@ class AuthAPI(PublicAPI):
             current fees.
         product_id : str
         delay : bool, Optional
+        validate : bool, Optional
+            Check size against the product's base_increment, size limits and
+            trading status before sending. Raises OrderRejected without
+            making a request. Default=True
+        auto_round : bool, Optional
+            Round size down to the base_increment instead of rejecting.
         '''
+        if validate:
+            size = self.order_validator.market_sell(product_id, size, auto_round)
 
         order_payload = {
             'side': 'sell',
@@ -194,11 +388,12 @@ class AuthAPI(PublicAPI):
 
         return r
 
-    def payment_methods(self, name: str = None):
-        '''Get list of payment methods'''
+    def payment_methods(self, name: str = None, use_cache: bool = True):
+        '''Get list of payment methods. Served from the cache when enabled.'''
         payment_methods = self.api.get(
             endpoint='payment-methods',
-            auth=self.auth
+            auth=self.auth,
+            use_cache=use_cache
         ).json()
 
         if name is None:
@@ -1,12 +1,17 @@
 """Class for accessing public coinbase pro endpoints"""
 
 
-from datetime import datetime
+import threading
 from typing import List
 
 from cbp_client.product import Product, is_fully_tradeable, is_live
 from cbp_client.api import API
 from cbp_client.history import History, Interval
+from cbp_client.numeric import check_numeric_mode, to_decimal
+from cbp_client.helpers import parse_time
+from cbp_client.deadline import Deadline
+from cbp_client.clock import ExchangeClock
+from cbp_client.listing import ListingDates
 
 
 class PublicAPI(API):
@@ -23,6 +28,41 @@ class PublicAPI(API):
     ---------
     sandbox_mode : bool
         If true, use sandbox api, if false, use live api. Default = False
+    rate_limiter : RateLimiter, Optional
+        Throttles every request made by this client. Default = None
+    cache : ResponseCache, Optional
+        Serves slowly changing endpoints such as products, currencies and
+        24hr stats from a local cache. Default = None
+    base_url : str, Optional
+        Overrides the api url, for example to point at a MockExchange.
+    numeric : str, Optional
+        When 'decimal', prices, stats, candles and balances are returned as
+        Decimal instead of strings. Default = None
+    single_flight : SingleFlight, Optional
+        Lets identical concurrent requests, e.g. price('btc') from many
+        threads, share one http request. Default = None
+    scheduler : RequestScheduler, Optional
+        Admits requests by priority so orders and price checks go ahead of
+        backfills sharing the same rate budget. Default = None
+    timeout : tuple, Optional
+        (connect, read) timeout of every request in seconds.
+        Default = API.TIMEOUT
+    hedge_after : float, Optional
+        Send a second copy of a GET still unanswered after this many
+        seconds and use whichever answers first. Default = None
+    sync_clock : bool, Optional
+        Keep an ExchangeClock in clock. Requests are then signed in exchange
+        time and History ends at the exchange's current time. Default = False
+    streaming : bool, Optional
+        Parse pages of orders, ledger entries and trades row by row as they
+        download. Totals are kept in api.stream_stats. Default = False
+    price_board : PriceBoard, Optional
+        Serves price and twenty_four_hour_stats from a board that another
+        process publishes, falling back to the api for products missing
+        from it or gone stale. Default = None
+    cassette : Cassette, Optional
+        Records GET responses to a local file, or replays them so backtests
+        run offline without rate limit waits. Default = None
 
     Attributes
     ----------
@@ -37,17 +77,78 @@ class PublicAPI(API):
 
         Example:
         [{id: 'BTC', name: 'Bitcoin', status: 'online' ...}]
-    """
 
-    def __init__(self, sandbox_mode=False):
+        Products and currencies are fetched the first time they are used.
 
-        self.api = API(sandbox_mode)
-        self.History = History
-        self._products = list(self._decorated_products())
-        self.currencies = self.get('currencies').json()
+    Thread safety
+    -------------
+    One instance can be shared by a pool of threads. Products and
+    currencies are loaded once under a lock and never mutated afterwards,
+    requests share a thread safe connection pool (see API).
+    """
 
-    def get(self, endpoint):
-        return self.api.get(endpoint)
+    def __init__(
+        self,
+        sandbox_mode=False,
+        rate_limiter=None,
+        cache=None,
+        base_url=None,
+        numeric=None,
+        single_flight=None,
+        cassette=None,
+        scheduler=None,
+        timeout=API.TIMEOUT,
+        hedge_after=None,
+        sync_clock=False,
+        streaming=False,
+        price_board=None
+    ):
+
+        self.numeric = check_numeric_mode(numeric)
+        self.api = API(
+            sandbox_mode,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            base_url=base_url,
+            single_flight=single_flight,
+            cassette=cassette,
+            scheduler=scheduler,
+            timeout=timeout,
+            hedge_after=hedge_after,
+            streaming=streaming
+        )
+        self.clock = ExchangeClock(self.api) if sync_clock else None
+        self.price_board = price_board
+        self.History = History
+        self.listing_dates = ListingDates()
+        self._product_list = None
+        self._currencies = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def _products(self) -> List[Product]:
+        if self._product_list is None:
+            with self._load_lock:
+                if self._product_list is None:
+                    self._product_list = list(self._decorated_products())
+        return self._product_list
+
+    def refresh_products(self):
+        """Refetch products, e.g. to see newly listed or halted pairs"""
+        products = list(self._decorated_products(use_cache=False))
+        with self._load_lock:
+            self._product_list = products
+
+    @property
+    def currencies(self) -> list:
+        if self._currencies is None:
+            with self._load_lock:
+                if self._currencies is None:
+                    self._currencies = self.get('currencies').json()
+        return self._currencies
+
+    def get(self, endpoint, use_cache=True):
+        return self.api.get(endpoint, use_cache=use_cache)
 
     def twenty_four_hour_stats(self, product_id: str) -> dict:
         """
@@ -76,7 +177,14 @@ class PublicAPI(API):
         -------
         dict
         """
-        return self.get(f'products/{product_id}/stats').json()
+        stats = None
+        if self.price_board is not None:
+            stats = self.price_board.stats(product_id)
+        if stats is None:
+            stats = self.get(f'products/{product_id}/stats').json()
+        if self.numeric == 'decimal':
+            return {key: to_decimal(value) for key, value in stats.items()}
+        return stats
 
     def price(self, base_currency: str, quote_currency='USD') -> str:
         '''
@@ -99,14 +207,53 @@ class PublicAPI(API):
         '''
         base = base_currency.upper()
         quote = quote_currency.upper()
-        endpoint = f'products/{base}-{quote}/ticker'
-        price = self.get(endpoint).json()['price']
-        return price
+        price = None
+        if self.price_board is not None:
+            price = self.price_board.price(f'{base}-{quote}')
+        if price is None:
+            price = self.get(f'products/{base}-{quote}/ticker').json()['price']
+        return to_decimal(price) if self.numeric == 'decimal' else price
+
+    def trades(self, product_id: str, start_date: str, deadline: Deadline = None):
+        '''
+        Stream every public trade of a product since start_date, newest first.
+
+        Pages are followed with the same cb-after cursor walk as orders.
+        Feed the result to cbp_client.bars to build bars of any size.
+
+        Parameters
+        ----------
+        product_id : str
+        start_date : str
+            ISO date or datetime (UTC) of the oldest trade wanted.
+        deadline : Deadline, Optional
+            Bounds the whole walk, see cbp_client.deadline.
+
+        Example
+        -------
+        >>> trades = PublicAPI().trades('btc-usd', '2021-05-31T12:00:00')
+        >>> next(trades)
+        {'time': '2021-05-31T23:59:58.120Z', 'trade_id': 182937, 'price':
+        '36401.12000000', 'size': '0.01000000', 'side': 'buy'}
+        '''
+        start = parse_time(start_date)
+        trades = self.api.get_paginated_endpoint(
+            endpoint=f'products/{product_id.upper()}/trades',
+            start_date=start.isoformat(),
+            date_field='time',
+            deadline=deadline
+        )
+        for trade in trades:
+            if parse_time(trade['time']) < start:
+                return
+            if self.numeric == 'decimal':
+                trade = {**trade, 'price': to_decimal(trade['price']),
+                         'size': to_decimal(trade['size'])}
+            yield trade
 
     def exchange_time(self):
         """Returns the current exchange time as an ISO formatted string"""
-        time_str = self.get('time').json()['iso']
-        exchange_time = datetime.strptime(time_str, '%Y-%m-%dT%H:%M:%S.%fZ')
+        exchange_time = parse_time(self.get('time').json()['iso'])
 
         return exchange_time.isoformat(sep=' ')
 
@@ -115,7 +262,8 @@ class PublicAPI(API):
             product_id: str,
             start=None,
             end=None,
-            candle_interval: str = Interval.DAILY.name) -> List[History.Candle]:
+            candle_interval: str = Interval.DAILY.name,
+            deadline: Deadline = None) -> List[History.Candle]:
         """
         Get historical data for a specifc product / trading pair.
 
@@ -140,6 +288,9 @@ class PublicAPI(API):
             Length of each candle to be returned. To get daily data, set
             candle_interval='daily'. Possible values: minute, five_minute,
             fifteen_minute, hourly, six_hour, daily. Defaults to daily.
+        deadline : Deadline, Optional
+            Bounds the whole request. Candles fetched in time are yielded,
+            then DeadlineExceeded is raised.
 
         Returns
         -------
@@ -153,7 +304,11 @@ class PublicAPI(API):
             end=end,
             product_id=product_id.upper(),
             interval=candle_interval,
-            api=self.api
+            api=self.api,
+            numeric=self.numeric,
+            deadline=deadline,
+            clock=self.clock,
+            listing_dates=self.listing_dates
         )()
 
     def products(self, **keyword_args) -> List[Product]:
@@ -224,11 +379,11 @@ class PublicAPI(API):
                 for product in self._products
                 if _should_include(product, keyword_args)]
 
-    def _decorated_products(self):
+    def _decorated_products(self, use_cache=True):
         """Returns products with additional attributes.
         Adds full_tradeable and is_live attributes to each product.
         """
-        for product in self.get('products').json():
+        for product in self.get('products', use_cache=use_cache).json():
             yield Product(
                 **product,
                 live=is_live(product),
@@ -0,0 +1,231 @@
+'''Append only on disk archive of ledger entries and orders'''
+import bisect
+import json
+import mmap
+import os
+import threading
+from array import array
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Generator, Iterable
+
+from cbp_client.helpers import parse_time
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _micros(value) -> int:
+    if isinstance(value, str):
+        value = parse_time(value)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def end_of(end_date: str) -> datetime:
+    """Inclusive upper bound of end_date. Dates without a time cover the whole day."""
+    end = parse_time(end_date)
+    if len(end_date) == 10:
+        end += timedelta(days=1) - timedelta(microseconds=1)
+    return end
+
+
+class _Stream:
+    """
+    One time ordered record stream, e.g. the ledger of one account.
+
+    name.jsonl holds one json record per line, oldest first. name.idx is a
+    sparse index of (time, byte offset) int64 pairs for every INDEX_EVERY-th
+    record. name.json records the byte sizes written and the time range
+    known to be complete, so a crash mid append is rolled back on open.
+    """
+    INDEX_EVERY = 64
+
+    def __init__(self, directory: Path, name: str, time_field: str):
+        self.data_path = directory / f'{name}.jsonl'
+        self.index_path = directory / f'{name}.idx'
+        self.meta_path = directory / f'{name}.json'
+        self.time_field = time_field
+        self.meta = {'size': 0, 'count': 0, 'start': None, 'end': None,
+                     'last_time': None, 'last_ids': []}
+        if self.meta_path.exists():
+            self.meta = json.loads(self.meta_path.read_text())
+        self.index = array('q')
+        self._rollback()
+
+    def _rollback(self):
+        """Drop bytes written after the last committed append"""
+        index_entries = -(-self.meta['count'] // self.INDEX_EVERY)
+        for path, size in ((self.data_path, self.meta['size']),
+                           (self.index_path, index_entries * 16)):
+            if not path.exists():
+                path.touch()
+            if path.stat().st_size != size:
+                with path.open('r+b') as f:
+                    f.truncate(size)
+        self.index = array('q', self.index_path.read_bytes())
+
+    def append(self, records: Iterable[dict], start: str, end: str) -> int:
+        last_time = self.meta['last_time']
+        last_ids = set(self.meta['last_ids'])
+        rows = sorted(records, key=lambda r: _micros(r[self.time_field]))
+
+        offset, count = self.meta['size'], self.meta['count']
+        index = array('q')
+        with self.data_path.open('ab') as f:
+            for row in rows:
+                time = _micros(row[self.time_field])
+                if last_time is not None and (
+                    time < last_time or (time == last_time and row.get('id') in last_ids)
+                ):
+                    continue
+                if time != last_time:
+                    last_time, last_ids = time, set()
+                last_ids.add(row.get('id'))
+
+                if count % self.INDEX_EVERY == 0:
+                    index.extend((time, offset))
+                line = (json.dumps(row, separators=(',', ':')) + '\n').encode()
+                f.write(line)
+                offset += len(line)
+                count += 1
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self.index_path.open('ab') as f:
+            f.write(index.tobytes())
+        added = count - self.meta['count']
+        self.index.extend(index)
+
+        self.meta.update(
+            size=offset,
+            count=count,
+            start=self.meta['start'] or start,
+            end=max(filter(None, [self.meta['end'], end]), key=parse_time),
+            last_time=last_time,
+            last_ids=sorted(i for i in last_ids if i is not None),
+        )
+        tmp_path = self.meta_path.with_name(self.meta_path.name + '.tmp')
+        tmp_path.write_text(json.dumps(self.meta))
+        tmp_path.replace(self.meta_path)
+        return added
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        if self.meta['start'] is None:
+            return False
+        return (parse_time(self.meta['start']) <= start
+                and end <= parse_time(self.meta['end']))
+
+    def query(self, start: datetime, end: datetime, descending=False) -> Generator:
+        if self.meta['count'] == 0:
+            return
+        start, end = _micros(start), _micros(end)
+        times, offsets = self.index[0::2], self.index[1::2]
+        first = max(bisect.bisect_left(times, start) - 1, 0)
+        last = bisect.bisect_right(times, end)
+        blocks = range(first, last)
+
+        with self.data_path.open('rb') as f, \
+                mmap.mmap(f.fileno(), self.meta['size'], access=mmap.ACCESS_READ) as data:
+            for block in (reversed(blocks) if descending else blocks):
+                block_end = offsets[block + 1] if block + 1 < len(offsets) \
+                    else self.meta['size']
+                rows = [json.loads(line) for line in
+                        data[offsets[block]:block_end].splitlines()]
+                for row in (reversed(rows) if descending else rows):
+                    if start <= _micros(row[self.time_field]) <= end:
+                        yield row
+
+
+class Archive:
+    """
+    Compact local copy of synced ledger entries and orders.
+
+    Each stream is append only json lines with a sparse time index, read
+    through mmap. A range query binary searches the index and only decodes
+    the blocks that overlap the range, so a month of one account's ledger
+    costs the same whatever the size of the archive.
+
+    Pass an Archive to AuthAPI and account_history / orders are answered
+    from disk whenever the requested range has been synced.
+
+    Example
+    -------
+    >>> archive = Archive('data/archive')
+    >>> api = AuthAPI(creds, archive=archive)
+    >>> archive.sync_ledger(api, 'btc', start_date='2021-01-01')
+    >>> march = api.account_history('btc', '2021-03-01', '2021-03-31')
+
+    Parameters
+    ----------
+    directory : str
+        Created if it does not exist.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def stream(self, name: str, time_field: str = 'created_at') -> _Stream:
+        with self._lock:
+            if name not in self._streams:
+                self._streams[name] = _Stream(self.directory, name, time_field)
+            return self._streams[name]
+
+    def append(self, name: str, records: Iterable[dict], start: str, end: str) -> int:
+        """
+        Add records and mark start to end as completely archived.
+
+        The archived range starts at the start of the first append and
+        every append extends it to end, so appends must be contiguous.
+
+        Records may arrive in any order. Records older than the newest one
+        already archived are skipped, as are repeats of the newest one.
+
+        Returns
+        -------
+        int
+            Number of records written
+        """
+        stream = self.stream(name)
+        with self._lock:
+            return stream.append(records, start, end)
+
+    def covers(self, name: str, start_date: str, end_date: str) -> bool:
+        return self.stream(name).covers(parse_time(start_date), end_of(end_date))
+
+    def query(self, name: str, start_date: str, end_date: str,
+              descending: bool = False) -> Generator:
+        """Records with start_date <= time <= end_date, oldest first by default"""
+        return self.stream(name).query(parse_time(start_date), end_of(end_date),
+                                       descending)
+
+    def sync_ledger(self, api, symbol: str, start_date: str) -> int:
+        """Archive ledger entries of an AuthAPI account created since the last sync"""
+        account_id = api.accounts(currency=symbol).id
+        return self._sync(api, f'ledger-{symbol.upper()}',
+                          f'accounts/{account_id}/ledger', start_date, {})
+
+    def sync_orders(self, api, start_date: str) -> int:
+        """Archive orders of every status created since the last sync"""
+        return self._sync(api, 'orders', 'orders', start_date, {'status': 'all'})
+
+    def _sync(self, api, name, endpoint, start_date, params):
+        stream = self.stream(name)
+        if api.clock is not None:
+            synced_to = api.clock.utcnow()
+        else:
+            synced_to = parse_time(api.exchange_time().replace(' ', 'T'))
+        since = stream.meta['end'] or start_date
+
+        records = api.api.get_paginated_endpoint(
+            endpoint=endpoint,
+            auth=api.auth,
+            start_date=parse_time(since).isoformat(),
+            params=params
+        )
+        since = _micros(since)
+        # pages are newest first. Reversing keeps records sharing a timestamp
+        # in exchange order through the stable sort in append.
+        records = [r for r in records if _micros(r['created_at']) >= since][::-1]
+        return self.append(name, records, start_date, synced_to.isoformat())
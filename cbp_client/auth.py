@@ -4,30 +4,21 @@ from requests.auth import AuthBase
 
 class Auth(AuthBase):
 
-    def __init__(self, api_key, secret, passphrase):
+    def __init__(self, api_key, secret, passphrase, clock=None):
         self.api_key = api_key
         self.secret = secret
         self.passphrase = passphrase
+        self.clock = clock
 
-    def __call__(self, request):
-        timestamp = str(time.time())
-
-        message = (
-            timestamp
-            + request.method
-            + request.path_url
-            + (request.body or '')
-        )
+    def timestamp(self) -> str:
+        """Signing timestamp, in exchange time when a clock is set"""
+        return str(self.clock.time() if self.clock is not None else time.time())
 
-        hmac_key = base64.b64decode(self.secret)
-
-        signature = hmac.new(
-            hmac_key,
-            message.encode('utf-8'),
-            hashlib.sha256
-        )
+    def __call__(self, request):
+        timestamp = self.timestamp()
 
-        signature_b64 = base64.b64encode(signature.digest())
+        signature_b64 = self.sign(
+            timestamp, request.method, request.path_url, request.body or '')
 
         request.headers.update({
             'CB-ACCESS-SIGN': signature_b64,
@@ -37,4 +28,28 @@ class Auth(AuthBase):
             'Content-Type': 'application/json'
         })
 
-        return request
\ No newline at end of file
+        return request
+
+    def sign(self, timestamp: str, method: str, path: str, body: str = '') -> bytes:
+        """Base64 HMAC-SHA256 signature of a request, as the exchange expects"""
+        message = timestamp + method + path + body
+
+        hmac_key = base64.b64decode(self.secret)
+
+        signature = hmac.new(
+            hmac_key,
+            message.encode('utf-8'),
+            hashlib.sha256
+        )
+
+        return base64.b64encode(signature.digest())
+
+    def feed_fields(self) -> dict:
+        """Fields that authenticate a websocket feed subscribe message"""
+        timestamp = self.timestamp()
+        return {
+            'signature': self.sign(timestamp, 'GET', '/users/self/verify').decode(),
+            'key': self.api_key,
+            'passphrase': self.passphrase,
+            'timestamp': timestamp
+        }
@@ -0,0 +1,177 @@
+'''
+Build bars from a stream of trades in one pass.
+
+Time bars of any length (including sub-minute), volume bars and tick bars
+are built from the trades of PublicAPI.trades. Prices and sizes are
+Decimal, so volume and VWAP are exact.
+
+Trades from the api arrive newest first. Pass descending=True for such
+streams and bars come out newest first too, with open and close taken
+from the right ends of each bar. Volume and tick bars are then counted
+back from the newest trade.
+
+Example
+-------
+>>> trades = PublicAPI().trades('btc-usd', start_date='2021-05-31T12:00:00')
+>>> for bar in time_bars(trades, seconds=15, descending=True):
+...     print(bar.start, bar.close, bar.vwap)
+'''
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Generator, Iterable
+
+from cbp_client.helpers import parse_time
+from cbp_client.numeric import to_decimal
+
+EPOCH = datetime(1970, 1, 1)
+
+Bar = namedtuple('Bar', ['start', 'end', 'open', 'high', 'low', 'close',
+                         'volume', 'vwap', 'trades'])
+
+
+class BarBuilder:
+    """
+    Base class of bar builders. Subclasses decide when a bar is complete.
+
+    add(trade) returns the bar the trade completed, if any, and flush()
+    returns the final partial bar.
+    """
+
+    def __init__(self, descending: bool = False):
+        self.descending = descending
+        self._reset()
+
+    def _reset(self):
+        self._first = None
+        self._last = None
+        self._high = None
+        self._low = None
+        self._volume = Decimal(0)
+        self._notional = Decimal(0)
+        self._count = 0
+
+    def add(self, trade: dict) -> Bar:
+        price, size = to_decimal(trade['price']), to_decimal(trade['size'])
+        bar = None
+        if self._count and self._starts_new_bar(trade):
+            bar = self.flush()
+
+        if self._count == 0:
+            self._open(trade, price)
+        elif price > self._high:
+            self._high = price
+        elif price < self._low:
+            self._low = price
+        self._last = (trade['time'], price)
+        self._volume += size
+        self._notional += price * size
+        self._count += 1
+
+        if bar is None and self._is_complete():
+            bar = self.flush()
+        return bar
+
+    def flush(self) -> Bar:
+        if self._count == 0:
+            return None
+        oldest, newest = ((self._last, self._first) if self.descending
+                          else (self._first, self._last))
+        bar = Bar(
+            start=self._bar_start(oldest[0]),
+            end=newest[0],
+            open=oldest[1],
+            high=self._high,
+            low=self._low,
+            close=newest[1],
+            volume=self._volume,
+            vwap=self._notional / self._volume if self._volume else None,
+            trades=self._count
+        )
+        self._reset()
+        return bar
+
+    def build(self, trades: Iterable[dict]) -> Generator:
+        for trade in trades:
+            bar = self.add(trade)
+            if bar is not None:
+                yield bar
+        bar = self.flush()
+        if bar is not None:
+            yield bar
+
+    def _open(self, trade, price):
+        self._first = (trade['time'], price)
+        self._high = self._low = price
+
+    def _bar_start(self, time):
+        return time
+
+    def _starts_new_bar(self, trade) -> bool:
+        return False
+
+    def _is_complete(self) -> bool:
+        return False
+
+
+class TimeBars(BarBuilder):
+    """Bars covering fixed periods of seconds, aligned to the epoch"""
+
+    def __init__(self, seconds: float, descending: bool = False):
+        if seconds <= 0:
+            raise ValueError(f'Seconds must be positive. seconds:{seconds}')
+        self.seconds = seconds
+        self._bucket = None
+        super().__init__(descending)
+
+    def _bucket_of(self, time):
+        return int((parse_time(time) - EPOCH).total_seconds() // self.seconds)
+
+    def _starts_new_bar(self, trade):
+        return self._bucket_of(trade['time']) != self._bucket
+
+    def _open(self, trade, price):
+        super()._open(trade, price)
+        self._bucket = self._bucket_of(trade['time'])
+
+    def _bar_start(self, time):
+        start = EPOCH + timedelta(seconds=self._bucket * self.seconds)
+        return start.isoformat()
+
+
+class VolumeBars(BarBuilder):
+    """Bars closed by the trade that brings their volume to at least volume"""
+
+    def __init__(self, volume, descending: bool = False):
+        self.volume = to_decimal(volume)
+        if self.volume <= 0:
+            raise ValueError(f'Volume must be positive. volume:{volume}')
+        super().__init__(descending)
+
+    def _is_complete(self):
+        return self._volume >= self.volume
+
+
+class TickBars(BarBuilder):
+    """Bars of a fixed number of trades"""
+
+    def __init__(self, trades: int, descending: bool = False):
+        if trades < 1:
+            raise ValueError(f'Trades must be at least 1. trades:{trades}')
+        self.trades = trades
+        super().__init__(descending)
+
+    def _is_complete(self):
+        return self._count >= self.trades
+
+
+def time_bars(trades: Iterable[dict], seconds: float, descending: bool = False):
+    return TimeBars(seconds, descending).build(trades)
+
+
+def volume_bars(trades: Iterable[dict], volume, descending: bool = False):
+    return VolumeBars(volume, descending).build(trades)
+
+
+def tick_bars(trades: Iterable[dict], count: int, descending: bool = False):
+    return TickBars(count, descending).build(trades)
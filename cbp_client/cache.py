@@ -0,0 +1,377 @@
+'''Response cache for slowly changing GET endpoints'''
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+import requests
+
+
+CacheEntry = namedtuple('CacheEntry', ['status_code',
+                                       'headers',
+                                       'content',
+                                       'url',
+                                       'encoding',
+                                       'etag',
+                                       'expires'])
+
+
+def _to_entry(r: requests.Response, ttl: float) -> CacheEntry:
+    return CacheEntry(
+        status_code=r.status_code,
+        headers=dict(r.headers),
+        content=r.content,
+        url=r.url,
+        encoding=r.encoding,
+        etag=r.headers.get('ETag'),
+        expires=time.monotonic() + ttl
+    )
+
+
+def _to_response(entry: CacheEntry) -> requests.Response:
+    """Build a fresh response object so callers never share state"""
+    r = requests.Response()
+    r.status_code = entry.status_code
+    r.headers.update(entry.headers)
+    r._content = entry.content
+    r.url = entry.url
+    r.encoding = entry.encoding
+    return r
+
+
+def _dumps(entry: CacheEntry) -> bytes:
+    """Serialize as json with a wall clock expiry other processes can read.
+
+    json is used instead of pickle so a writable cache directory or redis
+    instance can never be used to run code in the clients reading it.
+    """
+    return json.dumps({
+        **entry._asdict(),
+        'content': base64.b64encode(entry.content).decode('ascii'),
+        'expires': time.time() + entry.expires - time.monotonic(),
+    }).encode('utf-8')
+
+
+def _loads(data: bytes) -> CacheEntry:
+    """Returns None for anything that is not a valid serialized entry"""
+    try:
+        fields = json.loads(data)
+        return CacheEntry(**{
+            **fields,
+            'content': base64.b64decode(fields['content']),
+            'expires': time.monotonic() + fields['expires'] - time.time(),
+        })
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def _remaining(entry: CacheEntry) -> float:
+    return entry.expires - time.monotonic()
+
+
+class MemoryBackend:
+    """
+    In process LRU store capped by the total size of cached bodies.
+
+    Parameters
+    ----------
+    max_bytes : int, Optional
+        Least recently used entries are evicted past this size. Default=16MB
+    """
+
+    shared = False
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.content)
+
+            if len(entry.content) > self.max_bytes:
+                return
+
+            self._entries[key] = entry
+            self.size += len(entry.content)
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.content)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskBackend:
+    """
+    Stores entries as files so several processes can share one cache.
+
+    Parameters
+    ----------
+    directory : str
+    max_bytes : int, Optional
+        Oldest files are pruned once the directory grows past this size.
+        Default=64MB
+    keep_stale : float, Optional
+        Seconds an expired entry is kept for ETag revalidation. Default=300
+    """
+
+    shared = True
+    PRUNE_EVERY = 64
+
+    def __init__(self, directory, max_bytes: int = 64 * 1024 * 1024,
+                 keep_stale: float = 300):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.keep_stale = keep_stale
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f'{key}.cache'
+
+    def get(self, key):
+        try:
+            return _loads(self._path(key).read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, entry):
+        # a unique temporary file per write keeps concurrent writers apart
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix='.tmp',
+                                         delete=False) as f:
+            f.write(_dumps(entry))
+        os.replace(f.name, self._path(key))
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % DiskBackend.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Delete long expired entries, then the oldest until under max_bytes"""
+        files = []
+        for path in self.directory.glob('*.cache'):
+            try:
+                files.append((path.stat(), path))
+            except FileNotFoundError:
+                continue
+
+        size = 0
+        for stat, path in sorted(files, key=lambda f: f[0].st_mtime, reverse=True):
+            entry = self.get(path.stem)
+            size += stat.st_size
+            if entry is None or _remaining(entry) < -self.keep_stale \
+                    or size > self.max_bytes:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        for path in self.directory.glob('*.cache'):
+            path.unlink()
+
+
+class RedisBackend:
+    """
+    Adapts any client exposing redis style get/set/delete of bytes.
+
+    Keys expire keep_stale seconds after their time to live so the store
+    does not grow without bound.
+
+    Parameters
+    ----------
+    client : redis.Redis or compatible
+    prefix : str, Optional
+    keep_stale : float, Optional
+        Seconds an expired entry is kept for ETag revalidation. Default=300
+    """
+
+    shared = True
+
+    def __init__(self, client, prefix: str = 'cbp_client:',
+                 keep_stale: float = 300):
+        self.client = client
+        self.prefix = prefix
+        self.keep_stale = keep_stale
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return None if data is None else _loads(data)
+
+    def set(self, key, entry):
+        expires_in = max(1, int(_remaining(entry) + self.keep_stale))
+        self.client.set(self.prefix + key, _dumps(entry), ex=expires_in)
+
+    def clear(self):
+        for key in self.client.keys(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+
+    def record(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self):
+        return (f'CacheStats(hits={self.hits}, misses={self.misses}, '
+                f'revalidations={self.revalidations})')
+
+
+class ResponseCache:
+    """
+    Caches GET responses with a time to live chosen per endpoint.
+
+    Endpoints without a matching policy are never cached, so trading
+    critical reads such as tickers and accounts always hit the network.
+    When an expired entry carries an ETag, it is revalidated with an
+    If-None-Match request instead of being downloaded again.
+
+    Authenticated responses (profiles, payment methods) are only cached in
+    process. Shared disk or redis backends skip them unless
+    cache_authenticated=True, because those stores keep bodies in plain text.
+
+    Example
+    -------
+    >>> cache = ResponseCache()
+    >>> api = PublicAPI(cache=cache)
+    >>> api.twenty_four_hour_stats('BTC-USD')
+    >>> api.twenty_four_hour_stats('BTC-USD')
+    >>> cache.stats
+    CacheStats(hits=1, misses=1, revalidations=0)
+
+    Parameters
+    ----------
+    ttls : dict, Optional
+        Maps endpoint regex patterns to seconds. Default=DEFAULT_TTLS
+    backend : MemoryBackend, DiskBackend or RedisBackend, Optional
+        Storage for entries. Default=MemoryBackend()
+    cache_authenticated : bool, Optional
+        Allow authenticated responses in a shared backend. Default=False
+    """
+
+    DEFAULT_TTLS = {
+        r'time': 1,
+        r'products': 300,
+        r'products/[^/]+': 300,
+        r'products/[^/]+/stats': 10,
+        r'currencies': 3_600,
+        r'profiles(/[^/]+)?': 300,
+        r'payment-methods': 300,
+    }
+
+    def __init__(self, ttls: dict = None, backend=None,
+                 cache_authenticated: bool = False):
+        ttls = ResponseCache.DEFAULT_TTLS if ttls is None else ttls
+        self._policies = [(re.compile(f'^{pattern}$'), ttl)
+                          for pattern, ttl in ttls.items()]
+        self.backend = MemoryBackend() if backend is None else backend
+        self.cache_authenticated = cache_authenticated
+        self.stats = CacheStats()
+
+    def ttl_for(self, endpoint: str):
+        """Returns seconds to cache endpoint for or None if not cacheable"""
+        endpoint = endpoint.strip('/')
+        for pattern, ttl in self._policies:
+            if pattern.match(endpoint):
+                return ttl
+        return None
+
+    @staticmethod
+    def key(endpoint: str, params: dict, auth) -> str:
+        raw = json.dumps([
+            endpoint.strip('/'),
+            sorted((str(k), str(v)) for k, v in (params or {}).items()),
+            getattr(auth, 'api_key', None)
+        ])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def fetch(self, endpoint: str, params: dict, auth, send) -> requests.Response:
+        """
+        Serve endpoint from the cache or call send(headers) to fetch it.
+
+        send must accept a dict of extra request headers and return the
+        response from the api.
+        """
+        ttl = self.ttl_for(endpoint)
+        shared = getattr(self.backend, 'shared', False)
+        if ttl is None or (auth is not None and shared
+                           and not self.cache_authenticated):
+            return send(None)
+
+        key = self.key(endpoint, params, auth)
+        entry = self._load(key)
+
+        if entry is not None and entry.expires > time.monotonic():
+            self.stats.record('hits')
+            return _to_response(entry)
+
+        headers = None
+        if entry is not None and entry.etag is not None:
+            headers = {'If-None-Match': entry.etag}
+
+        r = send(headers)
+
+        if r.status_code == 304 and entry is not None:
+            self.stats.record('revalidations')
+            entry = entry._replace(expires=time.monotonic() + ttl)
+            self._store(key, entry)
+            return _to_response(entry)
+
+        self.stats.record('misses')
+        self._store(key, _to_entry(r, ttl))
+        return r
+
+    def _load(self, key):
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logging.warning(f'Response cache read failed: {e}')
+            return None
+
+    def _store(self, key, entry):
+        """Failing to cache a response never fails the request"""
+        try:
+            self.backend.set(key, entry)
+        except Exception as e:
+            logging.warning(f'Response cache write failed: {e}')
+
+    def clear(self):
+        self.backend.clear()
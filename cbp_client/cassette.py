@@ -0,0 +1,123 @@
+'''Record and replay GET responses from a local sqlite file'''
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from cbp_client.cache import CacheEntry, ResponseCache, _to_response
+
+MODES = ('record', 'replay', 'strict')
+
+
+class CassetteMiss(LookupError):
+    """Raised in strict mode for a request that was never recorded"""
+
+
+class Cassette:
+    """
+    Transport that records api GET responses and plays them back.
+
+    Responses are stored in one sqlite file, indexed by request path,
+    params and api key. The host is not part of the key, so a cassette
+    recorded against the sandbox or a MockExchange replays anywhere.
+
+    Modes
+    -----
+    record
+        Every request goes to the network and its response is saved,
+        replacing an earlier recording.
+    replay
+        Recorded requests are served from disk with no rate limit wait or
+        pause. Requests not recorded yet are fetched and recorded.
+    strict
+        Like replay, but an unrecorded request raises CassetteMiss instead
+        of reaching the network, so a run is guaranteed to be reproducible.
+
+    POST requests always go to the network and are never recorded.
+
+    Example
+    -------
+    >>> api = PublicAPI(cassette=Cassette('research.sqlite', mode='replay'))
+    >>> candles = list(api.historical_prices('btc-usd', start='2020-01-01'))
+
+    Parameters
+    ----------
+    path : str
+    mode : str, Optional
+        'record', 'replay' or 'strict'. Default='replay'
+    """
+
+    def __init__(self, path: str, mode: str = 'replay'):
+        if mode not in MODES:
+            raise ValueError(f'Invalid cassette mode: {mode}. Choose from: {MODES}')
+        self.path = str(path)
+        self.mode = mode
+        self.stats = {'played': 0, 'recorded': 0}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status_code INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    content BLOB NOT NULL,
+                    url TEXT,
+                    encoding TEXT,
+                    recorded_at REAL NOT NULL
+                )''')
+
+    @property
+    def last_played(self) -> bool:
+        """True if the calling thread's last request was served from disk"""
+        return getattr(self._local, 'played', False)
+
+    @staticmethod
+    def key(url: str, params: dict, auth) -> str:
+        return ResponseCache.key(urlsplit(url).path, params, auth)
+
+    def get(self, url: str, params: dict, auth, send) -> requests.Response:
+        """Serve url from the cassette or call send() and record its response"""
+        key = self.key(url, params, auth)
+        self._local.played = False
+
+        if self.mode != 'record':
+            with self._lock:
+                row = self._db.execute(
+                    'SELECT status_code, headers, content, url, encoding '
+                    'FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._local.played = True
+                self.stats['played'] += 1
+                status_code, headers, content, recorded_url, encoding = row
+                return _to_response(CacheEntry(status_code, json.loads(headers),
+                                               content, recorded_url, encoding,
+                                               None, None))
+            if self.mode == 'strict':
+                raise CassetteMiss(
+                    f'No recorded response for GET {urlsplit(url).path} '
+                    f'params={params} in {self.path}')
+
+        r = send()
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, urlsplit(url).path, json.dumps(params, default=str, sort_keys=True),
+                 r.status_code, json.dumps(dict(r.headers)), r.content, r.url,
+                 r.encoding, time.time()))
+        self.stats['recorded'] += 1
+        return r
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
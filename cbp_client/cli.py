@@ -0,0 +1,375 @@
+"""
+Command line tool for backfilling and syncing coinbase pro data.
+
+Heavy modules are imported inside each command so that `cbp-client --help`
+and argument errors return immediately.
+
+Example
+-------
+$ cbp-client candles btc-usd eth-usd --start 2021-01-01 --interval HOURLY
+$ cbp-client orders --start 2021-01-01 --sandbox
+$ cbp-client ledger btc eth --start 2021-01-01
+$ cbp-client prices btc-usd eth-usd --daemon --every 60
+"""
+
+import argparse
+import csv
+import json
+import logging
+import signal
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from cbp_client.helpers import parse_time
+
+
+class Checkpoint:
+    """
+    Persists the progress of each sync job to a json file.
+
+    Parameters
+    ----------
+    path : str, Optional
+        Location of the checkpoint file. When None, progress is only kept
+        in memory for the life of the process.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._state = {}
+
+        if self.path is not None and self.path.exists():
+            self._state = json.loads(self.path.read_text())
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._state.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._state[key] = value
+            if self.path is not None:
+                tmp_path = self.path.with_name(self.path.name + '.tmp')
+                tmp_path.write_text(json.dumps(self._state, indent=2))
+                tmp_path.replace(self.path)
+
+
+def _write_jsonl(path: Path, rows) -> int:
+    count = 0
+    with path.open('a') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+            count += 1
+    return count
+
+
+def sync_candles(api, product_id, start, end, interval, output_dir, checkpoint):
+    """Append closed candles for product_id to a csv file, resuming if possible"""
+    from cbp_client.history import History, Interval
+
+    candle_length = timedelta(seconds=Interval[interval].value)
+    key = f'candles:{product_id}:{interval}'
+    last_start = checkpoint.get(key)
+
+    if last_start is not None:
+        start = (datetime.fromisoformat(last_start) + candle_length).isoformat()
+
+    # only closed candles are written so a resumed run never skips an update.
+    # History defaults end to local time, so an explicit UTC end is passed.
+    cutoff = datetime.fromisoformat(end) if end else datetime.utcnow()
+    if datetime.fromisoformat(start) > cutoff:
+        return 0
+
+    path = Path(output_dir) / f'{product_id.lower()}_{interval.lower()}.csv'
+    write_header = not path.exists()
+    count = 0
+
+    candles = History(
+        product_id=product_id,
+        start=start,
+        end=cutoff.isoformat(),
+        api=api,
+        interval=interval
+    )()
+
+    with path.open('a', newline='') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(History.Candle._fields)
+
+        for candle in candles:
+            if end is None and (
+                datetime.fromisoformat(candle.start) + candle_length > cutoff
+            ):
+                break
+
+            writer.writerow(candle)
+            count += 1
+
+            if count % History.MAX_CANDLES_IN_REQUEST == 0:
+                f.flush()
+                checkpoint.set(key, candle.start)
+
+        if count:
+            checkpoint.set(key, candle.start)
+
+    return count
+
+
+def sync_paginated(api, auth, endpoint, key, start, output_path, checkpoint,
+                   params={}):
+    """Append records newer than the last sync of a paginated endpoint
+
+    Pages arrive newest first, so rows are staged in a temporary file and
+    only appended to output_path, and the checkpoint advanced, once the walk
+    completes. An interrupted run leaves output_path untouched.
+
+    Several rows can share the checkpoint's timestamp, so the ids of the
+    rows written at that timestamp are checkpointed too and rows at it are
+    skipped only when already written.
+    """
+    output_path = Path(output_path)
+    staging_path = output_path.with_name(output_path.name + '.partial')
+    since = checkpoint.get(key, start)
+    since_date = datetime.fromisoformat(since)
+    seen = set(checkpoint.get(f'{key}:ids', []))
+    newest, newest_ids = None, set()
+
+    def new_rows():
+        nonlocal newest, newest_ids
+        for row in api.get_paginated_endpoint(
+            endpoint=endpoint,
+            start_date=since,
+            auth=auth,
+            params=params
+        ):
+            created_at = parse_time(row['created_at'])
+            if created_at < since_date or \
+                    (created_at == since_date and row['id'] in seen):
+                continue
+            if newest is None or created_at > newest:
+                newest, newest_ids = created_at, set()
+            if created_at == newest:
+                newest_ids.add(row['id'])
+            yield row
+
+    if staging_path.exists():
+        staging_path.unlink()
+
+    count = _write_jsonl(staging_path, new_rows())
+
+    with output_path.open('ab') as out:
+        out.write(staging_path.read_bytes())
+    staging_path.unlink()
+
+    if newest is not None:
+        if newest == since_date:
+            newest_ids |= seen
+        checkpoint.set(f'{key}:ids', sorted(newest_ids))
+        checkpoint.set(key, newest.isoformat())
+
+    return count
+
+
+def snapshot_prices(api, product_id, output_dir):
+    """Append the latest ticker for product_id to a json lines file"""
+    ticker = api.get(f'products/{product_id}/ticker').json()
+    row = {'product_id': product_id, **ticker}
+    return _write_jsonl(Path(output_dir) / 'prices.jsonl', [row])
+
+
+def _build_api(args):
+    from cbp_client.api import API
+    from cbp_client.rate_limit import RateLimiter
+
+    rate_limiter = RateLimiter(args.rate) if args.rate else None
+    return API(
+        sandbox_mode=args.sandbox,
+        rate_limiter=rate_limiter,
+        base_url=args.base_url
+    )
+
+
+def _build_auth(args):
+    from cbp_client.auth import Auth
+    from cbp_client.helpers import load_credentials
+
+    return Auth(**load_credentials(args.sandbox))
+
+
+class SyncError(Exception):
+    pass
+
+
+def _run_concurrently(fn, items, workers):
+    """Run fn for every item, raising SyncError if any of them failed"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {item: pool.submit(fn, item) for item in items}
+
+    total = 0
+    failed = []
+    for item, future in futures.items():
+        try:
+            total += future.result()
+        except Exception as e:
+            logging.error(f'Sync failed for {item}: {e}')
+            failed.append(item)
+
+    if failed:
+        raise SyncError(f'{len(failed)} of {len(items)} jobs failed: {failed}')
+
+    return total
+
+
+def candles_command(args, checkpoint):
+    api = _build_api(args)
+
+    def job(product_id):
+        count = sync_candles(api, product_id, args.start, args.end,
+                             args.interval, args.output, checkpoint)
+        logging.info(f'{product_id}: wrote {count} candles')
+        return count
+
+    return _run_concurrently(job, [p.upper() for p in args.product_ids],
+                             args.workers)
+
+
+def orders_command(args, checkpoint):
+    api, auth = _build_api(args), _build_auth(args)
+    count = sync_paginated(
+        api, auth,
+        endpoint='orders',
+        key=f'orders:{args.status}',
+        start=args.start,
+        output_path=Path(args.output) / 'orders.jsonl',
+        checkpoint=checkpoint,
+        params={'status': args.status}
+    )
+    logging.info(f'orders: wrote {count} records')
+    return count
+
+
+def ledger_command(args, checkpoint):
+    api, auth = _build_api(args), _build_auth(args)
+    accounts = {
+        account['currency'].upper(): account['id']
+        for account in api.get('accounts', auth=auth).json()
+    }
+
+    def job(symbol):
+        count = sync_paginated(
+            api, auth,
+            endpoint=f'accounts/{accounts[symbol]}/ledger',
+            key=f'ledger:{symbol}',
+            start=args.start,
+            output_path=Path(args.output) / f'ledger_{symbol.lower()}.jsonl',
+            checkpoint=checkpoint
+        )
+        logging.info(f'{symbol}: wrote {count} ledger entries')
+        return count
+
+    return _run_concurrently(job, [s.upper() for s in args.symbols],
+                             args.workers)
+
+
+def prices_command(args, checkpoint):
+    api = _build_api(args)
+    return _run_concurrently(
+        lambda product_id: snapshot_prices(api, product_id, args.output),
+        [p.upper() for p in args.product_ids],
+        args.workers
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='cbp-client',
+        description='Backfill and sync coinbase pro data to local files.'
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--output', default='.',
+                        help='Directory files are written to. Default=.')
+    common.add_argument('--checkpoint',
+                        help='Json file used to resume interrupted syncs.')
+    common.add_argument('--workers', type=int, default=4,
+                        help='Number of concurrent jobs. Default=4')
+    common.add_argument('--rate', type=float, default=3.0,
+                        help='Max requests per second, 0 disables. Default=3')
+    common.add_argument('--sandbox', action='store_true',
+                        help='Use the sandbox api.')
+    common.add_argument('--base-url',
+                        help='Override the api url, e.g. a local mock server.')
+    common.add_argument('--daemon', action='store_true',
+                        help='Keep running and repeat the sync.')
+    common.add_argument('--every', type=float, default=3600,
+                        help='Seconds between syncs in daemon mode.')
+    common.add_argument('--log-level', default='INFO')
+
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    candles = commands.add_parser('candles', parents=[common],
+                                  help='Backfill historical candles.')
+    candles.add_argument('product_ids', nargs='+')
+    candles.add_argument('--start', required=True)
+    candles.add_argument('--end')
+    candles.add_argument('--interval', type=str.upper, default='DAILY')
+    candles.set_defaults(handler=candles_command)
+
+    orders = commands.add_parser('orders', parents=[common],
+                                 help='Sync orders of the account.')
+    orders.add_argument('--start', required=True)
+    orders.add_argument('--status', default='all')
+    orders.set_defaults(handler=orders_command)
+
+    ledger = commands.add_parser('ledger', parents=[common],
+                                 help='Sync ledger entries per currency.')
+    ledger.add_argument('symbols', nargs='+')
+    ledger.add_argument('--start', required=True)
+    ledger.set_defaults(handler=ledger_command)
+
+    prices = commands.add_parser('prices', parents=[common],
+                                 help='Snapshot latest prices.')
+    prices.add_argument('product_ids', nargs='+')
+    prices.set_defaults(handler=prices_command)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(format='%(asctime)s - %(message)s',
+                        level=args.log_level.upper())
+
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(args.checkpoint)
+    stop = threading.Event()
+
+    if args.daemon:
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    exit_code = 0
+    try:
+        while not stop.is_set():
+            try:
+                args.handler(args, checkpoint)
+                exit_code = 0
+            except Exception as e:
+                # a daemon keeps its schedule, a one-off run reports failure
+                logging.error(f'{args.command} sync failed: {e}')
+                exit_code = 1
+            if not args.daemon:
+                break
+            stop.wait(args.every)
+    except KeyboardInterrupt:
+        pass
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
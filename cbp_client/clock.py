@@ -0,0 +1,104 @@
+'''Estimate of the exchange clock from samples of the time endpoint'''
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+Sample = namedtuple('Sample', ['offset', 'rtt', 'taken_at'])
+
+
+class ExchangeClock:
+    """
+    Local clock corrected by the measured offset to the exchange clock.
+
+    Each sample reads the time endpoint and assumes the exchange stamped
+    its answer halfway through the round trip, so the error of a sample is
+    at most half its round trip time. As in NTP's clock filter, the offset
+    is taken from the sample with the lowest round trip among the recent
+    ones, which discards samples delayed by queueing.
+
+    Reading now() never sends a request, except for the first sync and
+    one sample per resample_interval to follow drift.
+
+    Example
+    -------
+    >>> clock = ExchangeClock(PublicAPI().api)
+    >>> clock.sync()
+    >>> clock.offset, clock.uncertainty
+    (-1.8342, 0.0121)
+    >>> auth = Auth(api_key, secret, passphrase, clock=clock)
+
+    Parameters
+    ----------
+    api : API
+    samples : int, Optional
+        Samples taken by sync() and kept for filtering. Default=5
+    resample_interval : float, Optional
+        Seconds after which now() takes a fresh sample. Default=300
+    """
+
+    def __init__(self, api, samples: int = 5, resample_interval: float = 300.0):
+        if samples < 1:
+            raise ValueError(f'Samples must be at least 1. samples:{samples}')
+        self.api = api
+        self.samples = samples
+        self.resample_interval = resample_interval
+        self._samples = deque(maxlen=samples)
+        self._best = None
+        self._lock = threading.Lock()
+        self._sampling = threading.Lock()
+
+    def sample(self) -> Sample:
+        """Measure the offset once and add it to the filter"""
+        sent = time.time()
+        r = self.api.get('time', use_cache=False)
+        received = time.time()
+        exchange = float(r.json()['epoch'])
+        sample = Sample(offset=exchange - (sent + received) / 2,
+                        rtt=received - sent,
+                        taken_at=time.monotonic())
+        with self._lock:
+            self._samples.append(sample)
+            self._best = min(self._samples, key=lambda s: s.rtt)
+        return sample
+
+    def sync(self, samples: int = None):
+        """Take several samples, e.g. at startup"""
+        for _ in range(samples or self.samples):
+            self.sample()
+        return self
+
+    def _estimate(self) -> Sample:
+        best, latest = self._best, self._samples[-1] if self._samples else None
+        if best is None:
+            with self._sampling:
+                if self._best is None:
+                    self.sync()
+            return self._best
+
+        stale = time.monotonic() - latest.taken_at > self.resample_interval
+        # one thread resamples, the others keep using the current estimate
+        if stale and self._sampling.acquire(blocking=False):
+            try:
+                self.sample()
+            finally:
+                self._sampling.release()
+        return self._best
+
+    @property
+    def offset(self) -> float:
+        """Seconds to add to local time to get exchange time"""
+        return self._estimate().offset
+
+    @property
+    def uncertainty(self) -> float:
+        """Maximum error of the offset in seconds"""
+        return self._estimate().rtt / 2
+
+    def time(self) -> float:
+        """Exchange time as epoch seconds"""
+        return time.time() + self.offset
+
+    def utcnow(self) -> datetime:
+        """Exchange time as a naive UTC datetime"""
+        return datetime.utcfromtimestamp(self.time())
@@ -0,0 +1,156 @@
+'''
+Deadlines, cancellation and hedged requests for multi-request operations.
+
+A Deadline is created once for an operation such as historical_prices or
+orders and passed down to every request it sends. Each request's read
+timeout is capped by the time left, waits between pages end early on
+cancel(), and the next request is not sent once the deadline has passed.
+
+Partial results: generators yield every row of the pages that completed
+in time, then raise DeadlineExceeded. A page is never cut short. Calls
+that return a list raise DeadlineExceeded with the rows collected so far
+in its partial attribute.
+
+Example
+-------
+>>> deadline = Deadline(seconds=5)
+>>> candles = []
+>>> try:
+...     for candle in api.historical_prices('btc-usd', '2020-01-01', deadline=deadline):
+...         candles.append(candle)
+... except DeadlineExceeded:
+...     pass  # candles holds every window fetched within 5 seconds
+'''
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import requests
+
+POLL_INTERVAL = 0.05
+
+
+class DeadlineExceeded(requests.Timeout):
+    """
+    Raised when an operation runs out of time or is cancelled.
+
+    partial holds the results collected before it stopped, when the
+    operation returns a list.
+    """
+
+    def __init__(self, *args, partial=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.partial = partial
+
+
+class Deadline:
+    """
+    Time limit and cancellation flag shared by the requests of one operation.
+
+    Parameters
+    ----------
+    seconds : float, Optional
+        Time allowed from now. Default=None for no time limit, only
+        cancellation.
+    """
+
+    def __init__(self, seconds: float = None):
+        if seconds is not None and seconds <= 0:
+            raise ValueError(f'Seconds must be positive. seconds:{seconds}')
+        self.expires = None if seconds is None else time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Stop the operation before its next request, from any thread"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def remaining(self) -> float:
+        """Seconds left, None without a time limit"""
+        if self.expires is None:
+            return None
+        return max(self.expires - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or self.remaining() == 0.0
+
+    def check(self):
+        """Raise DeadlineExceeded if the operation must stop"""
+        if self.cancelled:
+            raise DeadlineExceeded('Operation cancelled')
+        if self.remaining() == 0.0:
+            raise DeadlineExceeded('Deadline exceeded')
+
+    def timeout(self, timeout: tuple) -> tuple:
+        """(connect, read) timeout for requests capped by the time left"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        connect, read = timeout
+        return (min(connect, remaining), min(read, remaining))
+
+    def sleep(self, seconds: float):
+        """Sleep, waking early and raising if cancelled or out of time"""
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._cancelled.wait(remaining)
+        else:
+            self._cancelled.wait(seconds)
+        self.check()
+
+
+def _discard(future):
+    """Close the response of a hedged call that lost, freeing its connection."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    close = getattr(future.result(), 'close', None)
+    if close is not None:
+        close()
+
+
+def hedged(send, hedge_after: float, pool, deadline: Deadline = None, hedge=None):
+    """
+    Call send(), and hedge() in parallel if the first call is still running
+    after hedge_after seconds. Returns the first successful response.
+
+    hedge defaults to send. Only for idempotent requests. The slower call is
+    left to finish in the pool and its response is closed. Raises the last
+    error if both fail.
+    """
+    calls = [pool.submit(send)]
+    pending = set(calls)
+    hedge_at = time.monotonic() + hedge_after
+    error = None
+    winner = None
+
+    try:
+        while pending:
+            if deadline is not None:
+                deadline.check()
+            timeout = POLL_INTERVAL if deadline is not None else None
+            if hedge_at is not None:
+                until_hedge = max(hedge_at - time.monotonic(), 0.0)
+                timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    return future.result()
+                error = future.exception()
+
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                if not done:
+                    calls.append(pool.submit(hedge or send))
+                    pending.add(calls[-1])
+    finally:
+        for future in calls:
+            if future is not winner:
+                future.add_done_callback(_discard)
+
+    raise error
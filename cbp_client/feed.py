@@ -0,0 +1,343 @@
+'''
+Websocket feed client and a real time order state machine.
+
+The websocket connection needs the optional websocket-client package:
+
+    pip install websocket-client
+
+Message handling does not, so OrderTracker can be fed from any source.
+'''
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from cbp_client.auth import Auth
+from cbp_client.numeric import to_decimal
+
+LIVE_FEED_URL = 'wss://ws-feed.exchange.coinbase.com'
+SANDBOX_FEED_URL = 'wss://ws-feed-public.sandbox.exchange.coinbase.com'
+
+ORDER_MESSAGES = ('received', 'open', 'done', 'match', 'change', 'activate')
+
+
+class OrderState:
+    """
+    Latest known state of one order.
+
+    status moves from 'received' (or 'pending' for stop orders) to 'open'
+    for resting orders and ends at 'done'. fills holds one dict per match.
+    """
+
+    def __init__(self, order_id: str):
+        self.id = order_id
+        self.product_id = None
+        self.side = None
+        self.type = None
+        self.status = None
+        self.done_reason = None
+        self.remaining_size = None
+        self.fills = []
+        self.updated = None
+
+    @property
+    def filled_size(self) -> Decimal:
+        return sum((fill['size'] for fill in self.fills), Decimal(0))
+
+    @property
+    def executed_value(self) -> Decimal:
+        return sum((fill['size'] * fill['price'] for fill in self.fills), Decimal(0))
+
+    @property
+    def done(self) -> bool:
+        return self.status == 'done'
+
+    def __repr__(self):
+        return (f'OrderState({self.id!r}, status={self.status!r}, '
+                f'filled_size={self.filled_size})')
+
+
+class OrderTracker:
+    """
+    Keeps order states current from user or full channel messages.
+
+    Orders of the authenticated profile (messages carrying a profile_id,
+    as on the user channel) are tracked automatically, others only once
+    track(order_id) has been called, so a full channel subscription does
+    not hold every order on the book. wait() and wait_async() resolve when
+    an order is done.
+
+    Done orders move to a list of the last max_finished finished orders, so
+    state() and wait() still answer for them but memory stays bounded
+    without calling forget().
+
+    Example
+    -------
+    >>> tracker = OrderTracker()
+    >>> feed = Feed(auth, ['BTC-USD'], handlers=[tracker.handle]).start()
+    >>> order = api.market_buy(funds=50, product_id='btc-usd').json()
+    >>> tracker.wait(order['id'], timeout=10).filled_size
+    Decimal('0.00164013')
+    >>> await tracker.wait_async(order['id'])
+
+    Parameters
+    ----------
+    max_finished : int, Optional
+        Done orders kept for state() and wait(). Default=1000
+    """
+
+    def __init__(self, max_finished: int = 1000):
+        self.max_finished = max_finished
+        self._orders = {}
+        self._finished = OrderedDict()
+        self._futures = {}
+        self._tracked = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.gaps = 0
+        self._sequences = {}
+
+    def track(self, order_id: str) -> Future:
+        """Follow an order by id. Returns a future resolved with its final state."""
+        with self._lock:
+            self._tracked.add(order_id)
+            return self._future(order_id)
+
+    def state(self, order_id: str) -> OrderState:
+        return self._orders.get(order_id) or self._finished.get(order_id)
+
+    def subscribe(self, callback: Callable[[OrderState, dict], None]):
+        """Call callback(state, message) on every order update"""
+        self._listeners.append(callback)
+
+    def wait(self, order_id: str, timeout: float = None) -> OrderState:
+        """Block until the order is done and return its final state"""
+        return self.track(order_id).result(timeout)
+
+    async def wait_async(self, order_id: str) -> OrderState:
+        return await asyncio.wrap_future(self.track(order_id))
+
+    def handle(self, message: dict):
+        """Apply one feed message. Other message types are ignored."""
+        kind = message.get('type')
+        if kind not in ORDER_MESSAGES:
+            return
+        self._check_sequence(message)
+
+        profile_id = message.get('profile_id')
+        if kind == 'match':
+            # user channel matches carry the profile id of our side only
+            for side, liquidity in (('maker', 'M'), ('taker', 'T')):
+                own = profile_id is not None and \
+                    message.get(f'{side}_profile_id') == profile_id
+                self._apply(message.get(f'{side}_order_id'), message, own, liquidity)
+        else:
+            self._apply(message.get('order_id'), message, profile_id is not None)
+
+    def _check_sequence(self, message):
+        product_id, sequence = message.get('product_id'), message.get('sequence')
+        if sequence is None:
+            return
+        last = self._sequences.get(product_id)
+        if last is not None and sequence > last + 1:
+            self.gaps += 1
+            logging.warning(f'Feed gap on {product_id}: '
+                            f'{last} -> {sequence}. Some updates were missed.')
+        if last is None or sequence > last:
+            self._sequences[product_id] = sequence
+
+    def _apply(self, order_id, message, own, liquidity=None):
+        if order_id is None:
+            return
+        with self._lock:
+            state = self._orders.get(order_id) or self._finished.get(order_id)
+            if state is None:
+                if not own and order_id not in self._tracked:
+                    return
+                state = self._orders[order_id] = OrderState(order_id)
+
+            kind = message['type']
+            state.product_id = message.get('product_id', state.product_id)
+            state.side = message.get('side', state.side)
+            state.updated = message.get('time', state.updated)
+
+            if kind == 'received':
+                state.type = message.get('order_type')
+                state.status = state.status or 'received'
+            elif kind == 'activate':
+                state.status = state.status or 'pending'
+            elif kind == 'open':
+                state.status = 'open'
+                state.remaining_size = to_decimal(message['remaining_size'])
+            elif kind == 'change' and 'new_size' in message:
+                state.remaining_size = to_decimal(message['new_size'])
+            elif kind == 'match':
+                state.fills.append({
+                    'trade_id': message.get('trade_id'),
+                    'size': to_decimal(message['size']),
+                    'price': to_decimal(message['price']),
+                    'liquidity': liquidity,
+                    'time': message.get('time'),
+                })
+            elif kind == 'done':
+                state.status = 'done'
+                state.done_reason = message.get('reason')
+                if message.get('remaining_size') is not None:
+                    state.remaining_size = to_decimal(message['remaining_size'])
+
+            future = None
+            if state.done and order_id in self._orders:
+                future = self._future(order_id)
+                self._finish(order_id)
+
+        for callback in self._listeners:
+            callback(state, message)
+        if future is not None and not future.done():
+            future.set_result(state)
+
+    def _future(self, order_id):
+        state = self._finished.get(order_id)
+        if state is not None:
+            future = Future()
+            future.set_result(state)
+            return future
+        future = self._futures.get(order_id)
+        if future is None:
+            future = self._futures[order_id] = Future()
+        return future
+
+    def _finish(self, order_id):
+        self._finished[order_id] = self._orders.pop(order_id)
+        self._futures.pop(order_id, None)
+        self._tracked.discard(order_id)
+        while len(self._finished) > self.max_finished:
+            self._finished.popitem(last=False)
+
+    def forget(self, order_id: str):
+        """Drop an order from memory"""
+        with self._lock:
+            self._orders.pop(order_id, None)
+            self._finished.pop(order_id, None)
+            self._futures.pop(order_id, None)
+            self._tracked.discard(order_id)
+
+
+class Feed:
+    """
+    Websocket feed subscription running on a background thread.
+
+    With auth, the subscribe message is signed like a GET of
+    /users/self/verify, which unlocks the user channel and adds the
+    profile's private fields to full channel messages. The connection is
+    reopened with backoff when it drops and every decoded message is passed
+    to each handler.
+
+    Example
+    -------
+    >>> tracker = OrderTracker()
+    >>> feed = Feed(api.auth, ['BTC-USD'], channels=['user'],
+    ...             handlers=[tracker.handle, api.handle_feed_message])
+    >>> feed.start()
+    >>> feed.stop()
+
+    Parameters
+    ----------
+    auth : Auth, Optional
+        Required for the user channel.
+    product_ids : list
+    channels : list, Optional
+        Default=['user']
+    handlers : list, Optional
+        Callables receiving each message dict.
+    sandbox_mode : bool, Optional
+    url : str, Optional
+        Overrides the feed url.
+    """
+
+    def __init__(
+        self,
+        auth: Auth = None,
+        product_ids: Iterable[str] = (),
+        channels: Iterable[str] = ('user',),
+        handlers: Iterable[Callable[[dict], None]] = (),
+        sandbox_mode: bool = False,
+        url: str = None
+    ):
+        self.auth = auth
+        self.product_ids = [p.upper() for p in product_ids]
+        self.channels = list(channels)
+        self.handlers = list(handlers)
+        self.url = url or (SANDBOX_FEED_URL if sandbox_mode else LIVE_FEED_URL)
+        self._stop = threading.Event()
+        self._thread = None
+        self._socket = None
+
+        if 'user' in self.channels and auth is None:
+            raise ValueError('The user channel requires auth')
+
+    def subscribe_message(self) -> dict:
+        message = {
+            'type': 'subscribe',
+            'product_ids': self.product_ids,
+            'channels': self.channels
+        }
+        if self.auth is not None:
+            message.update(self.auth.feed_fields())
+        return message
+
+    def dispatch(self, message: dict):
+        if message.get('type') == 'error':
+            logging.error(f'Feed error: {message.get("message")} '
+                          f'{message.get("reason", "")}')
+        for handler in self.handlers:
+            try:
+                handler(message)
+            except Exception as e:
+                logging.exception(f'Feed handler {handler} failed: {e}')
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='cbp-feed', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._socket is not None:
+            self._socket.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        websocket = _import_websocket()
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                self._socket = websocket.create_connection(self.url, timeout=30)
+                self._socket.send(json.dumps(self.subscribe_message()))
+                backoff = 1
+                while not self._stop.is_set():
+                    self.dispatch(json.loads(self._socket.recv()))
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logging.warning(f'Feed connection lost: {e}. Reconnecting in {backoff}s')
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+            finally:
+                if self._socket is not None:
+                    self._socket.close()
+
+
+def _import_websocket():
+    try:
+        import websocket
+    except ImportError as e:
+        raise ImportError(
+            'Feed requires the websocket-client package: '
+            'pip install websocket-client') from e
+    return websocket
@@ -1,7 +1,22 @@
 import os
+from datetime import datetime
 from pathlib import Path
 import json
 
+COINBASE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+
+def parse_time(value: str) -> datetime:
+    """
+    Parse exchange dates such as 2021-01-01T00:00:00.123Z, with or without
+    the fraction, as well as the iso dates and datetimes passed by callers.
+    """
+    if value.endswith('Z'):
+        if '.' not in value:
+            value = value.rstrip('Z') + '.0Z'
+        return datetime.strptime(value, COINBASE_DATE_FORMAT)
+    return datetime.fromisoformat(value)
+
 
 def load_credentials(sandbox_mode):
     env_variable_prefix = 'sandbox_' if sandbox_mode else ''
@@ -4,15 +4,20 @@ Retrieves historical price data for a product.
 
 
 from datetime import datetime, timedelta
-import time
 import math
 import random
 
 from textwrap import dedent
 from typing import Generator
 from collections import namedtuple
+from decimal import Decimal
 
 from cbp_client.api import API
+from cbp_client.numeric import check_numeric_mode
+from cbp_client.scheduler import Priority
+from cbp_client.deadline import Deadline
+from cbp_client.clock import ExchangeClock
+from cbp_client.listing import ListingDates
 from enum import Enum
 
 
@@ -44,6 +49,22 @@ class History:
         Options: 'one_minute', 'five_minutes', 'fifteen_minutes', 'one_hour',
         'six_hours', 'twenty_four_hours'. Default='twenty_four_hours'
     quiet : bool, 'Optional
+    numeric : str, Optional
+        When 'decimal', candle prices and volumes are Decimals parsed
+        directly from the response. Default=None returns strings.
+    skip_unlisted : bool, Optional
+        Start the timeline at the product's first day of data, found with a
+        few probe requests, when that costs less than requesting the whole
+        range. Default=True
+    listing_dates : ListingDates, Optional
+        Cache of listing dates to search and reuse. Default=None searches
+        with a cache private to this History.
+    deadline : Deadline, Optional
+        Bounds the whole timeline. Candles of the windows fetched in time
+        are yielded, then DeadlineExceeded is raised. Default=None
+    clock : ExchangeClock, Optional
+        Without an end, the timeline ends at the start of the exchange's
+        current candle instead of the local time. Default=None
     """
     MAX_CANDLES_IN_REQUEST = 300
 
@@ -56,7 +77,12 @@ class History:
         end: str,
         api: API,
         interval: str = Interval.DAILY.name,
-        quiet: bool = True
+        quiet: bool = True,
+        numeric: str = None,
+        skip_unlisted: bool = True,
+        listing_dates: ListingDates = None,
+        deadline: Deadline = None,
+        clock: ExchangeClock = None
     ):
 
         try:
@@ -65,13 +91,20 @@ class History:
             self._handle_interval_error(e, interval)
 
         self._quiet = quiet
+        self._numeric = check_numeric_mode(numeric)
         self.api = api
         self.product_id = product_id
+        self._skip_unlisted = skip_unlisted
+        self.listing_dates = listing_dates
+        self.deadline = deadline
+        self._listed = None
         self.timeline_start = datetime.fromisoformat(start)
-        self.timeline_end = (
-            datetime.fromisoformat(end) if isinstance(end, str)
-            else datetime.now()
-        )
+        if isinstance(end, str):
+            self.timeline_end = datetime.fromisoformat(end)
+        elif clock is not None:
+            self.timeline_end = self._candle_start(clock.utcnow())
+        else:
+            self.timeline_end = datetime.now()
 
     def __call__(self):
         return self._build_timeline()
@@ -107,20 +140,56 @@ class History:
             Has attributes: start, open, high, low, close, volume
         """
 
-        previous_end = None
-        requests_needed = self._requests_needed()
-
-        for _ in range(requests_needed):
-
-            start, end = self._next_window(previous_end)
+        for start, end in self.windows():
             yield from self._request_candles(start, end)
 
-            time.sleep(random.uniform(0.3, 0.4))  # to respect rate limits
-            previous_end = end
+            # to respect rate limits
+            self.api.pause(random.uniform(0.3, 0.4), deadline=self.deadline)
 
             if not self._quiet:
                 print('{:=^40}'.format(' REQUEST COMPLETE '))
 
+    def windows(self) -> Generator:
+        """Yield the (start, end) datetimes of every candles request needed"""
+        if not self._clip_to_listing():
+            return
+        previous_end = None
+        for _ in range(self._requests_needed()):
+            start, end = self._next_window(previous_end)
+            yield start, end
+            previous_end = end
+
+    def _clip_to_listing(self) -> bool:
+        """Move the timeline start past pre-listing days. False if no data."""
+        if self._listed is None:
+            self._listed = True
+            probes = ListingDates.probes_needed(self.timeline_start, self.timeline_end)
+            if self._skip_unlisted and self._requests_needed() > probes:
+                listing_dates = self.listing_dates or ListingDates()
+                first = listing_dates.find(self.api, self.product_id,
+                                           self.timeline_start, self.timeline_end)
+                if first is None:
+                    self._listed = False
+                else:
+                    self.timeline_start = max(self.timeline_start, first)
+        return self._listed
+
+    def request_params(self, start, end) -> tuple:
+        """Endpoint and params of the candles request for one window"""
+        endpoint = f'products/{self.product_id}/candles'
+        params = {
+            'granularity': self.candle_length,
+            'start': start,
+            'end': end
+        }
+        return endpoint, params
+
+    def _candle_start(self, moment: datetime) -> datetime:
+        """Start of the candle containing moment, candles align to the epoch"""
+        seconds = (moment - datetime(1970, 1, 1)).total_seconds()
+        return datetime(1970, 1, 1) + timedelta(
+            seconds=seconds - seconds % self.candle_length)
+
     def _next_window(self, previous_end: datetime) -> tuple:
         """"
         Return timline object with start and end date for next api request.
@@ -144,14 +213,16 @@ class History:
         candles_requested = (
             ((end - start).total_seconds() / self.candle_length) + 1
         )
-        endpoint = f'products/{self.product_id}/candles'
-        params = {
-            'granularity': self.candle_length,
-            'start': start,
-            'end': end
-        }
-
-        data = self.api.get(endpoint, params=params).json()
+        endpoint, params = self.request_params(start, end)
+
+        r = self.api.get(endpoint, params=params, priority=Priority.BULK,
+                         deadline=self.deadline)
+        if self._numeric == 'decimal':
+            data = r.json(parse_float=Decimal)
+            to_candle = self._to_decimal_candle
+        else:
+            data = r.json()
+            to_candle = self._to_candle
         candles_returned = len(data)
 
         if candles_requested != candles_returned:
@@ -160,7 +231,7 @@ class History:
             # the api was undergoing maintanence
             pass
 
-        return (self._to_candle(c) for c in reversed(data))
+        return (to_candle(c) for c in reversed(data))
 
     @staticmethod
     def _handle_interval_error(e, interval):
@@ -179,3 +250,14 @@ class History:
         return History.Candle(
             start, str(open_), str(high), str(low), str(close), str(volume)
         )
+
+    @staticmethod
+    def _to_decimal_candle(candle: list):
+        """Converts a list parsed with parse_float=Decimal to a named tuple"""
+        start, low, high, open_, close, volume = candle
+        start = datetime.utcfromtimestamp(start).isoformat()
+
+        return History.Candle(
+            start, Decimal(open_), Decimal(high), Decimal(low), Decimal(close),
+            Decimal(volume)
+        )
@@ -0,0 +1,321 @@
+'''
+Technical indicators over History candles.
+
+Every indicator is a small object updated one candle at a time in O(1),
+so live data never reprocesses a history. Its state() is a plain dict that
+can be saved as json next to the candle store and restored with
+from_state() to continue where it stopped. sma, ema and the other
+lowercase functions are shorthands that loop the same updaters over a
+column, not a faster path, so both give identical numbers.
+
+Example
+-------
+>>> candles = list(PublicAPI().historical_prices('btc-usd', start='2021-01-01'))
+>>> columns = to_columns(candles)
+>>> sma(columns.close, 20)[-1]
+35912.4815
+>>> live = IndicatorSet(sma=SMA(20), atr=ATR(14))
+>>> live.update_many(candles)
+>>> saved = live.state()
+>>> IndicatorSet.from_state(saved).update(next_candle)
+{'sma': 35990.1, 'atr': 1840.77}
+'''
+import math
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque, namedtuple
+from typing import Iterable, List
+
+CandleColumns = namedtuple('CandleColumns',
+                           ['start', 'open', 'high', 'low', 'close', 'volume'])
+
+
+def to_columns(candles: Iterable) -> CandleColumns:
+    """
+    Split candles into one column per field.
+
+    Prices and volumes are packed into array('d') buffers, start stays a
+    list of the original strings.
+    """
+    start, columns = [], [array('d') for _ in range(5)]
+    opens, highs, lows, closes, volumes = columns
+    for candle in candles:
+        start.append(candle.start)
+        opens.append(float(candle.open))
+        highs.append(float(candle.high))
+        lows.append(float(candle.low))
+        closes.append(float(candle.close))
+        volumes.append(float(candle.volume))
+    return CandleColumns(start, *columns)
+
+
+class Indicator(ABC):
+    """
+    Base class of incremental indicators.
+
+    Subclasses implement push() with the floats they need and list the
+    attributes that make up their state in _state_fields.
+    """
+    _state_fields = ()
+
+    value = None
+
+    @abstractmethod
+    def update(self, candle):
+        """Add the next candle. Returns the new value, None while warming up."""
+
+    def state(self) -> dict:
+        state = {'type': type(self).__name__}
+        for field in self._state_fields:
+            value = getattr(self, field)
+            state[field] = list(value) if isinstance(value, deque) else value
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict):
+        kind = INDICATORS[state['type']]
+        indicator = kind.__new__(kind)
+        for field in kind._state_fields:
+            setattr(indicator, field, state[field])
+        indicator._restore()
+        return indicator
+
+    def _restore(self):
+        pass
+
+    def __repr__(self):
+        return f'{type(self).__name__}(value={self.value})'
+
+
+class SMA(Indicator):
+    """
+    Simple moving average of the last period closes.
+
+    The running total is recomputed exactly once per period evictions, so
+    float error from adding and removing closes cannot build up over a
+    long live run.
+    """
+    _state_fields = ('period', 'window', 'total', 'value')
+
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError(f'Period must be at least 1. period:{period}')
+        self.period = period
+        self.window = deque()
+        self.total = 0.0
+        self.value = None
+        self._evictions = 0
+
+    def _restore(self):
+        self.window = deque(self.window)
+        self.total = math.fsum(self.window)
+        self._evictions = 0
+
+    def update(self, candle):
+        return self.push(float(candle.close))
+
+    def push(self, close: float):
+        self.window.append(close)
+        self.total += close
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+            self._evictions += 1
+            if self._evictions == self.period:
+                self.total = math.fsum(self.window)
+                self._evictions = 0
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA(Indicator):
+    """Exponential moving average seeded with the SMA of the first period closes"""
+    _state_fields = ('period', 'count', 'seed', 'value')
+
+    def __init__(self, period: int):
+        if period < 1:
+            raise ValueError(f'Period must be at least 1. period:{period}')
+        self.period = period
+        self.count = 0
+        self.seed = 0.0
+        self.value = None
+
+    def update(self, candle):
+        return self.push(float(candle.close))
+
+    def push(self, close: float):
+        self.count += 1
+        if self.value is not None:
+            alpha = 2 / (self.period + 1)
+            self.value += alpha * (close - self.value)
+        else:
+            self.seed += close
+            if self.count == self.period:
+                self.value = self.seed / self.period
+        return self.value
+
+
+class VWAP(Indicator):
+    """
+    Volume weighted average of the typical price (high + low + close) / 3.
+
+    Cumulative by default, or over the last period candles. Windowed sums
+    are recomputed exactly once per period evictions, as in SMA.
+    """
+    _state_fields = ('period', 'window', 'price_volume', 'volume', 'value')
+
+    def __init__(self, period: int = None):
+        self.period = period
+        self.window = deque()
+        self.price_volume = 0.0
+        self.volume = 0.0
+        self.value = None
+        self._evictions = 0
+
+    def _restore(self):
+        self.window = deque(tuple(entry) for entry in self.window)
+        self._evictions = 0
+
+    def update(self, candle):
+        return self.push(float(candle.high), float(candle.low),
+                         float(candle.close), float(candle.volume))
+
+    def push(self, high: float, low: float, close: float, volume: float):
+        price_volume = (high + low + close) / 3 * volume
+        self.price_volume += price_volume
+        self.volume += volume
+        if self.period is not None:
+            self.window.append((price_volume, volume))
+            if len(self.window) > self.period:
+                old_price_volume, old_volume = self.window.popleft()
+                self.price_volume -= old_price_volume
+                self.volume -= old_volume
+                self._evictions += 1
+                if self._evictions == self.period:
+                    self.price_volume = math.fsum(pv for pv, _ in self.window)
+                    self.volume = math.fsum(v for _, v in self.window)
+                    self._evictions = 0
+        if self.volume > 0:
+            self.value = self.price_volume / self.volume
+        return self.value
+
+
+class ATR(Indicator):
+    """Average true range with Wilder smoothing"""
+    _state_fields = ('period', 'count', 'seed', 'previous_close', 'value')
+
+    def __init__(self, period: int = 14):
+        if period < 1:
+            raise ValueError(f'Period must be at least 1. period:{period}')
+        self.period = period
+        self.count = 0
+        self.seed = 0.0
+        self.previous_close = None
+        self.value = None
+
+    def update(self, candle):
+        return self.push(float(candle.high), float(candle.low),
+                         float(candle.close))
+
+    def push(self, high: float, low: float, close: float):
+        true_range = high - low
+        if self.previous_close is not None:
+            true_range = max(true_range,
+                             abs(high - self.previous_close),
+                             abs(low - self.previous_close))
+        self.previous_close = close
+        self.count += 1
+
+        if self.value is not None:
+            self.value += (true_range - self.value) / self.period
+        else:
+            self.seed += true_range
+            if self.count == self.period:
+                self.value = self.seed / self.period
+        return self.value
+
+
+class Returns(Indicator):
+    """Close to close return of each candle, simple or logarithmic"""
+    _state_fields = ('log', 'previous_close', 'value')
+
+    def __init__(self, log: bool = False):
+        self.log = log
+        self.previous_close = None
+        self.value = None
+
+    def update(self, candle):
+        return self.push(float(candle.close))
+
+    def push(self, close: float):
+        if self.previous_close:
+            ratio = close / self.previous_close
+            self.value = math.log(ratio) if self.log else ratio - 1
+        self.previous_close = close
+        return self.value
+
+
+INDICATORS = {kind.__name__: kind for kind in (SMA, EMA, VWAP, ATR, Returns)}
+
+
+class IndicatorSet:
+    """
+    Named indicators of one product, updated together.
+
+    Keep one IndicatorSet per product and save state() with the product's
+    candles. Updating hundreds of products is one O(1) update per candle.
+    """
+
+    def __init__(self, **indicators: Indicator):
+        self.indicators = indicators
+
+    def update(self, candle) -> dict:
+        return {name: indicator.update(candle)
+                for name, indicator in self.indicators.items()}
+
+    def update_many(self, candles: Iterable) -> dict:
+        values = self.values()
+        for candle in candles:
+            values = self.update(candle)
+        return values
+
+    def values(self) -> dict:
+        return {name: indicator.value
+                for name, indicator in self.indicators.items()}
+
+    def state(self) -> dict:
+        return {name: indicator.state()
+                for name, indicator in self.indicators.items()}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        return cls(**{name: Indicator.from_state(indicator_state)
+                      for name, indicator_state in state.items()})
+
+
+def sma(closes: Iterable[float], period: int) -> List[float]:
+    """SMA of every close. None until period closes have been seen."""
+    push = SMA(period).push
+    return [push(close) for close in closes]
+
+
+def ema(closes: Iterable[float], period: int) -> List[float]:
+    push = EMA(period).push
+    return [push(close) for close in closes]
+
+
+def returns(closes: Iterable[float], log: bool = False) -> List[float]:
+    push = Returns(log).push
+    return [push(close) for close in closes]
+
+
+def vwap(columns: CandleColumns, period: int = None) -> List[float]:
+    push = VWAP(period).push
+    return [push(h, l, c, v) for h, l, c, v in
+            zip(columns.high, columns.low, columns.close, columns.volume)]
+
+
+def atr(columns: CandleColumns, period: int = 14) -> List[float]:
+    push = ATR(period).push
+    return [push(h, l, c) for h, l, c in
+            zip(columns.high, columns.low, columns.close)]
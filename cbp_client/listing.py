@@ -0,0 +1,105 @@
+'''Discovery of the first date a product has candle data'''
+import math
+import threading
+from datetime import datetime, timedelta
+
+from cbp_client.scheduler import Priority
+
+DAY = 86_400
+MAX_CANDLES_IN_REQUEST = 300
+PROBE_SPAN = timedelta(days=MAX_CANDLES_IN_REQUEST - 1)
+
+
+class ListingDates:
+    """
+    Finds and caches the first day each product has data.
+
+    The search sends daily candle requests of up to 300 days each. A window
+    that starts after the listing date has data, one that ends before it
+    comes back empty, so a binary search over windows needs about
+    log2(days / 300) + 1 requests. Ten years take 5. A window whose first
+    candle comes later than its first day is only taken to hold the
+    listing date once the window before that candle is confirmed empty, so
+    a few days without trades on a thin pair are not mistaken for the
+    listing.
+
+    Assumes a listed product never goes 300 days without a trade.
+
+    Keep one instance per client or job to reuse its results, e.g.
+    PublicAPI.listing_dates.
+
+    Example
+    -------
+    >>> ListingDates().find(api, 'ADA-USD', datetime(2015, 1, 1), datetime(2021, 6, 1))
+    datetime.datetime(2021, 3, 18, 0, 0)
+    """
+
+    def __init__(self):
+        self._dates = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def probes_needed(start: datetime, end: datetime) -> int:
+        """Upper bound of the requests find sends for a range"""
+        windows = max((end - start) / PROBE_SPAN, 1)
+        # each halving can take a confirming probe of the preceding window
+        return 2 * math.ceil(math.log2(windows)) + 1
+
+    def find(self, api, product_id: str, start: datetime, end: datetime) -> datetime:
+        """
+        First day with data between start and end.
+
+        Returns None when the product has no data in the range. Results are
+        cached per api url and product, and reused for any range they
+        answer.
+        """
+        key = (api.base_url, product_id.upper())
+        with self._lock:
+            known = self._dates.get(key)
+
+        if known is not None and start >= known[1]:
+            first = known[0]
+        elif known is not None and known[0] is not None and known[0] > known[1]:
+            # the listing date itself was found, it answers every range
+            first = known[0]
+        else:
+            first = self._search(api, product_id.upper(), start, end)
+            if first is not None or end >= datetime.utcnow() - timedelta(days=1):
+                with self._lock:
+                    self._dates[key] = (first, start)
+
+        if first is None:
+            return None
+        first = max(first, start)
+        return first if first <= end else None
+
+    def _search(self, api, product_id, start, end):
+        """First day with data at or after start. Can be later than end."""
+        lo = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        hi = end
+        while hi - lo > PROBE_SPAN:
+            mid = lo + (hi - lo) / 2
+            mid = mid.replace(hour=0, minute=0, second=0, microsecond=0)
+            first = self._first_candle(api, product_id, mid, mid + PROBE_SPAN)
+            if first is None:
+                lo = mid + PROBE_SPAN + timedelta(days=1)
+            elif first > mid and self._first_candle(
+                    api, product_id, max(lo, first - PROBE_SPAN),
+                    first - timedelta(days=1)) is None:
+                return first
+            else:
+                hi = mid
+        if lo > hi:
+            return None
+        return self._first_candle(api, product_id, lo, hi)
+
+    @staticmethod
+    def _first_candle(api, product_id, start, end):
+        rows = api.get(f'products/{product_id}/candles', params={
+            'granularity': DAY,
+            'start': start.isoformat(),
+            'end': end.isoformat()
+        }, priority=Priority.BULK).json()
+        if not rows:
+            return None
+        return datetime.utcfromtimestamp(min(row[0] for row in rows))
@@ -0,0 +1,672 @@
+"""
+Local stand-in for the coinbase pro REST api.
+
+Serves deterministic data for every endpoint cbp_client uses so the client
+can be tested and benchmarked without a network. Latency, server errors
+and 429 responses can be injected.
+
+Example
+-------
+>>> with MockExchange(latency=0.01, error_rate=0.05) as exchange:
+...     api = PublicAPI(base_url=exchange.url)
+...     api.price('btc')
+'30512.41'
+
+From a shell:
+$ python -m cbp_client.mock_server --port 8080 --latency 0.05
+"""
+
+import argparse
+import calendar
+import gzip
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from cbp_client.rate_limit import RateLimiter
+
+
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+MAX_CANDLES = 300
+DEFAULT_PAGE_LIMIT = 100
+TRADES_PER_PRODUCT = 3_000
+# the exchange clock is frozen so every run serves identical payloads
+DEFAULT_NOW = datetime(2021, 6, 1)
+
+BASE_PRICES = {
+    'BTC': 30_000.0,
+    'ETH': 2_000.0,
+    'LTC': 150.0,
+    'XLM': 0.3,
+    'LINK': 25.0,
+    'ADA': 1.2,
+}
+QUOTE_CURRENCIES = ['USD', 'BTC']
+# coinbase lists newer assets later, candles before these dates are empty
+LISTING_DATES = {
+    'BTC': datetime(2015, 1, 1),
+    'ETH': datetime(2016, 5, 18),
+    'LTC': datetime(2016, 8, 17),
+    'XLM': datetime(2019, 3, 13),
+    'LINK': datetime(2019, 6, 27),
+    'ADA': datetime(2021, 3, 18),
+}
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime(DATE_FORMAT)
+
+
+def _parse_time(value: str) -> datetime:
+    """Parse iso dates sent by the client, treating naive dates as UTC"""
+    return datetime.fromisoformat(value.replace('Z', '').replace('T', ' '))
+
+
+def _timestamp(dt: datetime) -> int:
+    return calendar.timegm(dt.utctimetuple())
+
+
+class MockData:
+    """
+    Deterministic products, accounts, orders and ledger entries.
+
+    Parameters
+    ----------
+    seed : int, Optional
+    order_count : int, Optional
+        Number of historical orders generated. Each one adds three ledger
+        entries. Default=500
+    now : datetime, Optional
+        Frozen exchange time. Generated orders end here and the ticker,
+        stats and time endpoints report it. Default=DEFAULT_NOW
+    """
+
+    PROFILE_ID = '9a0445ac-7d5e-4261-a8cb-5840fd655b48'
+
+    def __init__(self, seed: int = 0, order_count: int = 500, now=None):
+        self.random = random.Random(seed)
+        self.seed = seed
+        self.now = now or DEFAULT_NOW
+        self._trades = {}
+        self.lock = threading.Lock()
+        self.products = self._build_products()
+        self.currencies = self._build_currencies()
+        self.accounts = self._build_accounts()
+        # records are kept oldest first, the handlers serve them newest first
+        self.orders = []
+        self.ledgers = {account['id']: [] for account in self.accounts.values()}
+        self._ledger_ids = 0
+
+        for i in range(order_count):
+            created_at = self.now - timedelta(minutes=37 * (order_count - i))
+            product = self.random.choice(self.products)
+            side = self.random.choice(['buy', 'sell'])
+            self._fill_order(product, side, created_at, funds=None, size=None)
+
+    def _build_products(self):
+        products = []
+        for base in BASE_PRICES:
+            for quote in QUOTE_CURRENCIES:
+                if base == quote:
+                    continue
+                products.append({
+                    'id': f'{base}-{quote}',
+                    'base_currency': base,
+                    'quote_currency': quote,
+                    'base_min_size': '0.0001',
+                    'base_max_size': '10000',
+                    'quote_increment': '0.01' if quote == 'USD' else '0.00000001',
+                    'base_increment': '0.00000001',
+                    'display_name': f'{base}/{quote}',
+                    'min_market_funds': '10' if quote == 'USD' else '0.0001',
+                    'max_market_funds': '1000000' if quote == 'USD' else '100',
+                    'margin_enabled': False,
+                    'fx_stablecoin': False,
+                    'max_slippage_percentage': '0.10000000',
+                    'post_only': False,
+                    'limit_only': False,
+                    'cancel_only': False,
+                    'trading_disabled': False,
+                    'status': 'online',
+                    'status_message': '',
+                    'auction_mode': False,
+                })
+        return products
+
+    def _build_currencies(self):
+        return [
+            {
+                'id': symbol,
+                'name': symbol.title(),
+                'min_size': '0.00000001' if symbol != 'USD' else '0.01',
+                'status': 'online',
+                'message': '',
+                'max_precision': '0.00000001' if symbol != 'USD' else '0.01',
+                'convertible_to': [],
+                'details': {'type': 'fiat' if symbol == 'USD' else 'crypto'},
+            }
+            for symbol in ['USD', *BASE_PRICES]
+        ]
+
+    def _build_accounts(self):
+        return {
+            currency['id']: {
+                'id': str(uuid.UUID(int=self.random.getrandbits(128))),
+                'currency': currency['id'],
+                'balance': '1000000.0000000000000000' if currency['id'] == 'USD'
+                           else '1000.0000000000000000',
+                'available': '1000000.0000000000000000' if currency['id'] == 'USD'
+                             else '1000.0000000000000000',
+                'hold': '0.0000000000000000',
+                'profile_id': MockData.PROFILE_ID,
+                'trading_enabled': True,
+            }
+            for currency in self.currencies
+        }
+
+    def price(self, product_id: str, at: datetime = None) -> float:
+        """Smooth deterministic price path for a product"""
+        base, quote = product_id.split('-')
+        t = _timestamp(at or self.now) / 86_400
+        usd = BASE_PRICES[base] * (1 + 0.2 * math.sin(t / 30 + len(base)))
+        if quote == 'USD':
+            return usd
+        return usd / (BASE_PRICES[quote] * (1 + 0.2 * math.sin(t / 30 + len(quote))))
+
+    def trades(self, product_id: str) -> list:
+        """Public trades of the last day before now, oldest first"""
+        with self.lock:
+            if product_id not in self._trades:
+                rng = random.Random(f'{self.seed}:{product_id}')
+                offsets = sorted(rng.uniform(0, 86_400)
+                                 for _ in range(TRADES_PER_PRODUCT))
+                rows = []
+                for trade_id, offset in enumerate(offsets, start=1):
+                    at = self.now - timedelta(seconds=86_400 - offset)
+                    price = self.price(product_id, at) * (1 + rng.uniform(-5e-4, 5e-4))
+                    rows.append({
+                        'time': _iso(at),
+                        'trade_id': trade_id,
+                        'price': f'{price:.8f}',
+                        'size': f'{rng.uniform(0.0001, 0.5):.8f}',
+                        'side': rng.choice(['buy', 'sell']),
+                    })
+                self._trades[product_id] = rows
+            return self._trades[product_id]
+
+    def candles(self, product_id: str, start: datetime, end: datetime,
+                granularity: int):
+        """Candles between start and end, newest first, like the real api"""
+        listed = LISTING_DATES[product_id.split('-')[0]]
+        first = max(_timestamp(start), _timestamp(listed))
+        first += -first % granularity
+        rows = []
+        for ts in range(first, _timestamp(end) + 1, granularity):
+            at = datetime.utcfromtimestamp(ts)
+            open_ = self.price(product_id, at)
+            close = self.price(product_id, at + timedelta(seconds=granularity))
+            spread = abs(open_ - close) + open_ * 0.001
+            rows.append([
+                ts,
+                round(min(open_, close) - spread, 8),
+                round(max(open_, close) + spread, 8),
+                round(open_, 8),
+                round(close, 8),
+                round(10 + (ts // granularity) % 97 * 1.37, 8),
+            ])
+        rows.reverse()
+        return rows
+
+    def _fill_order(self, product, side, created_at, funds, size):
+        """Create a filled market order and its ledger entries"""
+        product_id = product['id']
+        price = self.price(product_id, created_at)
+        if funds is None and size is None:
+            size = round(self.random.uniform(0.001, 2) * 100 / price, 8)
+            funds = size * price if side == 'buy' else None
+        if size is None:
+            size = round(float(funds) * 0.995 / price, 8)
+        size = float(size)
+        executed_value = size * price
+        fee = round(executed_value * 0.005, 8)
+        order_id = str(uuid.UUID(int=self.random.getrandbits(128)))
+        trade_id = len(self.orders) + 1
+        done_at = created_at + timedelta(milliseconds=150)
+
+        order = {
+            'id': order_id,
+            'size': f'{size:.8f}',
+            'product_id': product_id,
+            'profile_id': MockData.PROFILE_ID,
+            'side': side,
+            'type': 'market',
+            'post_only': False,
+            'created_at': _iso(created_at),
+            'done_at': _iso(done_at),
+            'done_reason': 'filled',
+            'fill_fees': f'{fee:.16f}',
+            'filled_size': f'{size:.8f}',
+            'executed_value': f'{executed_value:.16f}',
+            'status': 'done',
+            'settled': True,
+        }
+        if side == 'buy' and funds is not None:
+            order['funds'] = f'{float(funds):.16f}'
+            order['specified_funds'] = f'{float(funds):.16f}'
+        self.orders.append(order)
+
+        base = self.accounts[product['base_currency']]
+        quote = self.accounts[product['quote_currency']]
+        sign = 1 if side == 'buy' else -1
+        details = {'order_id': order_id, 'trade_id': str(trade_id),
+                   'product_id': product_id}
+        self._post_ledger(base, sign * size, 'match', done_at, details)
+        self._post_ledger(quote, -sign * executed_value, 'match', done_at, details)
+        self._post_ledger(quote, -fee, 'fee', done_at, details)
+        return order
+
+    def _post_ledger(self, account, amount, entry_type, created_at, details):
+        balance = float(account['balance']) + amount
+        account['balance'] = f'{balance:.16f}'
+        account['available'] = account['balance']
+        self._ledger_ids += 1
+        self.ledgers[account['id']].append({
+            'id': str(self._ledger_ids),
+            'amount': f'{amount:.16f}',
+            'balance': account['balance'],
+            'created_at': _iso(created_at),
+            'type': entry_type,
+            'details': details,
+        })
+
+    def place_order(self, payload: dict):
+        product = next(
+            (p for p in self.products if p['id'] == payload.get('product_id')),
+            None
+        )
+        if product is None:
+            raise ValueError('Product not found')
+        if payload.get('side') not in ('buy', 'sell'):
+            raise ValueError('Invalid side')
+
+        with self.lock:
+            return self._fill_order(
+                product,
+                payload['side'],
+                self.now,
+                funds=payload.get('funds'),
+                size=payload.get('size')
+            )
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    server_version = 'MockExchange/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _send(self, status, body, headers={}):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        if (self.server.exchange.compress
+                and 'gzip' in self.headers.get('Accept-Encoding', '')):
+            payload = gzip.compress(payload)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self, method):
+        exchange = self.server.exchange
+        url = urlparse(self.path)
+        path = url.path.strip('/')
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        exchange._record(method, path)
+
+        delay = exchange._latency()
+        if delay:
+            time.sleep(delay)
+
+        if exchange._inject_rate_limit():
+            return self._send(429, {'message': 'Rate limit exceeded'})
+        if exchange._inject_error():
+            return self._send(500, {'message': 'Internal server error'})
+
+        for route_method, pattern, handler, private in exchange.routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                if private and 'CB-ACCESS-KEY' not in self.headers:
+                    return self._send(401, {'message': 'invalid signature'})
+                if private and exchange._skewed(self.headers['CB-ACCESS-TIMESTAMP']):
+                    return self._send(401, {'message': 'request timestamp expired'})
+                try:
+                    return handler(self, query, *match.groups())
+                except ValueError as e:
+                    return self._send(400, {'message': str(e)})
+
+        self._send(404, {'message': 'NotFound'})
+
+    def _json_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+
+def _paginate(handler, rows, query):
+    """Serve rows (oldest first) newest first with a cb-after cursor.
+
+    The cursor is the position of the oldest row sent, so it stays valid
+    when new rows are appended between page requests. Like the real api,
+    a cursor past the oldest row returns an empty page.
+    """
+    limit = int(query.get('limit', DEFAULT_PAGE_LIMIT))
+    end = int(query['after']) if query.get('after') else len(rows)
+    start = max(0, end - limit)
+    handler._send(200, rows[start:end][::-1], {'cb-after': str(start)})
+
+
+class MockExchange:
+    """
+    Runs the mock api on a background thread.
+
+    Parameters
+    ----------
+    port : int, Optional
+        Port to bind. Default=0 picks a free port.
+    latency : float or tuple, Optional
+        Seconds added to every response, or a (min, max) range.
+    error_rate : float, Optional
+        Probability that a request fails with a 500.
+    rate_limit_rate : float, Optional
+        Probability that a request is rejected with a 429.
+    max_requests_per_second : float, Optional
+        Enforces a real rate limit, answering 429 once exceeded.
+    seed : int, Optional
+    order_count : int, Optional
+    now : datetime, Optional
+        See MockData.
+    max_clock_skew : float, Optional
+        Reject private requests whose CB-ACCESS-TIMESTAMP is further than
+        this many seconds from the mock's clock, like the real api does
+        after 30 seconds. Default=None accepts any timestamp.
+    compress : bool, Optional
+        gzip response bodies for clients that accept it. Default=False
+
+    Attributes
+    ----------
+    url : str
+        Base url to pass to PublicAPI / AuthAPI / API.
+    request_log : list
+        (method, path) of every request received.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency=0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        max_requests_per_second: float = None,
+        seed: int = 0,
+        order_count: int = 500,
+        now: datetime = None,
+        max_clock_skew: float = None,
+        compress: bool = False
+    ):
+        self.latency = latency
+        self.max_clock_skew = max_clock_skew
+        self.compress = compress
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rate_limiter = (
+            RateLimiter(max_requests_per_second)
+            if max_requests_per_second else None
+        )
+        self.data = MockData(seed=seed, order_count=order_count, now=now)
+        self.request_log = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.routes = self._build_routes()
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._server.daemon_threads = True
+        self._server.exchange = self
+        self._thread = None
+
+    @property
+    def now(self) -> datetime:
+        return self.data.now
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _record(self, method, path):
+        with self._lock:
+            self.request_log.append((method, path))
+
+    def _skewed(self, timestamp: str) -> bool:
+        if self.max_clock_skew is None:
+            return False
+        return abs(float(timestamp) - _timestamp(self.now)) > self.max_clock_skew
+
+    def _latency(self) -> float:
+        if isinstance(self.latency, (tuple, list)):
+            with self._lock:
+                return self._random.uniform(*self.latency)
+        return self.latency
+
+    def _inject_error(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _inject_rate_limit(self) -> bool:
+        if self.rate_limiter is not None and not self.rate_limiter.try_acquire():
+            return True
+        with self._lock:
+            return self._random.random() < self.rate_limit_rate
+
+    def _build_routes(self):
+        data = self.data
+
+        def product(product_id):
+            for p in data.products:
+                if p['id'] == product_id:
+                    return p
+            raise ValueError('NotFound')
+
+        def products(h, q):
+            h._send(200, data.products)
+
+        def single_product(h, q, product_id):
+            h._send(200, product(product_id))
+
+        def currencies(h, q):
+            h._send(200, data.currencies)
+
+        def server_time(h, q):
+            h._send(200, {'iso': _iso(data.now), 'epoch': _timestamp(data.now)})
+
+        def ticker(h, q, product_id):
+            product(product_id)
+            now = data.now
+            price = data.price(product_id, now)
+            h._send(200, {
+                'trade_id': _timestamp(now),
+                'price': f'{price:.8f}',
+                'size': '0.01000000',
+                'bid': f'{price * 0.9999:.8f}',
+                'ask': f'{price * 1.0001:.8f}',
+                'volume': '12345.67890000',
+                'time': _iso(now),
+            })
+
+        def stats(h, q, product_id):
+            product(product_id)
+            now = data.now
+            prices = [data.price(product_id, now - timedelta(hours=i))
+                      for i in range(24)]
+            h._send(200, {
+                'open': f'{prices[-1]:.8f}',
+                'high': f'{max(prices):.8f}',
+                'low': f'{min(prices):.8f}',
+                'volume': '26185.51325269',
+                'last': f'{prices[0]:.8f}',
+                'volume_30day': '1019451.11188405',
+            })
+
+        def trades(h, q, product_id):
+            product(product_id)
+            _paginate(h, data.trades(product_id), q)
+
+        def candles(h, q, product_id):
+            product(product_id)
+            granularity = int(q.get('granularity', 86_400))
+            if granularity not in (60, 300, 900, 3_600, 21_600, 86_400):
+                raise ValueError('Unsupported granularity')
+            end = _parse_time(q['end']) if 'end' in q else data.now
+            start = (_parse_time(q['start']) if 'start' in q
+                     else end - timedelta(seconds=granularity * (MAX_CANDLES - 1)))
+            span = (_timestamp(end) - _timestamp(start)) // granularity + 1
+            if span > MAX_CANDLES:
+                raise ValueError('granularity too small for the requested time range')
+            h._send(200, data.candles(product_id, start, end, granularity))
+
+        def orders(h, q):
+            rows = data.orders
+            status = q.get('status', 'all')
+            if status != 'all':
+                rows = [o for o in rows if o['status'] == status]
+            _paginate(h, rows, q)
+
+        def place_order(h, q):
+            h._send(200, data.place_order(h._json_body()))
+
+        def accounts(h, q):
+            h._send(200, list(data.accounts.values()))
+
+        def account(h, q, account_id):
+            for a in data.accounts.values():
+                if a['id'] == account_id:
+                    return h._send(200, a)
+            h._send(404, {'message': 'NotFound'})
+
+        def ledger(h, q, account_id):
+            if account_id not in data.ledgers:
+                return h._send(404, {'message': 'NotFound'})
+            _paginate(h, data.ledgers[account_id], q)
+
+        def profiles(h, q, profile_id=None):
+            profile = {
+                'id': MockData.PROFILE_ID,
+                'user_id': '59c9f79cb6ea17011a46b3e2',
+                'name': 'default',
+                'active': True,
+                'is_default': True,
+                'created_at': '2019-03-23T21:14:19.442971Z',
+            }
+            h._send(200, profile if profile_id else [profile])
+
+        def payment_methods(h, q):
+            h._send(200, [
+                {'id': 'usd-wallet', 'type': 'fiat_account',
+                 'name': 'USD Wallet', 'currency': 'USD'},
+                {'id': 'bank-0000', 'type': 'ach_bank_account',
+                 'name': 'Mock Bank ******0000', 'currency': 'USD'},
+            ])
+
+        def deposit(h, q):
+            body = h._json_body()
+            h._send(200, {'id': str(uuid.uuid4()), 'amount': body['amount'],
+                          'currency': body.get('currency', 'USD')})
+
+        routes = [
+            ('GET', r'products', products, False),
+            ('GET', r'products/([^/]+)', single_product, False),
+            ('GET', r'products/([^/]+)/ticker', ticker, False),
+            ('GET', r'products/([^/]+)/stats', stats, False),
+            ('GET', r'products/([^/]+)/candles', candles, False),
+            ('GET', r'products/([^/]+)/trades', trades, False),
+            ('GET', r'currencies', currencies, False),
+            ('GET', r'time', server_time, False),
+            ('GET', r'orders', orders, True),
+            ('POST', r'orders', place_order, True),
+            ('GET', r'accounts', accounts, True),
+            ('GET', r'accounts/([^/]+)', account, True),
+            ('GET', r'accounts/([^/]+)/ledger', ledger, True),
+            ('GET', r'profiles', profiles, True),
+            ('GET', r'profiles/([^/]+)', profiles, True),
+            ('GET', r'payment-methods', payment_methods, True),
+            ('POST', r'deposits/payment-method', deposit, True),
+        ]
+        return [(method, re.compile(f'^{pattern}$'), handler, private)
+                for method, pattern, handler, private in routes]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a mock coinbase pro api.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--max-requests-per-second', type=float)
+    parser.add_argument('--compress', action='store_true')
+    parser.add_argument('--order-count', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--now', type=datetime.fromisoformat,
+                        help='Frozen exchange time. Default=2021-06-01')
+    args = parser.parse_args(argv)
+
+    exchange = MockExchange(
+        port=args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_requests_per_second=args.max_requests_per_second,
+        seed=args.seed,
+        order_count=args.order_count,
+        now=args.now,
+        compress=args.compress
+    )
+    print(f'Mock exchange listening on {exchange.url}')
+    try:
+        exchange._server.serve_forever()
+    except KeyboardInterrupt:
+        exchange.stop()
+
+
+if __name__ == '__main__':
+    main()
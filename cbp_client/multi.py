@@ -0,0 +1,219 @@
+'''
+Run authenticated calls across many api keys at once.
+
+Each api key of Coinbase Pro belongs to one profile, so managing many
+profiles means holding many credential sets. MultiAuthAPI builds one
+AuthAPI per key in parallel, gives each its own rate limiter, loads
+products and currencies once for all of them, and fans accounts, orders
+and account_history out over a thread pool. Results come back as one
+stream of Tagged(name, item) rows.
+
+Example
+-------
+>>> multi = MultiAuthAPI({'main': main_credentials, 'hedge': hedge_credentials})
+>>> for tagged in multi.orders('2021-01-01', order_by='created_at'):
+...     print(tagged.name, tagged.item['id'])
+'''
+import heapq
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Generator
+
+from cbp_client.api_authenticated import AuthAPI
+from cbp_client.api_public import PublicAPI
+from cbp_client.rate_limit import RateLimiter
+
+Tagged = namedtuple('Tagged', ['name', 'item'])
+
+PRIVATE_RATE = 15
+_DONE = object()
+
+
+class FanOutError(Exception):
+    """
+    Raised after a fan out finished when some clients failed.
+
+    errors maps each failed client name to its exception. Rows of the
+    clients that succeeded were already yielded.
+    """
+
+    def __init__(self, errors: dict):
+        super().__init__(f'{len(errors)} client(s) failed: ' + ', '.join(
+            f'{name}: {error}' for name, error in errors.items()))
+        self.errors = errors
+
+
+class MultiAuthAPI:
+    """
+    Fan out of AuthAPI calls over many credential sets.
+
+    Parameters
+    ----------
+    credentials : dict
+        {name: {'api_key': ..., 'secret': ..., 'passphrase': ...}}. Names tag
+        every result.
+    rate : float, Optional
+        Requests per second allowed per key, each key has its own token
+        bucket. Default=15, the private endpoint limit.
+    workers : int, Optional
+        Threads running clients concurrently. Default=8
+    **api_kwargs
+        Passed to every AuthAPI, e.g. base_url, sandbox_mode or numeric.
+
+    Attributes
+    ----------
+    clients : dict
+        {name: AuthAPI}
+    """
+
+    def __init__(self, credentials: Dict[str, dict], rate: float = PRIVATE_RATE,
+                 workers: int = 8, **api_kwargs):
+        if not credentials:
+            raise ValueError('At least one set of credentials is required')
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+        shared = PublicAPI(
+            sandbox_mode=api_kwargs.get('sandbox_mode', False),
+            base_url=api_kwargs.get('base_url'),
+            cache=api_kwargs.get('cache')
+        )
+        products = self._pool.submit(lambda: shared._products)
+
+        def connect(item):
+            name, creds = item
+            return name, AuthAPI(creds, rate_limiter=RateLimiter(rate), **api_kwargs)
+
+        self.clients = dict(self._pool.map(connect, credentials.items()))
+        for client in self.clients.values():
+            client._product_list = products.result()
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def each(self, fn: Callable[[AuthAPI], object]) -> Dict[str, object]:
+        """Call fn(client) for every client concurrently. Returns {name: result}."""
+        futures = {name: self._pool.submit(fn, client)
+                   for name, client in self.clients.items()}
+        results, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+        if errors:
+            raise FanOutError(errors)
+        return results
+
+    def refresh_accounts(self):
+        self.each(AuthAPI.refresh_accounts)
+
+    def accounts(self, currency: str = None) -> Generator:
+        """Tagged accounts of every client, from the cached snapshots"""
+        for name, client in self.clients.items():
+            accounts = client.accounts(currency)
+            if currency is None:
+                yield from (Tagged(name, account) for account in accounts)
+            elif accounts is not None:
+                yield Tagged(name, accounts)
+
+    def balances(self, symbol: str) -> Dict[str, object]:
+        """{name: balance} of the clients holding an account in symbol"""
+        return {tagged.name: tagged.item.balance for tagged in self.accounts(symbol)}
+
+    def profiles(self) -> Dict[str, list]:
+        """{name: profiles} visible to each key"""
+        return self.each(AuthAPI.get_profiles)
+
+    def orders(self, start_date: str, end_date: str = None, status: str = None,
+               settled: bool = None, order_by: str = None) -> Generator:
+        """
+        Orders of every client as one tagged stream.
+
+        See AuthAPI.orders. With order_by, e.g. 'created_at', rows are
+        merged newest first on that field, otherwise they come in the order
+        they arrive.
+        """
+        return self.stream(
+            lambda client: client.orders(start_date, end_date, status, settled),
+            order_by
+        )
+
+    def account_history(self, symbol: str, start_date: str, end_date: str = None,
+                        order_by: str = None) -> Generator:
+        """
+        Ledger entries in symbol of every client holding it, as one tagged
+        stream. See orders for order_by.
+        """
+        clients = [name for name, client in self.clients.items()
+                   if client.accounts(symbol) is not None]
+        return self.stream(
+            lambda client: client.account_history(symbol, start_date, end_date),
+            order_by,
+            clients
+        )
+
+    def stream(self, fn: Callable[[AuthAPI], object], order_by: str = None,
+               names=None) -> Generator:
+        """
+        Run fn(client) for every client and merge the rows it yields.
+
+        Each client is read on a worker thread into a queue, so slow clients
+        do not hold back fast ones. When the caller stops early the workers
+        stop at their next row. FanOutError is raised at the end if any
+        client failed.
+        """
+        names = list(self.clients) if names is None else names
+        stop = threading.Event()
+        errors = {}
+        if order_by is None:
+            shared = queue.Queue()
+            queues = dict.fromkeys(names, shared)
+        else:
+            queues = {name: queue.Queue() for name in names}
+
+        def drain(name):
+            out = queues[name]
+            try:
+                for row in fn(self.clients[name]):
+                    if stop.is_set():
+                        return
+                    out.put(Tagged(name, row))
+            except Exception as e:
+                errors[name] = e
+            finally:
+                out.put(_DONE)
+
+        def read(out, streams=1):
+            while streams:
+                tagged = out.get()
+                if tagged is _DONE:
+                    streams -= 1
+                else:
+                    yield tagged
+
+        for name in names:
+            self._pool.submit(drain, name)
+
+        try:
+            if order_by is None:
+                yield from read(shared, len(names))
+            else:
+                yield from heapq.merge(
+                    *(read(queues[name]) for name in names),
+                    key=lambda tagged: tagged.item[order_by],
+                    reverse=True
+                )
+        finally:
+            stop.set()
+
+        if errors:
+            raise FanOutError(errors)
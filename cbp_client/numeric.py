@@ -0,0 +1,98 @@
+'''Exact numeric handling of exchange prices, sizes and balances'''
+from decimal import Decimal, ROUND_DOWN
+from typing import Iterable, List
+
+NUMERIC_MODES = (None, 'decimal')
+
+
+def to_decimal(value) -> Decimal:
+    """Convert an exchange value to Decimal without passing through float"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def check_numeric_mode(numeric):
+    if numeric not in NUMERIC_MODES:
+        raise ValueError(
+            f'Invalid numeric mode: {numeric}. Choose from: {NUMERIC_MODES}')
+    return numeric
+
+
+class Quantizer:
+    """
+    Fixed point conversion for one increment, e.g. a product's base_increment.
+
+    Values are held as integer multiples of the increment ("units"), so
+    sums and comparisons are exact integer math and converting back never
+    produces a size the exchange rejects for precision.
+
+    Example
+    -------
+    >>> q = Quantizer('0.01')
+    >>> q.units('10.019')
+    1001
+    >>> q.quantize('10.019')
+    Decimal('10.01')
+    >>> q.quantize_many(['1.005', '2.999'])
+    [Decimal('1.00'), Decimal('2.99')]
+
+    Parameters
+    ----------
+    increment : str
+        Smallest step allowed, for example '0.00000001'.
+    rounding : str, Optional
+        A decimal rounding mode. Default=ROUND_DOWN so sizes never exceed
+        what the caller can afford.
+    """
+
+    def __init__(self, increment, rounding: str = ROUND_DOWN):
+        self.increment = to_decimal(increment)
+        if self.increment <= 0:
+            raise ValueError(f'Increment must be positive: {increment}')
+        self.rounding = rounding
+
+    def units(self, value, rounding: str = None) -> int:
+        """Number of whole increments in value"""
+        steps = to_decimal(value) / self.increment
+        return int(steps.to_integral_value(rounding=rounding or self.rounding))
+
+    def from_units(self, units: int) -> Decimal:
+        return (self.increment * units).quantize(self.increment)
+
+    def quantize(self, value, rounding: str = None) -> Decimal:
+        return self.from_units(self.units(value, rounding))
+
+    def is_valid(self, value) -> bool:
+        """True if value is already an exact multiple of the increment"""
+        return to_decimal(value) % self.increment == 0
+
+    def units_many(self, values: Iterable, rounding: str = None) -> List[int]:
+        increment = self.increment
+        rounding = rounding or self.rounding
+        return [
+            int((to_decimal(v) / increment).to_integral_value(rounding=rounding))
+            for v in values
+        ]
+
+    def quantize_many(self, values: Iterable, rounding: str = None) -> List[Decimal]:
+        increment = self.increment
+        return [(increment * u).quantize(increment)
+                for u in self.units_many(values, rounding)]
+
+    def __repr__(self):
+        return f'Quantizer({str(self.increment)!r})'
+
+
+def product_quantizers(product) -> tuple:
+    """
+    Quantizers for a product's base size and quote price / funds.
+
+    Returns
+    -------
+    tuple
+        (base Quantizer, quote Quantizer)
+    """
+    return Quantizer(product.base_increment), Quantizer(product.quote_increment)
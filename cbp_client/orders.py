@@ -0,0 +1,157 @@
+'''Client side validation of orders against cached product rules'''
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+from typing import Callable, Iterable
+
+from cbp_client.numeric import Quantizer, to_decimal
+from cbp_client.product import Product
+
+RULES_TTL = 300
+UNKNOWN_RELOAD_INTERVAL = 30
+
+
+class OrderRejected(ValueError):
+    """Raised when an order would be rejected by the exchange"""
+
+
+OrderRules = namedtuple('OrderRules', ['product_id',
+                                       'base',
+                                       'quote',
+                                       'min_market_funds',
+                                       'max_market_funds',
+                                       'base_min_size',
+                                       'base_max_size',
+                                       'blocked_reason'])
+
+
+def _optional_decimal(product, field):
+    value = getattr(product, field, None)
+    return None if value in (None, '') else to_decimal(value)
+
+
+def build_rules(product: Product) -> OrderRules:
+    """Precompute quantizers and limits for market orders on product"""
+    blocked_reason = None
+    if str(getattr(product, 'status', 'online')).lower() != 'online':
+        blocked_reason = f'status is {product.status}'
+    elif getattr(product, 'trading_disabled', False):
+        blocked_reason = 'trading is disabled'
+    elif getattr(product, 'cancel_only', False):
+        blocked_reason = 'product is cancel only'
+    elif getattr(product, 'limit_only', False):
+        blocked_reason = 'product is limit only'
+    elif getattr(product, 'post_only', False):
+        blocked_reason = 'product is post only'
+
+    return OrderRules(
+        product_id=product.id,
+        base=Quantizer(product.base_increment),
+        quote=Quantizer(product.quote_increment),
+        min_market_funds=_optional_decimal(product, 'min_market_funds'),
+        max_market_funds=_optional_decimal(product, 'max_market_funds'),
+        base_min_size=_optional_decimal(product, 'base_min_size'),
+        base_max_size=_optional_decimal(product, 'base_max_size'),
+        blocked_reason=blocked_reason
+    )
+
+
+class OrderValidator:
+    """
+    Rejects or rounds market orders locally before they reach the exchange.
+
+    Rules are built per product from the product metadata the client
+    already holds, so each check is a few Decimal operations and never
+    spends a request from the private rate limit. They are rebuilt from
+    reloaded products once they are older than ttl, or when an order names
+    a product they do not know. Orders for products still unknown after a
+    reload are passed through unchanged for the exchange to judge.
+
+    Parameters
+    ----------
+    products : callable
+        Returns the list of Product objects, for example PublicAPI.products.
+    reload : callable, Optional
+        Refetches the products products returns, for example
+        PublicAPI.refresh_products. Without it rules are only rebuilt from
+        whatever products returns. Default=None
+    ttl : float, Optional
+        Seconds before rules are rebuilt. Default=300
+    """
+
+    def __init__(self, products: Callable[[], Iterable[Product]],
+                 reload: Callable[[], None] = None, ttl: float = RULES_TTL):
+        self._products = products
+        self._reload = reload
+        self.ttl = ttl
+        self._rules = {}
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def _rebuild(self, reload: bool):
+        if reload and self._reload is not None:
+            self._reload()
+        self._rules = {p.id.upper(): build_rules(p) for p in self._products()}
+        self._built_at = time.monotonic()
+
+    def rules(self, product_id: str) -> OrderRules:
+        """Rules of product_id, None if the exchange does not list it"""
+        product_id = product_id.upper()
+        built_at = self._built_at
+        age = float('inf') if built_at is None else time.monotonic() - built_at
+        if age > self.ttl or \
+                (product_id not in self._rules and age > UNKNOWN_RELOAD_INTERVAL):
+            with self._lock:
+                if self._built_at is built_at:
+                    self._rebuild(reload=built_at is not None)
+        return self._rules.get(product_id)
+
+    def market_buy(self, product_id: str, funds, auto_round=False) -> Decimal:
+        """Returns funds ready to send or raises OrderRejected"""
+        rules = self._check_tradeable(product_id)
+        if rules is None:
+            return funds
+        funds = self._fit_increment(to_decimal(funds), rules.quote, auto_round,
+                                    'funds', rules.product_id)
+        self._check_range(funds, rules.min_market_funds, rules.max_market_funds,
+                          'funds', rules.product_id)
+        return funds
+
+    def market_sell(self, product_id: str, size, auto_round=False) -> Decimal:
+        """Returns size ready to send or raises OrderRejected"""
+        rules = self._check_tradeable(product_id)
+        if rules is None:
+            return size
+        size = self._fit_increment(to_decimal(size), rules.base, auto_round,
+                                   'size', rules.product_id)
+        self._check_range(size, rules.base_min_size, rules.base_max_size,
+                          'size', rules.product_id)
+        return size
+
+    def _check_tradeable(self, product_id):
+        rules = self.rules(product_id)
+        if rules is not None and rules.blocked_reason is not None:
+            raise OrderRejected(
+                f'Market orders not accepted for {rules.product_id}: '
+                f'{rules.blocked_reason}')
+        return rules
+
+    @staticmethod
+    def _fit_increment(value, quantizer, auto_round, name, product_id):
+        if value <= 0:
+            raise OrderRejected(f'{name} must be positive. {name}:{value}')
+        if not auto_round and not quantizer.is_valid(value):
+            raise OrderRejected(
+                f'{name} {value} is not a multiple of {quantizer.increment} '
+                f'for {product_id}')
+        return quantizer.quantize(value)
+
+    @staticmethod
+    def _check_range(value, minimum, maximum, name, product_id):
+        if minimum is not None and value < minimum:
+            raise OrderRejected(
+                f'{name} {value} is below the minimum {minimum} for {product_id}')
+        if maximum is not None and value > maximum:
+            raise OrderRejected(
+                f'{name} {value} is above the maximum {maximum} for {product_id}')
@@ -1,10 +1,10 @@
 '''Class for handling paginated endpoints'''
 from datetime import datetime
 from cbp_client.auth import Auth
+from cbp_client.helpers import parse_time
 import time
 
 
-COINBASE_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
 
 
 def handle_pagination(
@@ -13,7 +13,9 @@ def handle_pagination(
     url: str,
     params: dict,
     auth: Auth,
-    get_method
+    get_method,
+    pause=None,
+    rows=None
 ):
     """Help manage paginated coinbase pro endpoints
 
@@ -24,19 +26,27 @@ def handle_pagination(
         url : str
         params : dict
         auth : Auth
+            None for public endpoints such as products/{id}/trades
         get_method : func
             Function used to call coinbase api. Should return response obj
             and take in params, url, and auth.
+        pause : func
+            Called with the seconds to wait between pages. Default=time.sleep
+        rows : func
+            Turns a page response into its rows. Default parses the whole
+            body with r.json(), cbp_client.streaming.iter_rows parses rows
+            as they download.
 
     Example usage:
         pe = GetPaginatedEndpoint()
         data = pe.walk_pages()
     """
 
-    # assumes all paginated endpoints require valid auth
-    if not isinstance(auth, Auth):
+    if auth is not None and not isinstance(auth, Auth):
         raise ValueError(f'Invalid Auth argument: {auth}')
 
+    pause = pause or time.sleep
+    rows = rows or (lambda r: r.json())
     end_cursor = None
     start_date = datetime.fromisoformat(start_date)
 
@@ -45,17 +55,19 @@ def handle_pagination(
         params = {**params, 'after': end_cursor}
         r = get_method(url, params, auth=auth)
         end_cursor = r.headers.get('cb-after', None)
-        page = r.json()
 
-        if len(page) == 0:
-            break
+        earliest_date = None
+        for row in rows(r):
+            if earliest_date is None or row[date_field] < earliest_date:
+                earliest_date = row[date_field]
+            yield row
 
-        yield from page
+        if earliest_date is None:
+            break
 
-        earliest_date = min(row[date_field] for row in page)
-        earliest_date = datetime.strptime(earliest_date, COINBASE_DATE_FORMAT)
+        earliest_date = parse_time(earliest_date)
 
         if earliest_date <= start_date:
             break
 
-        time.sleep(0.1)
+        pause(0.1)
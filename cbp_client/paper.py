@@ -0,0 +1,283 @@
+'''
+Paper trading against stored candles or trades.
+
+PaperTradingAPI has the order and balance calls of AuthAPI (market_buy,
+market_sell, accounts and balance) and fills market orders locally at the
+last price it was given, with a fee and slippage. Backtest drives it
+through columnar data in timestamp order, so a strategy written against
+AuthAPI runs unchanged over years of minute bars.
+
+Example
+-------
+>>> data = ParallelBackfill(PublicAPI()).run(['BTC-USD', 'ETH-USD'], '2020-01-01',
+...                                          '2021-01-01', 'ONE_MINUTE')
+>>> paper = PaperTradingAPI({'USD': 10_000}, fee_rate='0.005')
+>>> fast = {p: sma(c.columns().close, 50) for p, c in data.items()}
+>>> def on_bar(product_id, i):
+...     if fast[product_id][i] and paper.price(product_id) > fast[product_id][i]:
+...         paper.market_buy(100, product_id, validate=False)
+>>> Backtest(paper, {p: c.columns() for p, c in data.items()}).run(on_bar)
+>>> paper.value('USD')
+'''
+import heapq
+import itertools
+import json
+import uuid
+from array import array
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, Union
+
+import requests
+
+from cbp_client.accounts import Account, AccountRegistry
+from cbp_client.helpers import parse_time
+from cbp_client.numeric import check_numeric_mode, to_decimal
+from cbp_client.orders import OrderRejected, OrderValidator
+
+EPOCH = datetime(1970, 1, 1)
+PROFILE_ID = 'paper'
+
+TradeColumns = namedtuple('TradeColumns', ['time', 'price', 'size'])
+
+
+def trade_columns(trades: Iterable[dict]) -> TradeColumns:
+    """Pack trades from PublicAPI.trades into columns, oldest first"""
+    times, prices, sizes = array('d'), array('d'), array('d')
+    for trade in trades:
+        times.append((parse_time(trade['time']) - EPOCH).total_seconds())
+        prices.append(float(trade['price']))
+        sizes.append(float(trade['size']))
+    if len(times) > 1 and times[0] > times[-1]:
+        times.reverse()
+        prices.reverse()
+        sizes.reverse()
+    return TradeColumns(times, prices, sizes)
+
+
+class PaperTradingAPI:
+    """
+    Simulated account with the trading surface of AuthAPI.
+
+    Market orders fill in full at once at the last price set for the
+    product, moved against the order by slippage. Fees are charged in the
+    quote currency: a buy spends funds including the fee, a sell receives
+    its proceeds less the fee, as on the exchange.
+
+    Orders return a requests.Response with status 200 whose json() is the
+    settled order, as AuthAPI returns the exchange's response. fills holds
+    the same orders as dicts.
+
+    Parameters
+    ----------
+    balances : dict
+        Starting balance per currency, e.g. {'USD': 10000}
+    fee_rate : str, Optional
+        Taker fee as a fraction of the order value. Default='0.005'
+    slippage : str, Optional
+        Fraction the fill price moves against the order. Default='0'
+    products : Callable, Optional
+        Returns the products used to validate orders, e.g.
+        lambda: public_api._products. Without it validate is ignored.
+    numeric : str, Optional
+        When 'decimal', balances are Decimal instead of strings.
+    """
+
+    def __init__(
+        self,
+        balances: Dict[str, Union[str, Decimal]],
+        fee_rate='0.005',
+        slippage='0',
+        products: Callable = None,
+        numeric: str = None
+    ):
+        self.fee_rate = to_decimal(fee_rate)
+        self.slippage = to_decimal(slippage)
+        if self.fee_rate < 0 or self.slippage < 0:
+            raise ValueError(f'Fee rate and slippage must not be negative. '
+                             f'fee_rate:{fee_rate}, slippage:{slippage}')
+        self.numeric = check_numeric_mode(numeric)
+        self.order_validator = OrderValidator(products) if products else None
+        self.registry = AccountRegistry()
+        self.fills = []
+        self.time = None
+        self._prices = {}
+        self._balances = {}
+        for currency, amount in balances.items():
+            self._set_balance(currency, to_decimal(amount))
+
+    def accounts(self, currency: str = None):
+        if currency is None:
+            return list(self.registry.all())
+        return self.registry.by_currency(currency)
+
+    def balance(self, symbol: str) -> Union[str, Decimal]:
+        account = self.accounts(currency=symbol)
+        if account is None:
+            return Decimal(0) if self.numeric == 'decimal' else '0'
+        return account.balance
+
+    def set_price(self, product_id: str, price: float):
+        self._prices[product_id.upper()] = price
+
+    def price(self, product_id: str) -> float:
+        """Last price set for product_id"""
+        return self._prices[product_id.upper()]
+
+    def value(self, quote: str = 'USD') -> Decimal:
+        """
+        Total of all balances in quote at the last prices.
+
+        Currencies without a price against quote are left out.
+        """
+        quote = quote.upper()
+        total = Decimal(0)
+        for currency, amount in self._balances.items():
+            if currency == quote:
+                total += amount
+            elif f'{currency}-{quote}' in self._prices:
+                total += amount * to_decimal(self._prices[f'{currency}-{quote}'])
+        return total
+
+    def market_buy(self, funds, product_id, delay=False, validate=True,
+                   auto_round=False) -> requests.Response:
+        '''Buy with funds of the quote currency, fee included. delay is ignored.'''
+        product_id = product_id.upper()
+        if validate and self.order_validator is not None:
+            funds = self.order_validator.market_buy(product_id, funds, auto_round)
+        funds = to_decimal(funds)
+        base, quote = product_id.split('-')
+        self._check_funds(quote, funds, product_id)
+
+        price = self._fill_price(product_id, 1 + self.slippage)
+        fee = funds * self.fee_rate / (1 + self.fee_rate)
+        size = (funds - fee) / price
+        self._set_balance(quote, self._balances[quote] - funds)
+        self._set_balance(base, self._balances.get(base, Decimal(0)) + size)
+        return self._record('buy', product_id, size, funds - fee, fee, funds=funds)
+
+    def market_sell(self, size, product_id, delay=False, validate=True,
+                    auto_round=False) -> requests.Response:
+        '''Sell size of the base currency for the quote currency. delay is ignored.'''
+        product_id = product_id.upper()
+        if validate and self.order_validator is not None:
+            size = self.order_validator.market_sell(product_id, size, auto_round)
+        size = to_decimal(size)
+        base, quote = product_id.split('-')
+        self._check_funds(base, size, product_id)
+
+        price = self._fill_price(product_id, 1 - self.slippage)
+        executed_value = size * price
+        fee = executed_value * self.fee_rate
+        self._set_balance(base, self._balances[base] - size)
+        self._set_balance(quote, self._balances.get(quote, Decimal(0))
+                          + executed_value - fee)
+        return self._record('sell', product_id, size, executed_value, fee)
+
+    def _fill_price(self, product_id, factor):
+        if product_id not in self._prices:
+            raise OrderRejected(f'{product_id}: no price to fill against yet')
+        return to_decimal(self._prices[product_id]) * factor
+
+    def _check_funds(self, currency, amount, product_id):
+        if amount <= 0:
+            raise OrderRejected(f'{product_id}: amount must be positive, got {amount}')
+        available = self._balances.get(currency, Decimal(0))
+        if amount > available:
+            raise OrderRejected(f'{product_id}: insufficient {currency}, '
+                                f'{amount} > {available}')
+
+    def _set_balance(self, currency, amount):
+        currency = currency.upper()
+        self._balances[currency] = amount
+        balance = amount if self.numeric == 'decimal' else str(amount)
+        hold = Decimal(0) if self.numeric == 'decimal' else '0'
+        self.registry.update(Account(
+            id=f'{PROFILE_ID}-{currency}',
+            currency=currency,
+            balance=balance,
+            available=balance,
+            hold=hold,
+            profile_id=PROFILE_ID,
+            trading_enabled=True
+        ))
+
+    def _record(self, side, product_id, size, executed_value, fee, funds=None):
+        done_at = (None if self.time is None
+                   else datetime.utcfromtimestamp(self.time).isoformat() + 'Z')
+        order = {
+            'id': str(uuid.uuid4()),
+            'product_id': product_id,
+            'side': side,
+            'type': 'market',
+            'size': str(size),
+            'filled_size': str(size),
+            'executed_value': str(executed_value),
+            'fill_fees': str(fee),
+            'status': 'done',
+            'done_reason': 'filled',
+            'settled': True,
+            'created_at': done_at,
+            'done_at': done_at,
+        }
+        if funds is not None:
+            order['funds'] = str(funds)
+        self.fills.append(order)
+        return _order_response(order)
+
+
+def _order_response(order: dict) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r.reason = 'OK'
+    r.headers['Content-Type'] = 'application/json'
+    r._content = json.dumps(order).encode()
+    r.encoding = 'utf-8'
+    return r
+
+
+def _epoch_seconds(times):
+    if len(times) and isinstance(times[0], str):
+        return array('d', ((parse_time(t) - EPOCH).total_seconds() for t in times))
+    return times
+
+
+class Backtest:
+    """
+    Event loop over the columns of one or more products.
+
+    data maps product ids to CandleColumns (to_columns, CandleArray.columns)
+    or TradeColumns (trade_columns), each oldest first. Rows of all
+    products are visited in timestamp order. Before on_bar(product_id, i)
+    is called for row i, the paper account's price for the product is set
+    to the row's close, or trade price, and its clock to the row's time.
+
+    Strategies read other fields straight from the columns by index, and
+    indicators are best computed beforehand with the batch functions of
+    cbp_client.indicators, so the loop itself only moves indexes.
+    """
+
+    def __init__(self, paper: PaperTradingAPI, data: Dict[str, tuple]):
+        self.paper = paper
+        self.data = {product_id.upper(): columns for product_id, columns in data.items()}
+
+    def events(self):
+        """(time, product_id, index) of every row in timestamp order"""
+        streams = []
+        for product_id, columns in self.data.items():
+            times = _epoch_seconds(columns[0])
+            streams.append(zip(times, itertools.repeat(product_id), range(len(times))))
+        if len(streams) == 1:
+            return streams[0]
+        return heapq.merge(*streams)
+
+    def run(self, on_bar: Callable[[str, int], None]) -> PaperTradingAPI:
+        paper = self.paper
+        prices = {product_id: (columns.close if hasattr(columns, 'close') else columns.price)
+                  for product_id, columns in self.data.items()}
+        for time, product_id, i in self.events():
+            paper.time = time
+            paper._prices[product_id] = prices[product_id][i]
+            on_bar(product_id, i)
+        return paper
@@ -0,0 +1,262 @@
+'''
+Latest prices and 24 hour stats shared by many processes through one file.
+
+One publisher process polls the api and writes every product's latest
+ticker price and stats into a fixed layout file mapped into memory. Any
+number of worker processes map the same file read only, so a quote lookup
+is a memory read instead of a request, and the fleet sends one set of
+polls however many workers it runs.
+
+Layout
+------
+A 16 byte header (magic, version, slot count, slot size) is followed by
+one 256 byte slot per product:
+
+    seq           uint64, odd while the slot is being written
+    product_id    16 bytes ascii
+    updated_at    float64 epoch seconds, 0 until first published
+    price, open, high, low, volume, last, volume_30day
+                  32 bytes ascii each, as the api returns them
+
+Slots are a seqlock: the writer makes seq odd, writes the fields and makes
+it even again. A reader copies the slot between two reads of seq and
+retries if they differ or are odd, so it never sees half an update. The
+publisher is the only writer of a board file.
+
+Example
+-------
+>>> publisher = PricePublisher.start_process('/dev/shm/prices', ['BTC-USD', 'ETH-USD'])
+>>> api = PublicAPI(price_board=PriceBoard.open('/dev/shm/prices'))
+>>> api.price('btc')  # read from the board, no request
+'36401.12000000'
+'''
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import Iterable, List
+
+MAGIC = b'CBPB'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+SEQ = struct.Struct('<Q')
+FIELDS = ('price', 'open', 'high', 'low', 'volume', 'last', 'volume_30day')
+STATS_FIELDS = FIELDS[1:]
+BODY = struct.Struct('<16sd' + '32s' * len(FIELDS))
+SLOT_SIZE = SEQ.size + BODY.size
+SPIN_READS = 100
+READ_TIMEOUT = 0.05
+
+Quote = namedtuple('Quote', ['product_id', 'updated_at', *FIELDS])
+
+
+def _encode(value, size) -> bytes:
+    encoded = str(value).encode('ascii')
+    if len(encoded) > size:
+        raise ValueError(f'Value too long for the board: {value}')
+    return encoded
+
+
+def _decode(raw: bytes) -> str:
+    return raw.rstrip(b'\0').decode('ascii') or None
+
+
+class PriceBoard:
+    """
+    Memory mapped board of latest quotes, one slot per product.
+
+    Use PriceBoard.create in the publisher and PriceBoard.open in readers.
+
+    Parameters
+    ----------
+    path : str
+    writable : bool
+    max_age : float, Optional
+        Quotes older than this many seconds are reported missing, so
+        readers fall back to the api if the publisher stops. Default=10
+    """
+
+    def __init__(self, path: str, writable: bool = False, max_age: float = 10.0):
+        self.path = str(path)
+        self.max_age = max_age
+        self._file = open(self.path, 'r+b' if writable else 'rb')
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+
+        magic, version, slots, slot_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT_SIZE:
+            raise ValueError(f'Not a version {VERSION} price board: {self.path}')
+        self._slots = {}
+        for i in range(slots):
+            offset = HEADER.size + i * SLOT_SIZE
+            product_id = BODY.unpack_from(self._map, offset + SEQ.size)[0]
+            self._slots[_decode(product_id)] = offset
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path: str, product_ids: Iterable[str], max_age: float = 10.0):
+        """Write an empty board for product_ids and open it for publishing"""
+        product_ids = [p.upper() for p in product_ids]
+        data = bytearray(HEADER.size + len(product_ids) * SLOT_SIZE)
+        HEADER.pack_into(data, 0, MAGIC, VERSION, len(product_ids), SLOT_SIZE)
+        for i, product_id in enumerate(product_ids):
+            BODY.pack_into(data, HEADER.size + i * SLOT_SIZE + SEQ.size,
+                           _encode(product_id, 16), 0.0, *([b''] * len(FIELDS)))
+
+        # readers opening the path never see a half written board
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+        return cls(path, writable=True, max_age=max_age)
+
+    @classmethod
+    def open(cls, path: str, max_age: float = 10.0):
+        """Open an existing board read only"""
+        return cls(path, max_age=max_age)
+
+    @property
+    def product_ids(self) -> List[str]:
+        return list(self._slots)
+
+    def publish(self, product_id: str, price=None, stats: dict = None):
+        """Update a product's price, its stats or both in one consistent write"""
+        product_id = product_id.upper()
+        offset = self._slots[product_id]
+        with self._lock:
+            fields = self._cache.setdefault(product_id, dict.fromkeys(FIELDS, ''))
+            if price is not None:
+                fields['price'] = price
+            for field in STATS_FIELDS:
+                if stats is not None and stats.get(field) is not None:
+                    fields[field] = stats[field]
+            values = [_encode(fields[f], 32) for f in FIELDS]
+
+            seq = SEQ.unpack_from(self._map, offset)[0]
+            SEQ.pack_into(self._map, offset, seq + 1)
+            BODY.pack_into(self._map, offset + SEQ.size,
+                           _encode(product_id, 16), time.time(), *values)
+            SEQ.pack_into(self._map, offset, seq + 2)
+
+    def quote(self, product_id: str) -> Quote:
+        """
+        Latest quote of a product. None if the product is not on the board,
+        was never published, is older than max_age or is being rewritten by
+        a publisher that died mid write.
+        """
+        offset = self._slots.get(product_id.upper())
+        if offset is None:
+            return None
+        board = self._map
+        attempts, give_up = 0, None
+        while True:
+            seq = SEQ.unpack_from(board, offset)[0]
+            if not seq & 1:
+                body = BODY.unpack_from(board, offset + SEQ.size)
+                if SEQ.unpack_from(board, offset)[0] == seq:
+                    break
+            attempts += 1
+            if attempts > SPIN_READS:
+                # the writer was descheduled mid write, let it run
+                now = time.monotonic()
+                give_up = give_up or now + READ_TIMEOUT
+                if now > give_up:
+                    return None
+                time.sleep(0)
+
+        updated_at = body[1]
+        if updated_at == 0.0 or time.time() - updated_at > self.max_age:
+            return None
+        return Quote(_decode(body[0]), updated_at, *map(_decode, body[2:]))
+
+    def price(self, product_id: str) -> str:
+        quote = self.quote(product_id)
+        return None if quote is None else quote.price
+
+    def stats(self, product_id: str) -> dict:
+        """24 hour stats in the shape of the stats endpoint, None if missing"""
+        quote = self.quote(product_id)
+        if quote is None or quote.last is None:
+            return None
+        return {field: getattr(quote, field) for field in STATS_FIELDS}
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class PricePublisher:
+    """
+    Polls tickers and 24 hour stats and publishes them to a PriceBoard.
+
+    Tickers are polled every interval seconds, stats every stats_interval.
+
+    Parameters
+    ----------
+    api : PublicAPI
+    board : PriceBoard
+        Opened with PriceBoard.create.
+    interval : float, Optional
+        Default=1
+    stats_interval : float, Optional
+        Default=30
+    """
+
+    def __init__(self, api, board: PriceBoard, interval: float = 1.0,
+                 stats_interval: float = 30.0):
+        self.api = api
+        self.board = board
+        self.interval = interval
+        self.stats_interval = stats_interval
+        self._stats_at = float('-inf')
+
+    def publish_once(self, with_stats: bool = True):
+        for product_id in self.board.product_ids:
+            base, quote = product_id.split('-')
+            stats = self.api.twenty_four_hour_stats(product_id) if with_stats else None
+            self.board.publish(product_id, price=self.api.price(base, quote),
+                               stats=stats)
+
+    def run(self, stop: threading.Event):
+        """Publish until stop is set. Errors are retried on the next round."""
+        while not stop.is_set():
+            now = time.monotonic()
+            with_stats = now - self._stats_at >= self.stats_interval
+            try:
+                self.publish_once(with_stats)
+                if with_stats:
+                    self._stats_at = now
+            except Exception as e:
+                logging.warning(f'Price board publish failed: {e}. Retrying in {self.interval}s')
+            stop.wait(self.interval)
+
+    @staticmethod
+    def start_process(path: str, product_ids: Iterable[str], interval: float = 1.0,
+                      stats_interval: float = 30.0, **api_kwargs):
+        """
+        Create the board at path and publish to it from a daemon process.
+
+        api_kwargs are passed to the publisher's PublicAPI. Returns the
+        process, terminate() it to stop publishing.
+        """
+        PriceBoard.create(path, product_ids).close()
+        process = multiprocessing.Process(
+            target=_publish_forever,
+            args=(path, interval, stats_interval, api_kwargs),
+            daemon=True
+        )
+        process.start()
+        return process
+
+
+def _publish_forever(path, interval, stats_interval, api_kwargs):
+    from cbp_client.api_public import PublicAPI
+
+    board = PriceBoard(path, writable=True)
+    PricePublisher(PublicAPI(**api_kwargs), board, interval,
+                   stats_interval).run(threading.Event())
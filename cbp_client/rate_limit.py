@@ -0,0 +1,54 @@
+'''Client side throttling for coinbase pro requests'''
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket limiting how many requests are sent per second.
+
+    A single limiter can be shared by every thread using an API instance.
+    Each call to acquire blocks until a token is available.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added to the bucket per second.
+    burst : int, Optional
+        Maximum number of tokens the bucket can hold. Defaults to rate.
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        if rate <= 0:
+            raise ValueError(f'Rate must be positive. Rate:{rate}')
+
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens without waiting. Returns False if too few remain."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1):
+        """Block until the requested number of tokens can be taken."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,323 @@
+'''Streaming reconciliation of orders against ledger fills and fees'''
+import heapq
+import logging
+from collections import OrderedDict, namedtuple
+from decimal import Decimal
+from typing import Iterable
+
+from cbp_client.helpers import parse_time
+from cbp_client.numeric import to_decimal
+
+PERIODS = {
+    'day': '%Y-%m-%d',
+    'month': '%Y-%m',
+    'year': '%Y',
+}
+
+ZERO = Decimal(0)
+
+Fill = namedtuple('Fill', ['time', 'order_id', 'product_id', 'side', 'size',
+                           'value', 'fee'])
+
+TOTAL_FIELDS = ('fills', 'bought', 'sold', 'buy_value', 'sell_value', 'fees',
+                'realized_pnl')
+
+
+def _ledger_key(currency: str) -> str:
+    return f'ledger:{currency.upper()}'
+
+
+class _Legs:
+    """Ledger amounts of one order seen so far"""
+    __slots__ = ('base', 'quote', 'fee', 'trade_ids', 'time')
+
+    def __init__(self):
+        self.base = ZERO
+        self.quote = ZERO
+        self.fee = ZERO
+        self.trade_ids = set()
+        self.time = None
+
+
+class Reconciler:
+    """
+    Matches orders to their ledger entries in one pass and books the result.
+
+    Ledger entries are indexed by details.order_id as they arrive and an
+    order is settled the moment its filled_size and fill_fees are covered by
+    ledger legs, in whichever order the two streams are read. Only orders
+    and ledger legs still waiting for their counterpart are held, at most
+    max_pending of them. Each settled order becomes a Fill that is booked
+    into per product, per period totals with average cost realized P&L.
+
+    Realized P&L depends on trade order, so fills are booked oldest first.
+    With ascending=True (both streams read oldest first, e.g. replaying
+    stored files) fills are booked as soon as both streams have passed
+    them. Otherwise, as with the newest first api pages, they are booked by
+    finish().
+
+    For incremental runs save state() after finish() and pass it back with
+    from_state(). sync() then only requests records newer than the last run.
+    Orders and every currency's ledger keep their own watermark, so a slow
+    account is not skipped past by a busier one.
+
+    Example
+    -------
+    >>> reconciler = Reconciler(period='month')
+    >>> reconciler.sync(auth_api, start_date='2021-01-01')
+    >>> reconciler.totals[('BTC-USD', '2021-05')]['fees']
+    Decimal('12.4810000000000000')
+
+    Parameters
+    ----------
+    period : str, Optional
+        'day', 'month' or 'year'. Default='month'
+    ascending : bool, Optional
+        True when records are supplied oldest first. Default=False
+    max_pending : int, Optional
+        Maximum unmatched orders plus orders with unmatched ledger legs held
+        at once. The oldest are dropped with a warning. Default=100_000
+    """
+
+    def __init__(self, period: str = 'month', ascending: bool = False,
+                 max_pending: int = 100_000):
+        if period not in PERIODS:
+            raise ValueError(f'Invalid period: {period}. Choose from: {list(PERIODS)}')
+        self.period = period
+        self.ascending = ascending
+        self.max_pending = max_pending
+
+        self.totals = {}
+        self.positions = {}
+        self.dropped = 0
+        self.watermarks = {'orders': None}
+
+        self._orders = OrderedDict()
+        self._legs = OrderedDict()
+        self._ready = []
+        self._seen = {'orders': None}
+
+    def add_order(self, order: dict):
+        '''Add an order from AuthAPI.orders(). Orders without fills are skipped.'''
+        self._advance('orders', order.get('done_at') or order['created_at'])
+        if order.get('status') != 'done' or not to_decimal(order.get('filled_size', 0)):
+            return
+        self._orders[order['id']] = order
+        self._settle(order['id'])
+        self._bound(self._orders)
+
+    def add_ledger_entry(self, entry: dict, currency: str):
+        '''Add an entry of the ledger of the currency's account'''
+        self._advance(_ledger_key(currency), entry['created_at'])
+        details = entry.get('details') or {}
+        order_id = details.get('order_id')
+        if entry.get('type') not in ('match', 'fee') or order_id is None:
+            return
+
+        legs = self._legs.get(order_id)
+        if legs is None:
+            legs = self._legs[order_id] = _Legs()
+        amount = to_decimal(entry['amount'])
+        base = details['product_id'].split('-')[0]
+
+        if entry['type'] == 'fee':
+            legs.fee -= amount
+        elif currency.upper() == base:
+            legs.base += amount
+            legs.trade_ids.add(details.get('trade_id'))
+        else:
+            legs.quote += amount
+        legs.time = max(legs.time or entry['created_at'], entry['created_at'],
+                        key=parse_time)
+
+        self._settle(order_id)
+        self._bound(self._legs)
+
+    def reconcile(self, orders: Iterable[dict], ledgers: dict):
+        """
+        Match every order and ledger entry, then book the remaining fills.
+
+        Parameters
+        ----------
+        orders : iterable of dict
+        ledgers : dict
+            {currency: iterable of ledger entries}
+        """
+        for order in orders:
+            self.add_order(order)
+        for currency, entries in ledgers.items():
+            for entry in entries:
+                self.add_ledger_entry(entry, currency)
+        self.finish()
+
+    def sync(self, api, start_date: str):
+        """
+        Reconcile records of an AuthAPI created since the last sync.
+
+        The first call reads everything since start_date. Later calls only
+        read records newer than the watermarks in state().
+        """
+        def newer(rows, key, field):
+            watermark = self._watermark(key)
+            watermark = parse_time(watermark) if watermark else None
+            for row in rows:
+                if watermark is None or parse_time(row[field]) > watermark:
+                    yield row
+
+        since = self._since('orders', start_date)
+        for order in newer(api.orders(start_date=since), 'orders', 'done_at'):
+            self.add_order(order)
+
+        for account in api.accounts():
+            key = _ledger_key(account.currency)
+            since = self._since(key, start_date)
+            entries = api.account_history(account.currency, start_date=since)
+            for entry in newer(entries, key, 'created_at'):
+                self.add_ledger_entry(entry, account.currency)
+
+        self.finish()
+
+    def finish(self):
+        '''Book every settled fill and advance the watermarks'''
+        self._flush(None)
+        self.watermarks = {**self.watermarks, **self._seen}
+
+    def unmatched(self) -> dict:
+        """Order ids still waiting for ledger legs, and ledger legs for orders"""
+        return {
+            'orders': list(self._orders),
+            'ledger': [order_id for order_id in self._legs
+                       if order_id not in self._orders],
+        }
+
+    def summary(self, product_id: str = None) -> dict:
+        """Totals over every period, per product"""
+        summary = {}
+        for (product, _), totals in self.totals.items():
+            if product_id is not None and product != product_id.upper():
+                continue
+            merged = summary.setdefault(product, dict.fromkeys(TOTAL_FIELDS, ZERO))
+            for field in TOTAL_FIELDS:
+                merged[field] += totals[field]
+        return summary
+
+    def _watermark(self, key):
+        # states saved before per currency watermarks hold one 'ledger' mark
+        return self.watermarks.get(key, self.watermarks.get('ledger'))
+
+    def _since(self, key, start_date):
+        watermark = self._watermark(key)
+        return parse_time(watermark).date().isoformat() if watermark else start_date
+
+    def _advance(self, key, time_str):
+        seen = self._seen.get(key)
+        if seen is None or parse_time(time_str) > parse_time(seen):
+            self._seen[key] = time_str
+
+    def _settle(self, order_id):
+        order, legs = self._orders.get(order_id), self._legs.get(order_id)
+        if order is None or legs is None:
+            return
+
+        size = to_decimal(order['filled_size'])
+        fee = to_decimal(order.get('fill_fees', 0))
+        if abs(legs.base).quantize(size) != size or legs.fee.quantize(fee) != fee:
+            return
+
+        del self._orders[order_id], self._legs[order_id]
+        fill = Fill(
+            time=parse_time(legs.time or order['done_at']),
+            order_id=order_id,
+            product_id=order['product_id'].upper(),
+            side=order['side'],
+            size=size,
+            value=abs(legs.quote),
+            fee=legs.fee
+        )
+        heapq.heappush(self._ready, (fill.time, order_id, fill))
+
+        if self.ascending and self._seen['orders'] is not None and len(self._seen) > 1:
+            self._flush(min(self._seen.values(), key=parse_time))
+
+    def _bound(self, pending):
+        while len(self._orders) + len(self._legs) > self.max_pending and pending:
+            order_id, _ = pending.popitem(last=False)
+            self.dropped += 1
+            logging.warning(f'Dropped unmatched order {order_id}: '
+                            f'more than {self.max_pending} pending records')
+
+    def _flush(self, until):
+        until = parse_time(until) if until else None
+        while self._ready and (until is None or self._ready[0][0] <= until):
+            self._book(heapq.heappop(self._ready)[2])
+
+    def _book(self, fill: Fill):
+        key = (fill.product_id, fill.time.strftime(PERIODS[self.period]))
+        totals = self.totals.get(key)
+        if totals is None:
+            totals = self.totals[key] = dict.fromkeys(TOTAL_FIELDS, ZERO)
+        size, cost = self.positions.get(fill.product_id, (ZERO, ZERO))
+
+        totals['fills'] += 1
+        totals['fees'] += fill.fee
+        if fill.side == 'buy':
+            totals['bought'] += fill.size
+            totals['buy_value'] += fill.value
+            size, cost = size + fill.size, cost + fill.value + fill.fee
+        else:
+            # sales beyond the tracked position have no known cost basis
+            sold = min(fill.size, size)
+            basis = cost * sold / size if size else ZERO
+            totals['sold'] += fill.size
+            totals['sell_value'] += fill.value
+            totals['realized_pnl'] += fill.value - fill.fee - basis
+            size, cost = size - sold, cost - basis
+
+        self.positions[fill.product_id] = (size, cost)
+
+    def state(self) -> dict:
+        """Json friendly state for resuming with from_state"""
+        def legs_state(legs):
+            return {'base': str(legs.base), 'quote': str(legs.quote),
+                    'fee': str(legs.fee), 'trade_ids': sorted(legs.trade_ids),
+                    'time': legs.time}
+
+        if self._ready:
+            raise ValueError('Call finish() before saving the state')
+
+        return {
+            'period': self.period,
+            'ascending': self.ascending,
+            'max_pending': self.max_pending,
+            'dropped': self.dropped,
+            'watermarks': self.watermarks,
+            'positions': {p: [str(size), str(cost)]
+                          for p, (size, cost) in self.positions.items()},
+            'totals': [[product, period, {f: str(v) for f, v in totals.items()}]
+                       for (product, period), totals in self.totals.items()],
+            'orders': list(self._orders.values()),
+            'legs': {order_id: legs_state(legs)
+                     for order_id, legs in self._legs.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        reconciler = cls(state['period'], state['ascending'], state['max_pending'])
+        reconciler.dropped = state['dropped']
+        reconciler.watermarks = dict(state['watermarks'])
+        reconciler._seen = {key: mark for key, mark in state['watermarks'].items()
+                            if key != 'ledger'}
+        reconciler.positions = {p: (Decimal(size), Decimal(cost))
+                                for p, (size, cost) in state['positions'].items()}
+        reconciler.totals = {
+            (product, period): {f: Decimal(v) for f, v in totals.items()}
+            for product, period, totals in state['totals']
+        }
+        reconciler._orders = OrderedDict((o['id'], o) for o in state['orders'])
+        for order_id, saved in state['legs'].items():
+            legs = reconciler._legs[order_id] = _Legs()
+            legs.base, legs.quote, legs.fee = (
+                Decimal(saved['base']), Decimal(saved['quote']), Decimal(saved['fee']))
+            legs.trade_ids = set(saved['trade_ids'])
+            legs.time = saved['time']
+        return reconciler
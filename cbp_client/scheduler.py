@@ -0,0 +1,176 @@
+'''Priority admission of requests sharing one rate budget'''
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from enum import IntEnum
+
+from cbp_client.deadline import POLL_INTERVAL, Deadline
+
+
+class Priority(IntEnum):
+    """Request classes, most urgent first"""
+    TRADING = 0
+    INTERACTIVE = 1
+    BULK = 2
+
+
+QueueStats = namedtuple('QueueStats', ['admitted',
+                                       'waiting',
+                                       'mean_wait',
+                                       'p95_wait',
+                                       'max_wait'])
+
+
+class RequestScheduler:
+    """
+    Token bucket and connection limit that serves waiting requests by priority.
+
+    Every request takes a token and an in flight slot before it is sent.
+    Waiting requests are admitted most urgent class first, first come
+    first served within a class, so an order never queues behind a
+    backfill. Bulk requests are only admitted while more than
+    bulk_reserve tokens and slots are free, which keeps headroom for
+    trading and interactive calls and lets bulk jobs take everything else.
+
+    Queue times are kept per class, see stats().
+
+    Example
+    -------
+    >>> scheduler = RequestScheduler(rate=10, max_in_flight=8)
+    >>> api = AuthAPI(scheduler=scheduler)
+    >>> scheduler.stats()[Priority.TRADING].p95_wait
+    0.0021
+
+    Parameters
+    ----------
+    rate : float
+        Requests per second.
+    burst : int, Optional
+        Maximum tokens the bucket holds, more than bulk_reserve so bulk
+        requests can be admitted. Defaults to rate, or 1 + bulk_reserve
+        if that is larger.
+    max_in_flight : int, Optional
+        Requests sent at the same time. Default=None for no limit
+    bulk_reserve : int, Optional
+        Tokens and slots bulk requests leave free. Default=1
+    history : int, Optional
+        Queue times kept per class for the percentiles. Default=1000
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = None,
+        max_in_flight: int = None,
+        bulk_reserve: int = 1,
+        history: int = 1_000
+    ):
+        if rate <= 0:
+            raise ValueError(f'Rate must be positive. Rate:{rate}')
+        if burst is not None and burst < 1 + bulk_reserve:
+            raise ValueError(f'burst must exceed bulk_reserve or bulk requests never '
+                             f'get through. burst:{burst}, bulk_reserve:{bulk_reserve}')
+        if max_in_flight is not None and max_in_flight <= bulk_reserve:
+            raise ValueError(f'max_in_flight must exceed bulk_reserve. '
+                             f'max_in_flight:{max_in_flight}, bulk_reserve:{bulk_reserve}')
+
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1 + bulk_reserve))
+        self.max_in_flight = max_in_flight
+        self.bulk_reserve = bulk_reserve
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._in_flight = 0
+        self._waiting = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._admitted = {p: 0 for p in Priority}
+        self._waits = {p: deque(maxlen=history) for p in Priority}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _reserve(self, priority):
+        return self.bulk_reserve if priority == Priority.BULK else 0
+
+    def _has_slot(self, priority):
+        if self.max_in_flight is None:
+            return True
+        return self._in_flight < self.max_in_flight - self._reserve(priority)
+
+    def acquire(self, priority: Priority = Priority.INTERACTIVE,
+                deadline: Deadline = None):
+        """
+        Block until a request of this class may be sent. Pair with release().
+
+        With a deadline, gives up its place in the queue and raises
+        DeadlineExceeded once the deadline passes or is cancelled.
+        """
+        priority = Priority(priority)
+        enqueued = time.monotonic()
+        ticket = (priority, next(self._order))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if deadline is not None and deadline.expired:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    deadline.check()
+                now = time.monotonic()
+                self._refill(now)
+                needed = 1 + self._reserve(priority)
+                if (self._waiting[0] == ticket and self._tokens >= needed
+                        and self._has_slot(priority)):
+                    break
+                wait = None
+                if self._waiting[0] == ticket and self._tokens < needed:
+                    wait = (needed - self._tokens) / self.rate
+                if deadline is not None:
+                    # cancellation does not notify, poll for it
+                    wait = POLL_INTERVAL if wait is None else min(wait, POLL_INTERVAL)
+                self._cond.wait(wait)
+
+            heapq.heappop(self._waiting)
+            self._tokens -= 1
+            self._in_flight += 1
+            self._admitted[priority] += 1
+            self._waits[priority].append(time.monotonic() - enqueued)
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: Priority = Priority.INTERACTIVE, deadline: Deadline = None):
+        self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        """QueueStats of every class, queue times in seconds"""
+        with self._cond:
+            waiting = [p for p, _ in self._waiting]
+            samples = {p: sorted(w) for p, w in self._waits.items()}
+            admitted = dict(self._admitted)
+
+        stats = {}
+        for priority in Priority:
+            waits = samples[priority]
+            stats[priority] = QueueStats(
+                admitted=admitted[priority],
+                waiting=waiting.count(priority),
+                mean_wait=sum(waits) / len(waits) if waits else 0.0,
+                p95_wait=waits[math.ceil(0.95 * len(waits)) - 1] if waits else 0.0,
+                max_wait=waits[-1] if waits else 0.0
+            )
+        return stats
@@ -0,0 +1,109 @@
+'''Coalescing of identical concurrent GET requests'''
+import copy
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+from cbp_client.cache import ResponseCache
+
+
+def _own_copy(response):
+    """A Response per caller, sharing only the immutable body"""
+    response = copy.copy(response)
+    if isinstance(response, requests.Response):
+        # copying a Response reads the body and drops raw, the mutable parts
+        # callers might touch are copied here
+        response.headers = response.headers.copy()
+        response.cookies = response.cookies.copy()
+        response.history = list(response.history)
+    return response
+
+
+class SingleFlight:
+    """
+    Shares one in-flight request between callers asking for the same thing.
+
+    The first caller for a (endpoint, params, api key, scope) becomes the leader
+    and sends the request. Callers arriving while it is in flight wait for
+    the leader's response instead of sending their own. Errors are raised
+    in every waiting caller.
+
+    With a window, a finished response also answers identical calls that
+    arrive up to window seconds later, which batches bursts that land just
+    after a fast response.
+
+    Example
+    -------
+    >>> api = PublicAPI(single_flight=SingleFlight(window=0.05))
+    >>> with ThreadPoolExecutor(32) as pool:
+    ...     prices = list(pool.map(lambda _: api.price('btc'), range(32)))
+    >>> api.api.single_flight.stats
+    {'sent': 1, 'shared': 31}
+
+    Parameters
+    ----------
+    window : float, Optional
+        Seconds a completed response keeps being shared. Default=0
+    """
+
+    def __init__(self, window: float = 0.0):
+        if window < 0:
+            raise ValueError(f'Window must not be negative. window:{window}')
+        self.window = window
+        self.stats = {'sent': 0, 'shared': 0}
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, endpoint: str, params: dict, auth, send, scope=()):
+        """
+        Return send(), or the response of an identical call already running.
+
+        scope holds anything else that changes what send returns, for
+        example the api url and whether the response cache may answer, so
+        such calls never share a flight.
+        """
+        key = (scope, ResponseCache.key(endpoint, params, auth))
+        now = time.monotonic()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and (flight[1] is None or flight[1] > now):
+                self.stats['shared'] += 1
+                leader = False
+            else:
+                self._expire(now)
+                flight = self._flights[key] = (Future(), None)
+                self.stats['sent'] += 1
+                leader = True
+
+        future = flight[0]
+        if leader:
+            try:
+                future.set_result(send())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._land(key, flight)
+
+        return _own_copy(future.result())
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is not flight:
+                return
+            if self.window and flight[0].exception() is None:
+                self._flights[key] = (flight[0], time.monotonic() + self.window)
+            else:
+                del self._flights[key]
+
+    def _expire(self, now):
+        expired = [key for key, (_, expires) in self._flights.items()
+                   if expires is not None and expires <= now]
+        for key in expired:
+            del self._flights[key]
+
+    def __len__(self):
+        """Number of requests in flight or still inside their window"""
+        return len(self._flights)
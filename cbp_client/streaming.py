@@ -0,0 +1,150 @@
+'''
+Parse json array responses row by row while they download.
+
+Pages of orders, ledger entries and trades are json arrays. Instead of
+waiting for the whole body and parsing it at once, iter_rows decompresses
+the body chunk by chunk and yields each array element as soon as its last
+byte arrives, so the first rows reach the caller early and a page is never
+held as one large string.
+
+Compression is negotiated with ACCEPT_ENCODING: gzip and deflate always,
+and brotli when the brotli package is installed (pip install
+cbp-client[brotli]).
+'''
+import codecs
+import json
+import threading
+import time
+from typing import Iterable, Iterator
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+CHUNK_SIZE = 16_384
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class StreamStats:
+    """
+    Totals over streamed responses.
+
+    time_to_first_row is measured from sending the request to the first
+    parsed row, bytes_on_wire counts compressed bytes and bytes_decoded
+    the json they expanded to.
+    """
+
+    def __init__(self):
+        self.responses = 0
+        self.rows = 0
+        self.bytes_on_wire = 0
+        self.bytes_decoded = 0
+        self.time_to_first_row = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, rows, bytes_on_wire, bytes_decoded, time_to_first_row):
+        with self._lock:
+            self.responses += 1
+            self.rows += rows
+            self.bytes_on_wire += bytes_on_wire
+            self.bytes_decoded += bytes_decoded
+            self.time_to_first_row += time_to_first_row
+
+    @property
+    def mean_time_to_first_row(self) -> float:
+        return self.time_to_first_row / self.responses if self.responses else 0.0
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.bytes_decoded / self.bytes_on_wire if self.bytes_on_wire else 1.0
+
+    def __repr__(self):
+        return (f'StreamStats(responses={self.responses}, rows={self.rows}, '
+                f'bytes_on_wire={self.bytes_on_wire}, '
+                f'bytes_decoded={self.bytes_decoded}, '
+                f'mean_time_to_first_row={self.mean_time_to_first_row:.4f})')
+
+
+def iter_array(chunks: Iterable[bytes]) -> Iterator:
+    """
+    Yield the elements of a json array from chunks of its utf-8 encoding.
+
+    An element is parsed once all of its bytes have arrived. A scalar is
+    held back until the delimiter after it arrives, since more digits may
+    follow.
+    """
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, opened, closed = '', 0, False, False
+
+    for chunk in chunks:
+        buffer = buffer[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not opened:
+                if buffer[pos] != '[':
+                    raise ValueError(f'Expected a json array, got: {buffer[pos:pos + 20]!r}')
+                opened, pos = True, pos + 1
+                continue
+            if closed:
+                raise ValueError(f'Unexpected data after json array: {buffer[pos:pos + 20]!r}')
+            if buffer[pos] in ',]':
+                closed = buffer[pos] == ']'
+                pos += 1
+                continue
+            try:
+                row, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+            if not isinstance(row, (dict, list)):
+                # a number is only complete once a delimiter follows it
+                after = end
+                while after < len(buffer) and buffer[after] in WHITESPACE:
+                    after += 1
+                if after == len(buffer) or buffer[after] not in ',]':
+                    break
+            pos = end
+            yield row
+
+    text.decode(b'', final=True)
+    if not closed:
+        raise ValueError('Incomplete json array')
+
+
+def iter_rows(response, stats: StreamStats = None, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Yield the rows of a json array response opened with stream=True.
+
+    The response is closed when the rows run out or the caller stops early.
+    Responses that were already read, e.g. replayed from a cassette, are
+    parsed from their content.
+    """
+    headers_at = time.monotonic()
+    elapsed = response.elapsed.total_seconds()
+    raw = (response.raw if response.raw is not None and not response._content_consumed
+           else None)
+    decoded, rows, first_row = 0, 0, None
+
+    def counted(chunks):
+        nonlocal decoded
+        for chunk in chunks:
+            decoded += len(chunk)
+            yield chunk
+
+    chunks = (raw.stream(chunk_size, decode_content=True) if raw is not None
+              else [response.content])
+    try:
+        for row in iter_array(counted(chunks)):
+            if first_row is None:
+                first_row = time.monotonic()
+            rows += 1
+            yield row
+    finally:
+        response.close()
+        if stats is not None:
+            on_wire = raw.tell() if raw is not None else len(response.content)
+            waited = (first_row or time.monotonic()) - headers_at
+            stats.record(rows, on_wire, decoded, elapsed + waited)
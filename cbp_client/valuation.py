@@ -0,0 +1,206 @@
+'''Mark to market valuation of a portfolio from a local price table'''
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from cbp_client.numeric import to_decimal
+from cbp_client.product import Product
+
+# One conversion step: (product_id, True if the currency is the product's base)
+Hop = Tuple[str, bool]
+
+ZERO = Decimal(0)
+
+
+def conversion_routes(products: Iterable[Product], quote: str) -> Dict[str, List[Hop]]:
+    """
+    Shortest conversion route from every reachable currency to quote.
+
+    Currencies are nodes and live products are edges, so a currency with no
+    direct quote pair is converted through intermediate ones, e.g.
+    XLM -> BTC -> USD. Routes are found with one breadth first search from
+    quote, so direct pairs always win over indirect ones.
+
+    Example
+    -------
+    >>> conversion_routes(products, 'USD')['XLM']
+    [('XLM-BTC', True), ('BTC-USD', True)]
+
+    Returns
+    -------
+    dict
+        {currency: [(product_id, is_base), ...]}. quote maps to [].
+    """
+    quote = quote.upper()
+    edges = {}
+    for product in products:
+        if not getattr(product, 'live', True):
+            continue
+        base, counter = product.base_currency.upper(), product.quote_currency.upper()
+        edges.setdefault(base, []).append((counter, product.id.upper(), True))
+        edges.setdefault(counter, []).append((base, product.id.upper(), False))
+
+    routes = {quote: []}
+    queue = deque([quote])
+    while queue:
+        target = queue.popleft()
+        for currency, product_id, target_is_base in edges.get(target, ()):
+            if currency not in routes:
+                # currency converts to target through product_id. When target
+                # is the product's base, currency is its quote and vice versa.
+                routes[currency] = [(product_id, not target_is_base), *routes[target]]
+                queue.append(currency)
+    return routes
+
+
+class PortfolioValuation:
+    """
+    Keeps a portfolio valued in one quote currency as prices and balances move.
+
+    Holds a price table keyed by product id, the balance of every currency
+    and the value of each one in quote. A price or balance update only
+    recomputes the assets whose route uses that product, and the total is
+    adjusted by the difference, so queries never touch the network.
+
+    Prices come from refresh_prices (REST, one ticker per product on a used
+    route, fetched concurrently), from handle_feed_message (ticker channel
+    messages) or from set_price. All values are Decimal.
+
+    Example
+    -------
+    >>> valuation = PortfolioValuation.from_auth_api(auth_api)
+    >>> valuation.refresh_prices(auth_api)
+    >>> valuation.total
+    Decimal('12850.43')
+    >>> valuation.values()
+    {'BTC': Decimal('12000.00'), 'USD': Decimal('850.43')}
+
+    Parameters
+    ----------
+    products : iterable of Product
+    quote : str, Optional
+        Currency to value the portfolio in. Default='USD'
+    """
+
+    def __init__(self, products: Iterable[Product], quote: str = 'USD'):
+        self.quote = quote.upper()
+        self.routes = conversion_routes(products, self.quote)
+        self._dependents = {}
+        for currency, route in self.routes.items():
+            for product_id, _ in route:
+                self._dependents.setdefault(product_id, set()).add(currency)
+
+        self._prices = {}
+        self._balances = {}
+        self._values = {}
+        self._total = ZERO
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_auth_api(cls, api, quote: str = 'USD'):
+        """Valuation of an AuthAPI's accounts that follows balance changes"""
+        valuation = cls(api.products(), quote)
+        valuation.set_balances({a.currency: a.balance for a in api.accounts()})
+        api.on_account_change(
+            lambda old, new: valuation.set_balance(new.currency, new.balance))
+        return valuation
+
+    @property
+    def total(self) -> Decimal:
+        """Value of every priced asset in quote"""
+        return self._total
+
+    @property
+    def prices(self) -> Dict[str, Decimal]:
+        return dict(self._prices)
+
+    def values(self) -> Dict[str, Decimal]:
+        """Value in quote of every non zero asset that can be priced"""
+        return dict(self._values)
+
+    def value(self, currency: str) -> Decimal:
+        return self._values.get(currency.upper())
+
+    def unpriced(self) -> set:
+        """Currencies with a balance but no route or missing prices"""
+        return {currency for currency, balance in self._balances.items()
+                if balance and currency not in self._values}
+
+    def products_needed(self) -> set:
+        """Products whose prices are needed to value the current balances"""
+        return {product_id
+                for currency, balance in self._balances.items() if balance
+                for product_id, _ in self.routes.get(currency, ())}
+
+    def set_balance(self, currency: str, balance):
+        currency = currency.upper()
+        with self._lock:
+            self._balances[currency] = to_decimal(balance)
+            self._revalue(currency)
+
+    def set_balances(self, balances: dict):
+        with self._lock:
+            for currency, balance in balances.items():
+                currency = currency.upper()
+                self._balances[currency] = to_decimal(balance)
+                self._revalue(currency)
+
+    def set_price(self, product_id: str, price):
+        product_id = product_id.upper()
+        with self._lock:
+            self._prices[product_id] = to_decimal(price)
+            for currency in self._dependents.get(product_id, ()):
+                self._revalue(currency)
+
+    def handle_feed_message(self, message: dict):
+        '''Update the price table from a ticker channel message'''
+        if message.get('type') == 'ticker' and 'price' in message:
+            self.set_price(message['product_id'], message['price'])
+
+    def refresh_prices(self, api, workers: int = 8) -> Dict[str, Decimal]:
+        """
+        Fetch tickers for every product the current balances depend on.
+
+        Parameters
+        ----------
+        api : PublicAPI or API
+            Anything with get(endpoint) returning a requests.Response.
+        workers : int, Optional
+            Concurrent ticker requests. Default=8
+
+        Returns
+        -------
+        dict
+            {product_id: price} of the products fetched
+        """
+        product_ids = sorted(self.products_needed())
+
+        def fetch(product_id):
+            return api.get(f'products/{product_id}/ticker').json()['price']
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            prices = dict(zip(product_ids, pool.map(fetch, product_ids)))
+
+        for product_id, price in prices.items():
+            self.set_price(product_id, price)
+        return {product_id: to_decimal(price) for product_id, price in prices.items()}
+
+    def _rate(self, currency):
+        rate = Decimal(1)
+        for product_id, is_base in self.routes[currency]:
+            price = self._prices.get(product_id)
+            if not price:
+                return None
+            rate = rate * price if is_base else rate / price
+        return rate
+
+    def _revalue(self, currency):
+        balance = self._balances.get(currency, ZERO)
+        rate = self._rate(currency) if currency in self.routes else None
+
+        old = self._values.pop(currency, ZERO)
+        if rate is not None and balance:
+            self._values[currency] = balance * rate
+        self._total += self._values.get(currency, ZERO) - old
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from cbp_client import AuthAPI
+from cbp_client.accounts import Account, AccountRefresher, AccountRegistry
+from cbp_client.mock_server import MockExchange
+from tests.test_mock_server import CREDENTIALS
+
+
+def account(id_, currency, balance='1.0'):
+    return Account(id_, currency, balance, balance, '0', 'profile', True)
+
+
+def test_registry_lookups():
+    registry = AccountRegistry([account('1', 'BTC'), account('2', 'ETH')])
+
+    assert registry.by_currency('btc').id == '1'
+    assert registry.by_currency('Eth').id == '2'
+    assert registry.by_id('2').currency == 'ETH'
+    assert registry.by_currency('xlm') is None
+
+
+def test_registry_notifies_balance_changes():
+    registry = AccountRegistry([account('1', 'BTC'), account('2', 'ETH')])
+    changes = []
+    unsubscribe = registry.subscribe(lambda old, new: changes.append((old, new)))
+
+    assert registry.update(account('1', 'BTC', '2.0')) is True
+    assert registry.update(account('2', 'ETH')) is False
+    assert registry.replace([account('1', 'BTC', '2.0'), account('2', 'ETH', '3.0')])
+    unsubscribe()
+    registry.update(account('1', 'BTC', '5.0'))
+
+    assert [(old.balance, new.balance) for old, new in changes] == [
+        ('1.0', '2.0'), ('1.0', '3.0')]
+    assert [a.id for a in registry.all()] == ['1', '2']
+
+
+def test_currencies_affected():
+    match = {'type': 'match', 'product_id': 'ETH-BTC'}
+
+    assert AccountRegistry.currencies_affected(match) == {'ETH', 'BTC'}
+    assert AccountRegistry.currencies_affected({'type': 'heartbeat'}) == set()
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=0) as exchange:
+        yield exchange
+
+
+def test_feed_message_refreshes_single_accounts(exchange):
+    api = AuthAPI(CREDENTIALS, base_url=exchange.url)
+    moved = []
+    api.on_account_change(lambda old, new: moved.append(new.currency))
+
+    order = api.market_buy(funds=100, product_id='btc-usd').json()
+    api.handle_feed_message({'type': 'done', 'product_id': order['product_id']})
+    assert api.account_refresher.wait_idle(timeout=5)
+
+    assert sorted(moved) == ['BTC', 'USD']
+    assert float(api.balance('btc')) > 1000
+    assert ('GET', 'accounts') in exchange.request_log
+    assert ('GET', f'accounts/{api.accounts("btc").id}') in exchange.request_log
+
+
+def test_refreshes_are_coalesced_per_currency():
+    refreshed = []
+    refresher = AccountRefresher(refreshed.append, interval=0.2)
+    messages = [{'type': kind, 'product_id': 'BTC-USD'}
+                for kind in ('received', 'match', 'match', 'done')]
+
+    for message in messages:
+        refresher.handle(message)
+    assert refresher.wait_idle(timeout=5)
+    assert sorted(refreshed) == ['BTC', 'USD']
+
+    start = time.monotonic()
+    refresher.handle(messages[-1])
+    assert refresher.wait_idle(timeout=5)
+    assert time.monotonic() - start >= 0.1
+    assert len(refreshed) == 4
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from cbp_client import AuthAPI
+from cbp_client.archive import Archive
+from cbp_client.mock_server import MockExchange
+from tests.test_mock_server import CREDENTIALS
+
+START = datetime(2021, 3, 1)
+
+
+def record(i):
+    created_at = START + timedelta(hours=i)
+    return {'id': str(i), 'created_at': created_at.strftime('%Y-%m-%dT%H:%M:%S.%fZ')}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = Archive(tmp_path)
+    records = [record(i) for i in range(300)]
+    archive.append('ledger-BTC', records[::-1], '2021-03-01', '2021-03-20')
+    return archive
+
+
+def test_range_queries(archive):
+    march_2 = list(archive.query('ledger-BTC', '2021-03-02', '2021-03-02'))
+    assert [r['id'] for r in march_2] == [str(i) for i in range(24, 48)]
+
+    hours = list(archive.query('ledger-BTC', '2021-03-03T05:00:00',
+                               '2021-03-06T10:00:00', descending=True))
+    assert [r['id'] for r in hours] == [str(i) for i in range(130, 52, -1)]
+    assert list(archive.query('ledger-BTC', '2021-04-01', '2021-04-02')) == []
+
+
+def test_coverage(archive):
+    assert archive.covers('ledger-BTC', '2021-03-05', '2021-03-19')
+    assert not archive.covers('ledger-BTC', '2021-03-05', '2021-03-20T00:00:01')
+    assert not archive.covers('orders', '2021-03-05', '2021-03-06')
+
+
+def test_appends_skip_duplicates_and_survive_torn_writes(archive, tmp_path):
+    added = archive.append('ledger-BTC', [record(i) for i in range(299, 310)],
+                           '2021-03-01', '2021-03-21')
+    assert added == 10
+
+    with (tmp_path / 'ledger-BTC.jsonl').open('a') as f:
+        f.write('{"id": "torn", "created_at"')
+
+    reopened = Archive(tmp_path)
+    rows = list(reopened.query('ledger-BTC', '2021-03-01', '2021-03-31'))
+    assert [r['id'] for r in rows] == [str(i) for i in range(310)]
+    assert reopened.covers('ledger-BTC', '2021-03-01', '2021-03-20')
+
+
+def test_auth_api_reads_synced_ranges_locally(tmp_path):
+    with MockExchange(order_count=200) as exchange:
+        archive = Archive(tmp_path)
+        api = AuthAPI(CREDENTIALS, base_url=exchange.url, archive=archive)
+        live = AuthAPI(CREDENTIALS, base_url=exchange.url)
+
+        archive.sync_ledger(api, 'usd', start_date='2021-05-01')
+        archive.sync_orders(api, start_date='2021-05-01')
+        exchange.request_log.clear()
+
+        local = list(api.account_history('usd', '2021-05-26', '2021-05-28'))
+        orders = list(api.orders('2021-05-26', '2021-05-28'))
+        assert exchange.request_log == []
+
+        remote = list(live.account_history('usd', '2021-05-26', '2021-05-28'))
+        assert local == remote
+        assert local[0]['created_at'] > local[-1]['created_at']
+        assert all('2021-05-26' <= r['created_at'][:10] <= '2021-05-28' for r in remote)
+        assert orders == list(live.orders('2021-05-26', '2021-05-28'))
+
+        api.market_buy(funds=100, product_id='btc-usd')
+        assert archive.sync_ledger(api, 'usd', start_date='2021-05-01') == 2
+
+
+def test_archived_open_orders_are_dated_by_creation(tmp_path):
+    with MockExchange(order_count=0) as exchange:
+        archive = Archive(tmp_path)
+        api = AuthAPI(CREDENTIALS, base_url=exchange.url, archive=archive)
+        open_order = {**record(30), 'status': 'open'}
+        done_order = {**record(20), 'status': 'done',
+                      'done_at': '2021-03-01T20:00:01.000Z'}
+        archive.append('orders', [open_order, done_order], '2021-03-01', '2021-03-20')
+
+        assert list(api.orders('2021-03-01', '2021-03-02')) == [open_order, done_order]
+        assert list(api.orders('2021-03-01', '2021-03-02', status='open')) == [open_order]
+
+
+def test_network_and_archive_apply_the_same_bounds(tmp_path):
+    with MockExchange(order_count=200) as exchange:
+        archive = Archive(tmp_path)
+        api = AuthAPI(CREDENTIALS, base_url=exchange.url, archive=archive)
+        live = AuthAPI(CREDENTIALS, base_url=exchange.url)
+        archive.sync_ledger(api, 'usd', start_date='2021-05-01')
+
+        bounds = ('2021-05-29T12:00:00', '2021-05-30T06:00:00')
+        remote = list(live.account_history('usd', *bounds))
+        assert remote == list(api.account_history('usd', *bounds))
+        assert remote[-1]['created_at'] >= '2021-05-29T12:00:00'
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+import pytest
+
+from cbp_client import PublicAPI
+from cbp_client.bars import TickBars, tick_bars, time_bars, volume_bars
+from cbp_client.mock_server import MockExchange
+
+TRADES = [
+    {'time': '2021-05-31T23:59:00.100Z', 'price': '10', 'size': '1'},
+    {'time': '2021-05-31T23:59:05.000Z', 'price': '12', 'size': '3'},
+    {'time': '2021-05-31T23:59:14.999Z', 'price': '9', 'size': '1'},
+    {'time': '2021-05-31T23:59:15.000Z', 'price': '11', 'size': '2'},
+    {'time': '2021-05-31T23:59:44Z', 'price': '13', 'size': '1'},
+]
+
+
+def test_time_bars_any_size():
+    bars = list(time_bars(TRADES, seconds=15))
+
+    assert [b.start for b in bars] == ['2021-05-31T23:59:00', '2021-05-31T23:59:15',
+                                       '2021-05-31T23:59:30']
+    first = bars[0]
+    assert (first.open, first.high, first.low, first.close) == (10, 12, 9, 9)
+    assert first.volume == 5 and first.trades == 3
+    assert first.vwap == Decimal(10 + 36 + 9) / 5
+
+
+def test_descending_input_gives_same_bars_newest_first():
+    ascending = list(time_bars(TRADES, seconds=15))
+    descending = list(time_bars(reversed(TRADES), seconds=15, descending=True))
+
+    assert descending == ascending[::-1]
+
+
+def test_volume_and_tick_bars():
+    by_volume = list(volume_bars(TRADES, volume=4))
+    assert [b.volume for b in by_volume] == [4, 4]
+    assert by_volume[0].close == 12
+
+    by_ticks = list(tick_bars(TRADES, 2))
+    assert [b.trades for b in by_ticks] == [2, 2, 1]
+    assert by_ticks[1].start == '2021-05-31T23:59:14.999Z'
+
+    with pytest.raises(ValueError):
+        TickBars(0)
+
+
+def test_trades_stream_to_bars():
+    with MockExchange(order_count=0) as exchange:
+        api = PublicAPI(base_url=exchange.url)
+        trades = list(api.trades('btc-usd', '2021-05-31T21:00:00'))
+
+        assert len(trades) > 100
+        assert all(t['time'] >= '2021-05-31T21:00:00' for t in trades)
+        assert [t['trade_id'] for t in trades] == sorted(
+            (t['trade_id'] for t in trades), reverse=True)
+
+        bars = list(time_bars(trades, seconds=30, descending=True))
+        assert sum(b.trades for b in bars) == len(trades)
+        assert sum(b.volume for b in bars) == sum(Decimal(t['size']) for t in trades)
@@ -0,0 +1,209 @@
+import threading
+
+import pytest
+import requests
+
+from cbp_client import AuthAPI, PublicAPI
+from cbp_client.api import API
+from cbp_client.auth import Auth
+from cbp_client.cache import ResponseCache, MemoryBackend, DiskBackend, RedisBackend
+from cbp_client.mock_server import MockExchange
+from tests.test_mock_server import CREDENTIALS
+
+
+def fake_send(calls, status_code=200, content=b'[]', etag=None):
+    def send(headers=None):
+        calls.append(headers)
+        r = requests.Response()
+        r.status_code = status_code
+        r._content = content
+        if etag is not None:
+            r.headers['ETag'] = etag
+        return r
+    return send
+
+
+def test_cache_hits_and_misses():
+    cache = ResponseCache()
+    calls = []
+    send = fake_send(calls, content=b'[{"id": "BTC-USD"}]')
+
+    first = cache.fetch('products', {}, None, send)
+    second = cache.fetch('/products/', {}, None, send)
+
+    assert len(calls) == 1
+    assert first.json() == second.json() == [{'id': 'BTC-USD'}]
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_cache_skips_endpoints_without_policy():
+    cache = ResponseCache()
+    calls = []
+    send = fake_send(calls)
+
+    cache.fetch('products/BTC-USD/ticker', {}, None, send)
+    cache.fetch('products/BTC-USD/ticker', {}, None, send)
+
+    assert len(calls) == 2
+    assert cache.ttl_for('products/BTC-USD/stats') == 10
+
+
+def test_cache_revalidates_with_etag():
+    cache = ResponseCache(ttls={'currencies': 0})
+    calls = []
+
+    cache.fetch('currencies', {}, None, fake_send(calls, etag='"v1"'))
+    r = cache.fetch('currencies', {}, None,
+                    fake_send(calls, status_code=304, content=b''))
+
+    assert calls[1] == {'If-None-Match': '"v1"'}
+    assert r.status_code == 200
+    assert r.json() == []
+    assert cache.stats.revalidations == 1
+
+
+def test_memory_backend_evicts_least_recently_used():
+    cache = ResponseCache(ttls={'.*': 60}, backend=MemoryBackend(max_bytes=10))
+    calls = []
+    send = fake_send(calls, content=b'12345')
+
+    cache.fetch('a', {}, None, send)
+    cache.fetch('b', {}, None, send)
+    cache.fetch('a', {}, None, send)  # a is now most recently used
+    cache.fetch('c', {}, None, send)  # evicts b
+    cache.fetch('a', {}, None, send)
+    cache.fetch('b', {}, None, send)
+
+    assert len(calls) == 4
+    assert cache.backend.evictions == 2
+
+
+def test_disk_backend_shared_between_caches(tmp_path):
+    calls = []
+    send = fake_send(calls, content=b'{"iso": "2021"}')
+
+    ResponseCache(backend=DiskBackend(tmp_path)).fetch('time', {}, None, send)
+    r = ResponseCache(backend=DiskBackend(tmp_path)).fetch('time', {}, None, send)
+
+    assert len(calls) == 1
+    assert r.json() == {'iso': '2021'}
+
+
+def test_disk_backend_concurrent_writers(tmp_path):
+    backend = DiskBackend(tmp_path)
+    cache = ResponseCache(ttls={'.*': 0}, backend=backend)
+    errors = []
+
+    def worker():
+        try:
+            for i in range(100):
+                cache.fetch(f'products/P-{i % 5}', {}, None,
+                            fake_send([], content=b'[1, 2, 3]'))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert list(tmp_path.glob('*.tmp')) == []
+
+
+def test_disk_backend_ignores_untrusted_files(tmp_path):
+    backend = DiskBackend(tmp_path)
+    (tmp_path / 'bad.cache').write_bytes(b'\x80\x04not json')
+
+    assert backend.get('bad') is None
+
+
+def test_cache_write_failure_is_not_fatal():
+    class BrokenBackend(MemoryBackend):
+        def set(self, key, entry):
+            raise OSError('disk full')
+
+    cache = ResponseCache(backend=BrokenBackend())
+    r = cache.fetch('products', {}, None, fake_send([], content=b'[]'))
+
+    assert r.json() == []
+
+
+def test_shared_backend_skips_authenticated_responses(tmp_path):
+    cache = ResponseCache(backend=DiskBackend(tmp_path))
+    auth = Auth(**CREDENTIALS)
+    calls = []
+
+    cache.fetch('payment-methods', {}, auth, fake_send(calls))
+    cache.fetch('payment-methods', {}, auth, fake_send(calls))
+
+    assert len(calls) == 2
+    assert list(tmp_path.glob('*.cache')) == []
+
+
+def test_redis_backend_sets_expiry():
+    class FakeRedis:
+        def __init__(self):
+            self.data, self.expiry = {}, {}
+
+        def get(self, key):
+            return self.data.get(key)
+
+        def set(self, key, value, ex=None):
+            self.data[key], self.expiry[key] = value, ex
+
+    client = FakeRedis()
+    cache = ResponseCache(ttls={'time': 30}, backend=RedisBackend(client, keep_stale=60))
+    cache.fetch('time', {}, None, fake_send([], content=b'{}'))
+
+    assert list(client.expiry.values()) in ([89], [90])
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=0) as exchange:
+        yield exchange
+
+
+def requests_to(exchange, path):
+    return sum(1 for _, p in exchange.request_log if p == path)
+
+
+def test_public_api_uses_cache(exchange):
+    cache = ResponseCache()
+    api = PublicAPI(base_url=exchange.url, cache=cache)
+    sent = requests_to(exchange, 'products/BTC-USD/stats')
+
+    first = api.twenty_four_hour_stats('BTC-USD')
+    second = api.twenty_four_hour_stats('BTC-USD')
+
+    assert first == second
+    assert requests_to(exchange, 'products/BTC-USD/stats') == sent + 1
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_api_get_bypasses_cache(exchange):
+    api = API(sandbox_mode=False, base_url=exchange.url, cache=ResponseCache())
+    sent = requests_to(exchange, 'currencies')
+
+    api.get('currencies')
+    api.get('currencies')
+    api.get('currencies', use_cache=False)
+
+    assert requests_to(exchange, 'currencies') == sent + 2
+    assert api.cache.stats.hits == 1
+
+
+def test_payment_methods_cache(exchange):
+    api = AuthAPI(CREDENTIALS, base_url=exchange.url, cache=ResponseCache())
+    sent = requests_to(exchange, 'payment-methods')
+
+    wallet = api.payment_methods(name='usd wallet')
+    assert api.payment_methods(name='USD Wallet') == wallet
+    api.payment_methods(use_cache=False)
+
+    assert wallet['name'] == 'USD Wallet'
+    assert requests_to(exchange, 'payment-methods') == sent + 2
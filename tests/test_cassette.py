@@ -0,0 +1,62 @@
+from unittest import mock
+
+import pytest
+
+from cbp_client import PublicAPI
+from cbp_client.cassette import Cassette, CassetteMiss
+from cbp_client.mock_server import MockExchange
+
+
+def fetch(api):
+    return (
+        api.price('btc'),
+        list(api.historical_prices('btc-usd', start='2021-01-01', end='2021-03-01',
+                                   candle_interval='HOURLY')),
+        list(api.trades('btc-usd', '2021-05-31T23:00:00')),
+    )
+
+
+def test_strict_replay_runs_offline_without_sleeping(tmp_path):
+    path = tmp_path / 'cassette.sqlite'
+    with MockExchange(order_count=0) as exchange:
+        recording = Cassette(path, mode='record')
+        with mock.patch('time.sleep'):
+            recorded = fetch(PublicAPI(base_url=exchange.url, cassette=recording))
+        url = exchange.url
+    assert recording.stats['recorded'] == len(recording) > 5
+    recording.close()
+
+    replaying = Cassette(path, mode='strict')
+    api = PublicAPI(base_url=url, cassette=replaying)
+    with mock.patch('time.sleep') as sleep:
+        replayed = fetch(api)
+
+    assert replayed == recorded
+    assert replaying.stats['recorded'] == 0
+    assert 0 < replaying.stats['played'] <= len(replaying)
+    sleep.assert_not_called()
+
+
+def test_strict_mode_raises_on_unrecorded_request(tmp_path):
+    api = PublicAPI(base_url='http://localhost:9', cassette=Cassette(
+        tmp_path / 'empty.sqlite', mode='strict'))
+
+    with pytest.raises(CassetteMiss):
+        api.api.get('time')
+
+
+def test_replay_records_misses_and_serves_hits(tmp_path):
+    cassette = Cassette(tmp_path / 'cassette.sqlite')
+    with MockExchange(order_count=0) as exchange:
+        api = PublicAPI(base_url=exchange.url, cassette=cassette)
+        first = api.api.get('products/BTC-USD/ticker').json()
+        second = api.api.get('products/BTC-USD/ticker').json()
+
+        assert first == second
+        assert len(exchange.request_log) == 1
+        assert cassette.stats == {'played': 1, 'recorded': 1}
+
+
+def test_invalid_mode(tmp_path):
+    with pytest.raises(ValueError):
+        Cassette(tmp_path / 'cassette.sqlite', mode='rewind')
@@ -0,0 +1,134 @@
+import csv
+import json
+from datetime import timedelta
+from functools import partial
+
+import pytest
+import requests
+
+from cbp_client.api import API
+from cbp_client.auth import Auth
+from cbp_client.cli import (Checkpoint, build_parser, main, sync_candles,
+                            sync_paginated)
+from cbp_client.mock_server import MockExchange
+from tests.test_mock_server import CREDENTIALS
+
+
+def test_parser_candles():
+    args = build_parser().parse_args([
+        'candles', 'btc-usd', 'eth-usd',
+        '--start', '2021-01-01',
+        '--interval', 'hourly',
+        '--workers', '2'
+    ])
+
+    assert args.product_ids == ['btc-usd', 'eth-usd']
+    assert args.interval == 'HOURLY'
+    assert args.workers == 2
+    assert args.daemon is False
+
+
+def test_parser_requires_command():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args([])
+
+
+def test_checkpoint_resumes(tmp_path):
+    path = tmp_path / 'checkpoint.json'
+    Checkpoint(path).set('candles:BTC-USD:DAILY', '2021-01-01T00:00:00')
+
+    assert Checkpoint(path).get('candles:BTC-USD:DAILY') == '2021-01-01T00:00:00'
+    assert Checkpoint(path).get('missing') is None
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=250) as exchange:
+        yield exchange
+
+
+class InterruptedAPI:
+    """Wraps an API so paginated walks fail after a number of rows"""
+
+    def __init__(self, api, fail_after):
+        self.api = api
+        self.fail_after = fail_after
+
+    def get_paginated_endpoint(self, **kwargs):
+        for i, row in enumerate(self.api.get_paginated_endpoint(**kwargs)):
+            if i == self.fail_after:
+                raise requests.ConnectionError('connection dropped')
+            yield row
+
+
+def test_sync_paginated_resumes_without_duplicates(exchange, tmp_path):
+    api = API(sandbox_mode=False, base_url=exchange.url)
+    auth = Auth(**CREDENTIALS)
+    checkpoint = Checkpoint(tmp_path / 'checkpoint.json')
+    output_path = tmp_path / 'orders.jsonl'
+    start = (exchange.now - timedelta(days=30)).isoformat()
+    sync = partial(sync_paginated, endpoint='orders', key='orders:all',
+                   start=start, output_path=output_path,
+                   checkpoint=checkpoint, params={'status': 'all'})
+
+    with pytest.raises(requests.ConnectionError):
+        sync(InterruptedAPI(api, fail_after=150), auth)
+
+    assert not output_path.exists() or output_path.read_text() == ''
+    assert checkpoint.get('orders:all') is None
+
+    assert sync(api, auth) == 250
+    assert sync(api, auth) == 0
+
+    ids = [json.loads(line)['id'] for line in output_path.read_text().splitlines()]
+    assert len(ids) == len(set(ids)) == 250
+
+
+class ListAPI:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get_paginated_endpoint(self, **kwargs):
+        return iter(self.rows)
+
+
+def test_sync_paginated_keeps_rows_sharing_the_checkpoint_time(tmp_path):
+    checkpoint = Checkpoint()
+    output_path = tmp_path / 'ledger.jsonl'
+    sync = partial(sync_paginated, auth=None, endpoint='ledger', key='ledger',
+                   start='2021-01-01T00:00:00', output_path=output_path,
+                   checkpoint=checkpoint)
+    rows = [{'id': 'a', 'created_at': '2021-01-02T00:00:00Z'},
+            {'id': 'b', 'created_at': '2021-01-01T12:00:00Z'}]
+
+    assert sync(ListAPI(rows)) == 2
+    late = {'id': 'c', 'created_at': '2021-01-02T00:00:00Z'}
+    assert sync(ListAPI([late, *rows])) == 1
+    assert sync(ListAPI([late, *rows])) == 0
+
+    ids = [json.loads(line)['id'] for line in output_path.read_text().splitlines()]
+    assert ids == ['a', 'b', 'c']
+
+
+def test_sync_candles_resumes(exchange, tmp_path):
+    api = API(sandbox_mode=False, base_url=exchange.url)
+    checkpoint = Checkpoint()
+    sync = partial(sync_candles, api, 'BTC-USD', start='2020-01-01',
+                   interval='DAILY', output_dir=tmp_path, checkpoint=checkpoint)
+
+    assert sync(end='2020-01-10') == 10
+    assert sync(end='2020-01-20') == 10
+
+    with (tmp_path / 'btc-usd_daily.csv').open() as f:
+        starts = [row['start'] for row in csv.DictReader(f)]
+
+    assert starts[0] == '2020-01-01T00:00:00'
+    assert starts[-1] == '2020-01-20T00:00:00'
+    assert len(starts) == len(set(starts)) == 20
+
+
+def test_main_exit_code_reports_failures(exchange, tmp_path):
+    argv = ['--output', str(tmp_path), '--base-url', exchange.url, '--rate', '0']
+
+    assert main(['prices', 'btc-usd', *argv]) == 0
+    assert main(['prices', 'btc-usd', 'fake-usd', *argv]) == 1
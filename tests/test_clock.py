@@ -0,0 +1,81 @@
+import time
+from datetime import datetime
+from unittest import mock
+
+import pytest
+import requests
+
+from cbp_client import AuthAPI, PublicAPI
+from cbp_client.api import API
+from cbp_client.clock import ExchangeClock
+from cbp_client.mock_server import MockExchange
+from tests.test_mock_server import CREDENTIALS
+
+
+class DelayedTime:
+    """time endpoint 100 s ahead, answered after one delay per request"""
+
+    def __init__(self, delays):
+        self.delays = iter(delays)
+        self.calls = 0
+
+    def get(self, endpoint, use_cache=True):
+        self.calls += 1
+        time.sleep(next(self.delays))
+        return mock.Mock(json=lambda: {'epoch': time.time() + 100})
+
+
+def test_filter_keeps_lowest_round_trip_sample():
+    api = DelayedTime([0.2, 0.0, 0.1])
+    clock = ExchangeClock(api, samples=3).sync()
+
+    assert clock.offset == pytest.approx(100, abs=0.01)
+    assert clock.uncertainty < 0.01
+    assert clock.time() == pytest.approx(time.time() + 100, abs=0.01)
+
+
+def test_resamples_after_interval():
+    api = DelayedTime([0.0] * 5)
+    clock = ExchangeClock(api, samples=2, resample_interval=0.05)
+
+    clock.time()
+    clock.time()
+    assert api.calls == 2
+    time.sleep(0.06)
+    clock.time()
+    assert api.calls == 3
+
+    with pytest.raises(ValueError):
+        ExchangeClock(api, samples=0)
+
+
+def test_offset_to_mock_exchange():
+    with MockExchange(order_count=0) as exchange:
+        clock = ExchangeClock(API(sandbox_mode=False, base_url=exchange.url)).sync()
+        assert abs((clock.utcnow() - exchange.now).total_seconds()) < 2
+
+
+def test_requests_signed_in_exchange_time():
+    with MockExchange(order_count=10, max_clock_skew=30) as exchange:
+        with pytest.raises(requests.HTTPError, match='timestamp expired'):
+            AuthAPI(CREDENTIALS, base_url=exchange.url)
+
+        api = AuthAPI(CREDENTIALS, base_url=exchange.url, sync_clock=True)
+        for _ in range(10):
+            api.refresh_accounts()
+        assert list(api.orders('2000-01-01'))
+
+        time_requests = [path for _, path in exchange.request_log if path == 'time']
+        assert len(time_requests) == api.clock.samples
+
+
+def test_history_ends_at_exchange_time():
+    with MockExchange(order_count=0) as exchange:
+        api = PublicAPI(base_url=exchange.url, sync_clock=True)
+        with mock.patch('time.sleep'):
+            candles = list(api.historical_prices('btc-usd', start='2021-05-31',
+                                                 candle_interval='HOURLY'))
+
+    assert candles[0].start == '2021-05-31T00:00:00'
+    assert datetime.fromisoformat(candles[-1].start) <= exchange.now
+    assert len(candles) == 24
@@ -0,0 +1,138 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from cbp_client import AuthAPI, PublicAPI
+from cbp_client.deadline import Deadline, DeadlineExceeded, hedged
+from cbp_client.mock_server import MockExchange
+from cbp_client.scheduler import Priority, RequestScheduler
+from tests.test_mock_server import CREDENTIALS
+
+HOURS_IN_FIRST_WINDOW = 300
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=500) as exchange:
+        yield exchange
+
+
+def test_read_timeout(exchange):
+    api = PublicAPI(base_url=exchange.url, timeout=(1, 0.05))
+    exchange.latency = 0.3
+    try:
+        with pytest.raises(requests.Timeout):
+            api.price('btc')
+    finally:
+        exchange.latency = 0.0
+
+
+def test_deadline_yields_windows_fetched_in_time(exchange):
+    api = PublicAPI(base_url=exchange.url)
+    candles = []
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        for candle in api.historical_prices('btc-usd', '2021-01-01', '2021-03-01',
+                                            'HOURLY', deadline=Deadline(0.2)):
+            candles.append(candle)
+
+    assert time.monotonic() - started < 0.3
+    assert len(candles) == HOURS_IN_FIRST_WINDOW
+
+
+def test_cancel_stops_before_next_request(exchange):
+    api = PublicAPI(base_url=exchange.url)
+    deadline = Deadline()
+    trades = api.trades('btc-usd', '2021-05-01', deadline=deadline)
+
+    first = next(trades)
+    threading.Timer(0.02, deadline.cancel).start()
+    rest = []
+    with pytest.raises(DeadlineExceeded, match='cancelled'):
+        rest.extend(trades)
+
+    assert first['trade_id'] > rest[-1]['trade_id']
+    assert len(rest) + 1 == 100
+
+
+def test_list_results_carry_partial_rows(exchange):
+    api = AuthAPI(CREDENTIALS, base_url=exchange.url)
+    everything = api.orders('2000-01-01', settled=True)
+
+    with pytest.raises(DeadlineExceeded) as e:
+        api.orders('2000-01-01', settled=True, deadline=Deadline(0.15))
+
+    assert 0 < len(e.value.partial) < len(everything)
+    assert e.value.partial == everything[:len(e.value.partial)]
+
+
+def test_hedged_request_returns_first_response():
+    calls = itertools.count()
+
+    def send():
+        if next(calls) == 0:
+            time.sleep(0.5)
+            return 'slow'
+        return 'fast'
+
+    with ThreadPoolExecutor(2) as pool:
+        started = time.monotonic()
+        assert hedged(send, 0.05, pool) == 'fast'
+        assert time.monotonic() - started < 0.3
+
+
+def test_hedged_request_raises_when_every_copy_fails():
+    def send():
+        time.sleep(0.1)
+        raise requests.ConnectionError('down')
+
+    with ThreadPoolExecutor(2) as pool:
+        with pytest.raises(requests.ConnectionError):
+            hedged(send, 0.01, pool)
+        with pytest.raises(DeadlineExceeded):
+            hedged(lambda: time.sleep(0.5), 0.01, pool, Deadline(0.05))
+
+
+def test_hedged_request_closes_the_slower_response():
+    class Response:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    responses = [Response(), Response()]
+    calls = itertools.count()
+
+    def send():
+        n = next(calls)
+        if n == 0:
+            time.sleep(0.2)
+        return responses[n]
+
+    with ThreadPoolExecutor(2) as pool:
+        assert hedged(send, 0.05, pool) is responses[1]
+    assert responses[0].closed
+    assert not responses[1].closed
+
+
+def test_hedge_clock_starts_after_admission():
+    scheduler = RequestScheduler(rate=1_000, max_in_flight=1, bulk_reserve=0)
+    with MockExchange(order_count=0) as exchange:
+        api = PublicAPI(base_url=exchange.url, scheduler=scheduler, hedge_after=0.05)
+        api.price('btc')
+        del exchange.request_log[:]
+
+        scheduler.acquire(Priority.TRADING)
+        thread = threading.Thread(target=api.price, args=('btc',))
+        thread.start()
+        time.sleep(0.2)
+        scheduler.release()
+        thread.join(2)
+        api.api.hedge_pool.shutdown(wait=True)
+
+        assert len(exchange.request_log) == 1
@@ -0,0 +1,121 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+from decimal import Decimal
+
+import pytest
+
+from cbp_client.auth import Auth
+from cbp_client.feed import Feed, OrderTracker
+from tests.test_mock_server import CREDENTIALS
+
+PROFILE = {'profile_id': 'p1', 'user_id': 'u1'}
+
+
+def messages(order_id='o1', sequence=10):
+    base = {'product_id': 'BTC-USD', 'side': 'buy', **PROFILE}
+    return [
+        {**base, 'type': 'received', 'order_id': order_id, 'order_type': 'market',
+         'funds': '100', 'sequence': sequence},
+        {**base, 'type': 'match', 'maker_order_id': 'other', 'taker_order_id': order_id,
+         'taker_profile_id': 'p1', 'maker_profile_id': 'p2', 'size': '0.001',
+         'price': '30000', 'trade_id': 1, 'sequence': sequence + 1},
+        {**base, 'type': 'match', 'maker_order_id': 'other', 'taker_order_id': order_id,
+         'taker_profile_id': 'p1', 'maker_profile_id': 'p2', 'size': '0.002',
+         'price': '30100', 'trade_id': 2, 'sequence': sequence + 2},
+        {**base, 'type': 'done', 'order_id': order_id, 'reason': 'filled',
+         'sequence': sequence + 3},
+    ]
+
+
+def test_order_lifecycle_resolves_future():
+    tracker = OrderTracker()
+    future = tracker.track('o1')
+    updates = []
+    tracker.subscribe(lambda state, message: updates.append(state.status))
+
+    for message in messages():
+        assert not future.done()
+        tracker.handle(message)
+
+    state = future.result(timeout=0)
+    assert state.status == 'done' and state.done_reason == 'filled'
+    assert state.filled_size == Decimal('0.003')
+    assert state.executed_value == Decimal('90.2')
+    assert [f['liquidity'] for f in state.fills] == ['T', 'T']
+    assert updates == ['received', 'received', 'received', 'done']
+    assert tracker.state('other') is None
+    assert tracker.wait('o1', timeout=0) is state
+
+
+def test_full_channel_orders_of_others_are_ignored():
+    tracker = OrderTracker()
+    tracker.handle({'type': 'received', 'order_id': 'x', 'product_id': 'BTC-USD'})
+    tracker.handle({'type': 'done', 'order_id': 'x', 'product_id': 'BTC-USD'})
+
+    assert tracker.state('x') is None
+
+
+def test_wait_async_and_sequence_gaps():
+    tracker = OrderTracker()
+
+    async def main():
+        waiter = asyncio.ensure_future(tracker.wait_async('o2'))
+        await asyncio.sleep(0)
+        received, _, match, done = messages('o2', sequence=20)
+        for message in (received, match, done):
+            tracker.handle(message)
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(main()).done
+    assert tracker.gaps == 1
+
+
+def test_subscribe_message_is_signed():
+    auth = Auth(**CREDENTIALS)
+    message = Feed(auth, ['btc-usd'], channels=['user']).subscribe_message()
+
+    expected = hmac.new(base64.b64decode(CREDENTIALS['secret']),
+                        (message['timestamp'] + 'GET/users/self/verify').encode(),
+                        hashlib.sha256)
+    assert message['signature'] == base64.b64encode(expected.digest()).decode()
+    assert message['product_ids'] == ['BTC-USD']
+    assert message['key'] == CREDENTIALS['api_key']
+
+
+def test_feed_dispatch_survives_handler_errors():
+    seen = []
+
+    def broken(message):
+        raise RuntimeError('handler bug')
+
+    feed = Feed(None, ['BTC-USD'], channels=['ticker'], handlers=[broken, seen.append])
+    feed.dispatch({'type': 'ticker'})
+
+    assert seen == [{'type': 'ticker'}]
+    with pytest.raises(ValueError):
+        Feed(None, ['BTC-USD'], channels=['user'])
+
+
+def test_counterparty_of_a_match_is_not_tracked():
+    tracker = OrderTracker()
+    received, match, _, done = messages('o3')
+    del match['maker_profile_id']
+    for message in (received, match, done):
+        tracker.handle(message)
+
+    assert tracker.state('other') is None
+    assert tracker.state('o3').filled_size == Decimal('0.001')
+
+
+def test_finished_orders_are_evicted():
+    tracker = OrderTracker(max_finished=2)
+    for i in range(5):
+        for message in messages(f'o{i}', sequence=10 * i):
+            tracker.handle(message)
+
+    assert tracker._orders == {} and tracker._futures == {}
+    assert list(tracker._finished) == ['o3', 'o4']
+    assert tracker.wait('o4', timeout=0).done
+    assert tracker.state('o0') is None
@@ -0,0 +1,12 @@
+from datetime import datetime
+
+from cbp_client.helpers import parse_time
+
+
+def test_parse_time():
+    expected = datetime(2021, 1, 1, 12, 30, 5)
+
+    assert parse_time('2021-01-01T12:30:05Z') == expected
+    assert parse_time('2021-01-01T12:30:05.000Z') == expected
+    assert parse_time('2021-01-01T12:30:05') == expected
+    assert parse_time('2021-01-01') == datetime(2021, 1, 1)
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from cbp_client.history import History
+from cbp_client.indicators import (
+    ATR, EMA, SMA, VWAP, Indicator, IndicatorSet, Returns, atr, ema, returns,
+    sma, to_columns, vwap
+)
+
+
+def candle(close, high=None, low=None, volume='1'):
+    high = close + 1 if high is None else high
+    low = close - 1 if low is None else low
+    return History.Candle('2021-01-01T00:00:00', str(close), str(high), str(low),
+                          str(close), str(volume))
+
+
+CANDLES = [candle(c, volume=v) for c, v in
+           [(10, 1), (11, 2), (12, 1), (11, 3), (13, 1), (15, 2), (14, 1)]]
+
+
+def test_batch_values():
+    columns = to_columns(CANDLES)
+
+    assert sma(columns.close, 3) == [None, None, 11, 34 / 3, 12, 13, 14]
+    assert ema(columns.close, 3)[2:4] == [11, 11]
+    assert returns(columns.close)[:2] == [None, pytest.approx(0.1)]
+    assert vwap(columns)[1] == pytest.approx((10 + 22) / 3)
+    assert vwap(columns, period=1)[-1] == pytest.approx(14)
+    assert atr(columns, 2)[:3] == [None, 2, 2]
+
+
+def test_gap_counts_in_true_range():
+    indicator = ATR(1)
+    indicator.update(candle(10))
+    assert indicator.update(candle(20)) == 11
+
+
+def test_incremental_matches_batch_after_restore():
+    columns = to_columns(CANDLES)
+    expected = {'sma': sma(columns.close, 3)[-1],
+                'ema': ema(columns.close, 3)[-1],
+                'vwap': vwap(columns, 2)[-1],
+                'atr': atr(columns, 3)[-1],
+                'returns': returns(columns.close, log=True)[-1]}
+
+    live = IndicatorSet(sma=SMA(3), ema=EMA(3), vwap=VWAP(2), atr=ATR(3),
+                        returns=Returns(log=True))
+    live.update_many(CANDLES[:4])
+    restored = IndicatorSet.from_state(json.loads(json.dumps(live.state())))
+
+    assert restored.update_many(CANDLES[4:]) == pytest.approx(expected)
+
+
+def test_invalid_period():
+    with pytest.raises(ValueError):
+        SMA(0)
+
+
+def test_indicator_is_abstract():
+    with pytest.raises(TypeError):
+        Indicator()
+
+
+def test_rolling_sums_do_not_drift():
+    # 1e17 swallows the ones added next to it, so a plain running total
+    # stays off after it leaves the window
+    values = sma([1e17] + [1.0] * 6, 3)
+    assert values[-1] == 1.0
+
+    indicator = VWAP(period=3)
+    indicator.push(1e17, 1e17, 1e17, 1)
+    for _ in range(6):
+        value = indicator.push(1, 1, 1, 1)
+    assert value == 1.0
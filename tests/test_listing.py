@@ -0,0 +1,97 @@
+import calendar
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+
+from cbp_client import PublicAPI
+from cbp_client.api import API
+from cbp_client.history import History
+from cbp_client.listing import ListingDates
+from cbp_client.mock_server import MockExchange
+
+
+@pytest.fixture
+def exchange():
+    with MockExchange(order_count=0) as exchange:
+        yield exchange
+
+
+def test_binary_search_finds_listing_date(exchange):
+    api = API(sandbox_mode=False, base_url=exchange.url)
+    listing, start, end = ListingDates(), datetime(2015, 1, 1), datetime(2021, 6, 1)
+
+    assert listing.find(api, 'ada-usd', start, end) == datetime(2021, 3, 18)
+    assert len(exchange.request_log) <= ListingDates.probes_needed(start, end)
+
+    exchange.request_log.clear()
+    assert listing.find(api, 'ADA-USD', datetime(2016, 1, 1), end) == datetime(2021, 3, 18)
+    assert listing.find(api, 'ADA-USD', datetime(2021, 4, 1), end) == datetime(2021, 4, 1)
+    assert listing.find(api, 'ADA-USD', start, datetime(2020, 1, 1)) is None
+    assert exchange.request_log == []
+
+    assert listing.find(api, 'BTC-USD', datetime(2018, 1, 1), end) == datetime(2018, 1, 1)
+
+
+def test_history_skips_pre_listing_windows(exchange):
+    api = API(sandbox_mode=False, base_url=exchange.url)
+    history = History(product_id='ADA-USD', start='2020-01-01', end='2021-04-01',
+                      interval='HOURLY', api=api)
+    naive_requests = history._requests_needed()
+
+    with mock.patch('time.sleep'):
+        candles = list(history())
+
+    assert naive_requests == 37
+    assert len(exchange.request_log) <= 6
+    assert candles[0].start == '2021-03-18T00:00:00'
+    assert len(candles) == 14 * 24 + 1
+
+
+def test_history_without_skipping(exchange):
+    api = API(sandbox_mode=False, base_url=exchange.url)
+    history = History(product_id='ADA-USD', start='2021-01-01', end='2021-04-01',
+                      interval='DAILY', api=api, skip_unlisted=False)
+
+    with mock.patch('time.sleep'):
+        candles = list(history())
+
+    assert len(exchange.request_log) == 1
+    assert candles[0].start == '2021-03-18T00:00:00'
+
+
+class GappyAPI:
+    """Daily candles from first_day on, except for the days in gap"""
+    base_url = 'gappy'
+
+    def __init__(self, first_day, gap):
+        self.first_day, self.gap = first_day, gap
+
+    def get(self, endpoint, params, priority):
+        start = max(datetime.fromisoformat(params['start']), self.first_day)
+        end = datetime.fromisoformat(params['end'])
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        rows = [[calendar.timegm(day.timetuple())] for day in days
+                if not self.gap[0] <= day < self.gap[1]]
+        return mock.Mock(json=lambda: rows[::-1])
+
+
+def test_gap_without_trades_is_not_taken_for_the_listing():
+    # the first probe window of the search starts inside the gap
+    api = GappyAPI(datetime(2016, 1, 1), (datetime(2018, 3, 1), datetime(2018, 5, 1)))
+    listing = ListingDates()
+
+    assert listing.find(api, 'THIN-USD', datetime(2015, 1, 1),
+                        datetime(2021, 6, 1)) == datetime(2016, 1, 1)
+
+
+def test_listing_dates_are_owned_by_the_client(exchange):
+    api = PublicAPI(base_url=exchange.url)
+    with mock.patch('time.sleep'):
+        list(api.historical_prices('ada-usd', '2020-01-01', '2021-04-01', 'HOURLY'))
+        exchange.request_log.clear()
+        list(api.historical_prices('ada-usd', '2020-01-01', '2021-04-01', 'HOURLY'))
+
+    # the listing date is reused, only the two windows of candles are fetched
+    assert len(exchange.request_log) == 2
+    assert PublicAPI(base_url=exchange.url).listing_dates is not api.listing_dates
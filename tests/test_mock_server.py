@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+import base64
+
+import pytest
+import requests
+
+from cbp_client import AuthAPI, PublicAPI
+from cbp_client.api import API
+from cbp_client.auth import Auth
+from cbp_client.history import History
+from cbp_client.mock_server import MockExchange
+
+
+CREDENTIALS = {
+    'api_key': 'key',
+    'secret': base64.b64encode(b'secret').decode(),
+    'passphrase': 'passphrase'
+}
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=250) as exchange:
+        yield exchange
+
+
+@pytest.fixture
+def mock_public_api(exchange):
+    return PublicAPI(base_url=exchange.url)
+
+
+@pytest.fixture
+def mock_auth_api(exchange):
+    return AuthAPI(CREDENTIALS, base_url=exchange.url)
+
+
+def test_mock_public_endpoints(mock_public_api):
+    api = mock_public_api
+
+    assert api.products(id='BTC-USD')[0].base_currency == 'BTC'
+    assert {c['id'] for c in api.currencies} >= {'USD', 'BTC'}
+    assert float(api.price('btc')) > 0
+    assert set(api.twenty_four_hour_stats('ETH-USD')) == {
+        'open', 'high', 'low', 'volume', 'last', 'volume_30day'}
+    assert datetime.fromisoformat(api.exchange_time())
+
+
+def test_mock_candles_match_history(exchange):
+    api = API(sandbox_mode=False, base_url=exchange.url)
+    candles = list(History(
+        product_id='BTC-USD',
+        start='2020-01-01',
+        end='2020-12-31',
+        interval='DAILY',
+        api=api
+    )())
+
+    assert len(candles) == 366
+    assert candles[0].start == '2020-01-01T00:00:00'
+    assert candles[-1].start == '2020-12-31T00:00:00'
+
+
+def test_mock_candles_limit(exchange):
+    api = API(sandbox_mode=False, base_url=exchange.url)
+
+    with pytest.raises(requests.HTTPError):
+        api.get('products/BTC-USD/candles', params={
+            'granularity': 60, 'start': '2020-01-01', 'end': '2020-01-02'})
+
+
+def test_mock_private_endpoints(exchange, mock_auth_api):
+    api = mock_auth_api
+    start = (exchange.now - timedelta(days=30)).date().isoformat()
+    end = exchange.now.date().isoformat()
+
+    orders = list(api.orders(start_date=start, end_date=end))
+    ledger = list(api.account_history('btc', start_date=start))
+
+    assert len(orders) == 250
+    assert all(o['status'] == 'done' for o in orders)
+    assert ledger and all(e['details']['order_id'] for e in ledger)
+
+    before = float(api.balance('btc'))
+    assert api.market_buy(funds=100, product_id='btc-usd').json()['side'] == 'buy'
+    api.refresh_accounts()
+    assert float(api.balance('btc')) > before
+
+
+def test_mock_requires_auth(exchange):
+    with pytest.raises(requests.HTTPError):
+        API(sandbox_mode=False, base_url=exchange.url).get('accounts')
+
+
+def test_mock_injects_rate_limit():
+    with MockExchange(rate_limit_rate=1.0, order_count=0) as exchange:
+        with pytest.raises(requests.HTTPError, match='429'):
+            API(sandbox_mode=False, base_url=exchange.url).get('products')
+
+
+def test_mock_is_deterministic():
+    payloads = []
+    for _ in range(2):
+        with MockExchange(order_count=20) as exchange:
+            api = API(sandbox_mode=False, base_url=exchange.url)
+            payloads.append([
+                api.get('time').json(),
+                api.get('products/BTC-USD/ticker').json(),
+                api.get('products/ETH-USD/stats').json(),
+                api.get('orders', auth=Auth(**CREDENTIALS)).json(),
+            ])
+
+    assert payloads[0] == payloads[1]
+    assert payloads[0][0]['epoch'] == 1622505600
@@ -0,0 +1,76 @@
+import pytest
+
+from cbp_client import AuthAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.multi import FanOutError, MultiAuthAPI, Tagged
+from tests.test_mock_server import CREDENTIALS
+
+NAMES = ['main', 'hedge', 'savings']
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=120) as exchange:
+        yield exchange
+
+
+@pytest.fixture
+def multi(exchange):
+    with MultiAuthAPI(dict.fromkeys(NAMES, CREDENTIALS), base_url=exchange.url) as multi:
+        yield multi
+
+
+def test_clients_have_own_rate_budget_and_share_products(exchange):
+    before = [path for _, path in exchange.request_log].count('products')
+    with MultiAuthAPI(dict.fromkeys(NAMES, CREDENTIALS), rate=5,
+                      base_url=exchange.url) as multi:
+        limiters = {id(client.api.rate_limiter) for client in multi.clients.values()}
+        assert len(limiters) == len(NAMES)
+        assert all(client.products(id='BTC-USD') for client in multi.clients.values())
+    assert [path for _, path in exchange.request_log].count('products') == before + 1
+
+    with pytest.raises(ValueError):
+        MultiAuthAPI({}, base_url=exchange.url)
+
+
+def test_accounts_are_tagged(multi, exchange):
+    single = AuthAPI(CREDENTIALS, base_url=exchange.url)
+    accounts = list(multi.accounts())
+
+    assert len(accounts) == len(NAMES) * len(single.accounts())
+    assert {tagged.name for tagged in accounts} == set(NAMES)
+    assert multi.balances('btc') == dict.fromkeys(NAMES, single.balance('btc'))
+    assert set(multi.profiles()) == set(NAMES)
+
+
+def test_orders_merged_newest_first(multi, exchange):
+    client = AuthAPI(CREDENTIALS, base_url=exchange.url)
+    single = list(client.orders('2000-01-01'))
+    merged = list(multi.orders('2000-01-01', order_by='created_at'))
+
+    assert len(merged) == len(NAMES) * len(single)
+    created = [tagged.item['created_at'] for tagged in merged]
+    assert created == sorted(created, reverse=True)
+    assert [t.item for t in merged if t.name == 'hedge'] == single
+
+    ledger = list(client.account_history('usd', '2000-01-01'))
+    unordered = list(multi.account_history('usd', '2000-01-01'))
+    assert len(unordered) == len(NAMES) * len(ledger) > 0
+    assert list(multi.account_history('doge', '2000-01-01')) == []
+
+
+def test_failing_client_raises_after_other_rows(multi):
+    def orders(*args):
+        yield {'created_at': '2021-01-01'}
+        raise ConnectionError('down')
+
+    multi.clients['hedge'].orders = orders
+    rows = []
+    with pytest.raises(FanOutError) as e:
+        for tagged in multi.orders('2021-05-01'):
+            rows.append(tagged)
+
+    assert set(e.value.errors) == {'hedge'}
+    assert isinstance(e.value.errors['hedge'], ConnectionError)
+    assert Tagged('hedge', {'created_at': '2021-01-01'}) in rows
+    assert {tagged.name for tagged in rows} == set(NAMES)
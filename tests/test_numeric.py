@@ -0,0 +1,61 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import pytest
+
+from cbp_client import AuthAPI, PublicAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.numeric import Quantizer, to_decimal
+from tests.test_mock_server import CREDENTIALS
+
+
+def test_quantizer_units_round_trip():
+    q = Quantizer('0.00000001')
+
+    assert q.units('0.12345678') == 12_345_678
+    assert q.from_units(12_345_678) == Decimal('0.12345678')
+    assert q.units('0.123456789') == 12_345_678
+    assert q.units('0.123456789', rounding=ROUND_HALF_UP) == 12_345_679
+
+
+def test_quantizer_many():
+    q = Quantizer('0.01')
+
+    assert q.quantize_many(['1.005', '2.999', 3]) == [
+        Decimal('1.00'), Decimal('2.99'), Decimal('3.00')]
+    assert q.units_many(['0.10', '0.2']) == [10, 20]
+    assert q.is_valid('1.23') and not q.is_valid('1.234')
+
+
+def test_quantizer_rejects_bad_increment():
+    with pytest.raises(ValueError):
+        Quantizer('0')
+
+
+def test_to_decimal_avoids_float_error():
+    assert to_decimal(0.1) == Decimal('0.1')
+    assert to_decimal('0.1') + to_decimal('0.2') == Decimal('0.3')
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=0) as exchange:
+        yield exchange
+
+
+def test_decimal_mode(exchange):
+    api = AuthAPI(CREDENTIALS, base_url=exchange.url, numeric='decimal')
+    candles = list(api.historical_prices('btc-usd', start='2020-01-01',
+                                         end='2020-01-03'))
+
+    assert isinstance(api.price('btc'), Decimal)
+    assert isinstance(api.balance('btc'), Decimal)
+    assert all(isinstance(v, Decimal)
+               for v in api.twenty_four_hour_stats('BTC-USD').values())
+    assert len(candles) == 3
+    assert all(isinstance(c.close, Decimal) for c in candles)
+    assert isinstance(PublicAPI(base_url=exchange.url).price('btc'), str)
+
+
+def test_invalid_numeric_mode():
+    with pytest.raises(ValueError):
+        PublicAPI(numeric='float')
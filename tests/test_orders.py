@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+import pytest
+
+from cbp_client import AuthAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.orders import OrderRejected, OrderValidator, build_rules
+from cbp_client.product import Product
+from tests.test_mock_server import CREDENTIALS
+
+
+def product(id_='BTC-USD', **overrides):
+    fields = {
+        'id': id_,
+        'base_min_size': '0.0001',
+        'base_max_size': '100',
+        'base_increment': '0.00000001',
+        'quote_increment': '0.01',
+        'min_market_funds': '10',
+        'max_market_funds': '1000000',
+        'post_only': False,
+        'limit_only': False,
+        'cancel_only': False,
+        'trading_disabled': False,
+        'status': 'online',
+    }
+    fields.update(overrides)
+    return Product(**fields)
+
+
+@pytest.fixture
+def validator():
+    return OrderValidator(lambda: [product(), product('ETH-USD', limit_only=True)])
+
+
+def test_valid_orders_pass_through(validator):
+    assert validator.market_buy('btc-usd', '50.10') == Decimal('50.10')
+    assert validator.market_sell('BTC-USD', 0.5) == Decimal('0.50000000')
+
+
+@pytest.mark.parametrize('funds', ['50.123', '5', '2000000', '-1'])
+def test_invalid_funds_rejected(validator, funds):
+    with pytest.raises(OrderRejected):
+        validator.market_buy('BTC-USD', funds)
+
+
+def test_auto_round(validator):
+    assert validator.market_buy('BTC-USD', '50.129', auto_round=True) == Decimal('50.12')
+    assert validator.market_sell('BTC-USD', '0.123456789', auto_round=True) == \
+        Decimal('0.12345678')
+
+    with pytest.raises(OrderRejected, match='below the minimum'):
+        validator.market_sell('BTC-USD', '0.000099999', auto_round=True)
+
+
+def test_blocked_and_unknown_products(validator):
+    with pytest.raises(OrderRejected, match='limit only'):
+        validator.market_buy('ETH-USD', '50')
+    assert validator.market_buy('DOGE-USD', '50') == '50'
+    assert validator.rules('DOGE-USD') is None
+
+
+def test_rules_rebuilt_for_new_and_changed_products(monkeypatch):
+    listed = [product()]
+    reloads = []
+    validator = OrderValidator(lambda: listed, reload=lambda: reloads.append(1), ttl=60)
+    assert validator.market_buy('BTC-USD', '50') == Decimal('50')
+    assert reloads == []
+
+    # a product listed after the rules were built is found by a reload
+    listed.append(product('SOL-USD'))
+    clock = [0.0]
+    monkeypatch.setattr('cbp_client.orders.time.monotonic', lambda: clock[0])
+    validator._built_at = 0.0
+    clock[0] = 31
+    assert validator.rules('SOL-USD') is not None
+    assert reloads == [1]
+
+    # changes to known products are picked up once the rules expire
+    listed[0] = product(trading_disabled=True)
+    assert validator.market_buy('BTC-USD', '50') == Decimal('50')
+    clock[0] = 31 + 61
+    with pytest.raises(OrderRejected, match='disabled'):
+        validator.market_buy('BTC-USD', '50')
+    assert reloads == [1, 1]
+
+
+def test_build_rules_status():
+    assert build_rules(product(status='delisted')).blocked_reason == 'status is delisted'
+    assert build_rules(product(trading_disabled=True)).blocked_reason == \
+        'trading is disabled'
+
+
+def test_rejected_order_never_reaches_exchange():
+    with MockExchange(order_count=0) as exchange:
+        api = AuthAPI(CREDENTIALS, base_url=exchange.url)
+
+        with pytest.raises(OrderRejected):
+            api.market_buy(funds='1.001', product_id='btc-usd')
+        api.market_buy(funds='1.001', product_id='btc-usd', auto_round=True,
+                       validate=False)
+
+        posts = [path for method, path in exchange.request_log if method == 'POST']
+        assert posts == ['orders']
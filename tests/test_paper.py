@@ -0,0 +1,100 @@
+from array import array
+from decimal import Decimal
+
+import pytest
+
+from cbp_client.history import History
+from cbp_client.indicators import to_columns
+from cbp_client.orders import OrderRejected
+from cbp_client.paper import Backtest, PaperTradingAPI, trade_columns
+from cbp_client.product import Product
+
+
+def candles(start_hour, closes):
+    return to_columns(
+        History.Candle(f'2021-01-01T{start_hour + i:02d}:00:00', c, c, c, c, '1')
+        for i, c in enumerate(closes)
+    )
+
+
+def test_market_orders_charge_fees_and_slippage():
+    paper = PaperTradingAPI({'USD': '1000'}, fee_rate='0.01', slippage='0.02',
+                            numeric='decimal')
+    paper.set_price('btc-usd', 100.0)
+
+    response = paper.market_buy('101', 'btc-usd')
+    response.raise_for_status()
+    buy = response.json()
+    assert response.status_code == 200 and buy == paper.fills[0]
+    assert Decimal(buy['fill_fees']) == 1
+    assert paper.balance('btc') == Decimal(100) / Decimal(102)
+    assert paper.balance('usd') == 899
+
+    paper.set_price('BTC-USD', 200.0)
+    sell = paper.market_sell(paper.balance('btc'), 'BTC-USD').json()
+    proceeds = Decimal(100) / Decimal(102) * 196
+    assert Decimal(sell['executed_value']) == pytest.approx(proceeds)
+    assert paper.balance('BTC') == 0
+    assert paper.balance('usd') == pytest.approx(899 + proceeds * Decimal('0.99'))
+    assert [f['side'] for f in paper.fills] == ['buy', 'sell']
+
+
+def test_rejects_orders_it_cannot_fill():
+    paper = PaperTradingAPI({'USD': 50})
+    with pytest.raises(OrderRejected):
+        paper.market_buy(10, 'BTC-USD')
+    paper.set_price('BTC-USD', 100.0)
+    with pytest.raises(OrderRejected):
+        paper.market_buy(60, 'BTC-USD')
+    with pytest.raises(OrderRejected):
+        paper.market_sell(1, 'BTC-USD')
+    assert paper.balance('usd') == '50'
+
+
+def test_validates_against_product_rules():
+    product = Product(id='BTC-USD', base_currency='BTC', quote_currency='USD',
+                      base_increment='0.0001', quote_increment='0.01',
+                      min_market_funds='10', status='online')
+    paper = PaperTradingAPI({'USD': 100}, products=lambda: [product])
+    paper.set_price('BTC-USD', 100.0)
+
+    with pytest.raises(OrderRejected):
+        paper.market_buy(5, 'BTC-USD')
+    paper.market_buy('20.019', 'BTC-USD', auto_round=True)
+    assert paper.balance('USD') == '79.99'
+
+
+def test_backtest_visits_products_in_time_order():
+    data = {
+        'BTC-USD': candles(0, ['100', '110', '120']),
+        'eth-usd': candles(1, ['10', '20']),
+    }
+    paper = PaperTradingAPI({'USD': 1000}, fee_rate=0)
+    seen = []
+
+    def on_bar(product_id, i):
+        seen.append((product_id, i, paper.price(product_id)))
+        if product_id == 'ETH-USD' and i == 0:
+            paper.market_buy(100, product_id)
+
+    Backtest(paper, data).run(on_bar)
+
+    assert seen == [('BTC-USD', 0, 100.0), ('BTC-USD', 1, 110.0), ('ETH-USD', 0, 10.0),
+                    ('BTC-USD', 2, 120.0), ('ETH-USD', 1, 20.0)]
+    assert paper.fills[0]['done_at'] == '2021-01-01T01:00:00Z'
+    assert paper.balance('eth') == '10'
+    assert paper.value('usd') == 1100
+
+
+def test_backtest_over_trades():
+    trades = [
+        {'time': '2021-05-31T23:59:10Z', 'price': '12', 'size': '1'},
+        {'time': '2021-05-31T23:59:00Z', 'price': '10', 'size': '1'},
+    ]
+    columns = trade_columns(trades)
+    assert columns.price == array('d', [10, 12])
+
+    paper = PaperTradingAPI({'USD': 100}, fee_rate=0)
+    Backtest(paper, {'BTC-USD': columns}).run(
+        lambda product_id, i: i == 0 and paper.market_buy(50, product_id))
+    assert paper.value('USD') == 110
@@ -0,0 +1,40 @@
+from array import array
+from unittest import mock
+
+import pytest
+
+from cbp_client.api import API
+from cbp_client.history import History
+from cbp_client.mock_server import MockExchange
+from cbp_client.parallel import ParallelBackfill, decode_candles
+
+
+@pytest.fixture(scope='module')
+def api():
+    with MockExchange(order_count=0) as exchange:
+        yield API(sandbox_mode=False, base_url=exchange.url)
+
+
+def test_decode_candles_is_oldest_first():
+    packed = decode_candles(b'[[120, 1, 4, 2, 3, 5], [60, 1.5, 2, 1.5, 2, 0.5]]')
+
+    assert array('d', packed).tolist() == [60, 1.5, 2, 1.5, 2, 0.5,
+                                           120, 2, 4, 1, 3, 5]
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_matches_history(api, processes):
+    backfill = ParallelBackfill(api, threads=4, processes=processes)
+    arrays = backfill.run(['btc-usd', 'eth-usd'], start='2021-01-01',
+                          end='2021-02-15T00:00:00', interval='HOURLY')
+
+    with mock.patch('time.sleep'):
+        expected = list(History(product_id='ETH-USD', start='2021-01-01',
+                                end='2021-02-15T00:00:00', interval='HOURLY',
+                                api=api)())
+
+    eth = arrays['ETH-USD']
+    assert len(eth) == len(expected) == 45 * 24 + 1
+    assert [c.start for c in eth.candles()] == [c.start for c in expected]
+    assert list(eth.columns().close) == [float(c.close) for c in expected]
+    assert len(arrays['BTC-USD']) == len(expected)
@@ -0,0 +1,81 @@
+import multiprocessing
+import time
+
+import pytest
+
+from cbp_client import PublicAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.price_board import FIELDS, PriceBoard, PricePublisher
+
+
+def test_publish_and_read(tmp_path):
+    path = tmp_path / 'board'
+    board = PriceBoard.create(path, ['btc-usd', 'ETH-USD'])
+    reader = PriceBoard.open(path)
+
+    assert reader.product_ids == ['BTC-USD', 'ETH-USD']
+    assert reader.quote('BTC-USD') is None
+
+    board.publish('BTC-USD', price='100.5')
+    board.publish('btc-usd', stats={'open': '90', 'high': '110', 'low': '80',
+                                    'volume': '5', 'last': '101'})
+    quote = reader.quote('btc-usd')
+    assert (quote.price, quote.open, quote.last, quote.volume_30day) == ('100.5', '90', '101', None)
+    assert reader.stats('BTC-USD')['high'] == '110'
+    assert reader.price('ETH-USD') is None
+    assert reader.price('LTC-USD') is None
+
+    with pytest.raises(ValueError):
+        board.publish('BTC-USD', price='1' * 33)
+
+
+def test_stale_quotes_are_missing(tmp_path):
+    board = PriceBoard.create(tmp_path / 'board', ['BTC-USD'], max_age=0.05)
+    board.publish('BTC-USD', price='1')
+    assert board.price('BTC-USD') == '1'
+    time.sleep(0.06)
+    assert board.price('BTC-USD') is None
+
+
+def rewrite(path, seconds):
+    board = PriceBoard(path, writable=True)
+    stop = time.monotonic() + seconds
+    i = 0
+    while time.monotonic() < stop:
+        board.publish('BTC-USD', price=str(i), stats={f: str(i) for f in FIELDS})
+        i += 1
+
+
+def test_reads_never_see_half_a_write(tmp_path):
+    path = str(tmp_path / 'board')
+    board = PriceBoard.create(path, ['BTC-USD'])
+    board.publish('BTC-USD', price='0', stats={f: '0' for f in FIELDS})
+    writer = multiprocessing.get_context('spawn').Process(target=rewrite, args=(path, 1.5))
+    writer.start()
+
+    reader = PriceBoard.open(path)
+    values, reads = set(), 0
+    while writer.is_alive():
+        quote = reader.quote('BTC-USD')
+        assert len({getattr(quote, f) for f in FIELDS}) == 1
+        values.add(quote.price)
+        reads += 1
+    writer.join()
+
+    assert len(values) > 10
+
+
+def test_public_api_reads_prices_from_board(tmp_path):
+    with MockExchange(order_count=0) as exchange:
+        board = PriceBoard.create(tmp_path / 'board', ['BTC-USD', 'ETH-USD'])
+        PricePublisher(PublicAPI(base_url=exchange.url), board).publish_once()
+        published = len(exchange.request_log)
+
+        api = PublicAPI(base_url=exchange.url,
+                        price_board=PriceBoard.open(tmp_path / 'board'))
+        assert api.price('btc') == PublicAPI(base_url=exchange.url).price('btc')
+        assert api.twenty_four_hour_stats('ETH-USD')['last']
+        assert len(exchange.request_log) == published + 1
+
+        api.price('ltc')
+        assert len(exchange.request_log) == published + 2
@@ -0,0 +1,138 @@
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from cbp_client import AuthAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.reconcile import Reconciler
+from tests.test_mock_server import CREDENTIALS
+
+
+def order(id_, side, size, value, fee, done_at):
+    return {'id': id_, 'product_id': 'BTC-USD', 'side': side, 'status': 'done',
+            'filled_size': size, 'executed_value': value, 'fill_fees': fee,
+            'created_at': done_at, 'done_at': done_at}
+
+
+def legs(id_, side, size, value, fee, created_at):
+    sign = 1 if side == 'buy' else -1
+    details = {'order_id': id_, 'trade_id': id_, 'product_id': 'BTC-USD'}
+
+    def entry(amount, type_='match'):
+        return {'amount': str(amount), 'type': type_, 'created_at': created_at,
+                'details': details}
+
+    return [('BTC', entry(sign * Decimal(size))),
+            ('USD', entry(-sign * Decimal(value))),
+            ('USD', entry(-Decimal(fee), 'fee'))]
+
+
+TRADES = [
+    ('1', 'buy', '1', '100', '1', '2021-01-05T00:00:00.000Z'),
+    ('2', 'buy', '1', '200', '1', '2021-01-20T00:00:00Z'),
+    ('3', 'sell', '1', '250', '2', '2021-02-01T00:00:00.5Z'),
+]
+
+
+def test_realized_pnl_and_fees_per_period():
+    reconciler = Reconciler(period='month', ascending=True)
+    for trade in TRADES:
+        for currency, entry in legs(*trade):
+            reconciler.add_ledger_entry(entry, currency)
+        reconciler.add_order(order(*trade))
+    reconciler.finish()
+
+    january = reconciler.totals[('BTC-USD', '2021-01')]
+    february = reconciler.totals[('BTC-USD', '2021-02')]
+    assert january['fees'] == 2 and january['buy_value'] == 300
+    # average cost of the sold coin is (100 + 1 + 200 + 1) / 2
+    assert february['realized_pnl'] == Decimal(250 - 2 - 151)
+    assert reconciler.positions['BTC-USD'] == (1, 151)
+    assert reconciler.unmatched() == {'orders': [], 'ledger': []}
+
+
+def test_descending_streams_book_in_trade_order():
+    reconciler = Reconciler(period='year')
+    reconciler.reconcile(
+        [order(*trade) for trade in reversed(TRADES)],
+        {'BTC': [e for t in reversed(TRADES) for c, e in legs(*t) if c == 'BTC'],
+         'USD': [e for t in reversed(TRADES) for c, e in legs(*t) if c == 'USD']}
+    )
+
+    assert reconciler.summary()['BTC-USD']['realized_pnl'] == 97
+
+
+def test_pending_records_are_bounded():
+    reconciler = Reconciler(max_pending=2)
+    for trade in TRADES:
+        reconciler.add_order(order(*trade))
+
+    assert reconciler.unmatched()['orders'] == ['2', '3']
+    assert reconciler.dropped == 1
+
+
+def test_invalid_period():
+    with pytest.raises(ValueError):
+        Reconciler(period='week')
+
+
+def test_incremental_sync_against_mock():
+    with MockExchange(order_count=40) as exchange:
+        api = AuthAPI(CREDENTIALS, base_url=exchange.url)
+        expected_fees = sum(Decimal(o['fill_fees'])
+                            for o in exchange.data.orders)
+
+        reconciler = Reconciler()
+        reconciler.sync(api, start_date='2021-01-01')
+        summary = reconciler.summary()
+
+        assert reconciler.unmatched() == {'orders': [], 'ledger': []}
+        assert sum(t['fills'] for t in summary.values()) == 40
+        assert sum(t['fees'] for t in summary.values()) == expected_fees
+
+        api.market_buy(funds=100, product_id='eth-usd')
+        resumed = Reconciler.from_state(json.loads(json.dumps(reconciler.state())))
+        resumed.sync(api, start_date='2021-01-01')
+
+        assert sum(t['fills'] for t in resumed.summary().values()) == 41
+        assert resumed.summary('eth-usd')['ETH-USD']['bought'] > 0
+
+
+class LedgerAPI:
+    """Serves fixed ledgers, filtering by start_date like the exchange"""
+
+    def __init__(self, ledgers):
+        self.ledgers = ledgers
+
+    def orders(self, start_date):
+        return []
+
+    def accounts(self):
+        return [SimpleNamespace(currency=c) for c in self.ledgers]
+
+    def account_history(self, currency, start_date):
+        return [e for e in self.ledgers[currency] if e['created_at'] >= start_date]
+
+
+def match(order_id, created_at):
+    return {'type': 'match', 'amount': '1', 'created_at': created_at,
+            'details': {'order_id': order_id, 'product_id': 'BTC-USD'}}
+
+
+def test_each_ledger_keeps_its_own_watermark():
+    ledgers = {'BTC': [match('a', '2021-03-01T10:00:00.000Z')],
+               'USD': [match('a', '2021-03-01T09:00:00.000Z')]}
+    reconciler = Reconciler()
+    reconciler.sync(LedgerAPI(ledgers), start_date='2021-01-01')
+
+    assert reconciler.watermarks['ledger:USD'] == '2021-03-01T09:00:00.000Z'
+
+    # USD posts an entry older than the newest BTC entry
+    ledgers['USD'].insert(0, match('b', '2021-03-01T09:30:00.000Z'))
+    resumed = Reconciler.from_state(json.loads(json.dumps(reconciler.state())))
+    resumed.sync(LedgerAPI(ledgers), start_date='2021-01-01')
+
+    assert 'b' in resumed.unmatched()['ledger']
+    assert resumed.watermarks['ledger:USD'] == '2021-03-01T09:30:00.000Z'
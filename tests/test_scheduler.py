@@ -0,0 +1,115 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from cbp_client import PublicAPI
+from cbp_client.deadline import Deadline, DeadlineExceeded
+from cbp_client.mock_server import MockExchange
+from cbp_client.scheduler import Priority, RequestScheduler
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def start(scheduler, priority, admitted):
+    def run():
+        with scheduler.slot(priority):
+            admitted.append(priority)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_urgent_requests_are_admitted_first():
+    scheduler = RequestScheduler(rate=1_000, max_in_flight=1, bulk_reserve=0)
+    admitted, threads = [], []
+    scheduler.acquire(Priority.TRADING)
+
+    for priority in (Priority.BULK, Priority.BULK, Priority.INTERACTIVE, Priority.TRADING):
+        threads.append(start(scheduler, priority, admitted))
+        wait_for(lambda: sum(s.waiting for s in scheduler.stats().values()) == len(threads))
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(2)
+
+    assert admitted == [Priority.TRADING, Priority.INTERACTIVE, Priority.BULK, Priority.BULK]
+    stats = scheduler.stats()
+    assert stats[Priority.BULK].admitted == 2
+    assert stats[Priority.BULK].max_wait >= stats[Priority.TRADING].max_wait
+
+
+def test_bulk_leaves_reserved_slots_free():
+    scheduler = RequestScheduler(rate=1_000, max_in_flight=2, bulk_reserve=1)
+    admitted = []
+    scheduler.acquire(Priority.BULK)
+
+    bulk = start(scheduler, Priority.BULK, admitted)
+    wait_for(lambda: scheduler.stats()[Priority.BULK].waiting == 1)
+    start(scheduler, Priority.INTERACTIVE, admitted).join(2)
+    assert admitted == [Priority.INTERACTIVE]
+
+    scheduler.release()
+    bulk.join(2)
+    assert admitted == [Priority.INTERACTIVE, Priority.BULK]
+
+
+def test_rate_is_shared_by_all_classes():
+    scheduler = RequestScheduler(rate=50, burst=1, bulk_reserve=0)
+    started = time.monotonic()
+    for priority in (Priority.BULK, Priority.TRADING, Priority.INTERACTIVE) * 2:
+        with scheduler.slot(priority):
+            pass
+    assert time.monotonic() - started >= 5 / 50 * 0.9
+
+    with pytest.raises(ValueError):
+        RequestScheduler(rate=0)
+    with pytest.raises(ValueError):
+        RequestScheduler(rate=1, max_in_flight=1, bulk_reserve=1)
+    with pytest.raises(ValueError):
+        RequestScheduler(rate=10, burst=1, bulk_reserve=1)
+
+
+def test_default_burst_admits_bulk():
+    scheduler = RequestScheduler(rate=1)
+    admitted = []
+    start(scheduler, Priority.BULK, admitted).join(2)
+    assert admitted == [Priority.BULK]
+
+
+def test_queued_acquire_gives_up_at_deadline():
+    scheduler = RequestScheduler(rate=1_000, max_in_flight=1, bulk_reserve=0)
+    scheduler.acquire(Priority.TRADING)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        scheduler.acquire(Priority.INTERACTIVE, Deadline(0.1))
+    assert time.monotonic() - started < 1
+    assert scheduler.stats()[Priority.INTERACTIVE].waiting == 0
+
+    scheduler.release()
+    admitted = []
+    start(scheduler, Priority.BULK, admitted).join(2)
+    assert admitted == [Priority.BULK]
+
+
+def test_api_requests_take_their_class():
+    scheduler = RequestScheduler(rate=1_000, max_in_flight=4)
+    with MockExchange(order_count=0) as exchange:
+        api = PublicAPI(base_url=exchange.url, scheduler=scheduler)
+        with mock.patch('time.sleep') as sleep:
+            api.price('btc')
+            list(api.historical_prices('btc-usd', start='2021-01-01', end='2021-03-01',
+                                       candle_interval='HOURLY'))
+        sleep.assert_not_called()
+
+    stats = scheduler.stats()
+    assert stats[Priority.INTERACTIVE].admitted >= 1
+    assert stats[Priority.BULK].admitted >= 5
+    assert stats[Priority.TRADING].admitted == 0
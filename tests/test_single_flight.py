@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cbp_client import PublicAPI
+from cbp_client.api import API
+from cbp_client.cache import ResponseCache
+from cbp_client.mock_server import MockExchange
+from cbp_client.single_flight import SingleFlight
+
+
+class Response:
+    def __init__(self, value):
+        self.value = value
+
+
+def slow_send(calls, delay=0.1):
+    def send():
+        calls.append(1)
+        time.sleep(delay)
+        return Response(len(calls))
+    return send
+
+
+def test_concurrent_calls_share_one_request():
+    flight, calls = SingleFlight(), []
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(
+            lambda _: flight.do('time', {}, None, slow_send(calls)), range(8)))
+
+    assert len(calls) == 1
+    assert {r.value for r in results} == {1}
+    assert len({id(r) for r in results}) == 8
+    assert flight.stats == {'sent': 1, 'shared': 7}
+    assert len(flight) == 0
+
+
+def test_different_params_are_not_shared():
+    flight, calls = SingleFlight(), []
+
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(lambda p: flight.do('candles', {'start': p}, None,
+                                          slow_send(calls)), ['a', 'b']))
+
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_caller():
+    flight, started = SingleFlight(), threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError('boom')
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, 'time', {}, None, fail)
+        started.wait()
+        follower = pool.submit(flight.do, 'time', {}, None, fail)
+
+        for future in (leader, follower):
+            with pytest.raises(ValueError, match='boom'):
+                future.result()
+    assert flight.stats['sent'] == 1
+
+
+def test_window_shares_completed_responses():
+    flight, calls = SingleFlight(window=0.2), []
+
+    flight.do('time', {}, None, slow_send(calls, 0))
+    flight.do('time', {}, None, slow_send(calls, 0))
+    time.sleep(0.25)
+    flight.do('time', {}, None, slow_send(calls, 0))
+
+    assert len(calls) == 2
+
+
+def test_public_api_price_burst():
+    with MockExchange(order_count=0, latency=0.1) as exchange:
+        api = PublicAPI(base_url=exchange.url, single_flight=SingleFlight())
+        with ThreadPoolExecutor(16) as pool:
+            prices = list(pool.map(lambda _: api.price('btc'), range(16)))
+
+        assert len(set(prices)) == 1
+        assert exchange.request_log == [('GET', 'products/BTC-USD/ticker')]
+
+
+def test_cache_bypass_and_base_url_get_their_own_flight():
+    with MockExchange(order_count=0, latency=0.1) as exchange:
+        api = API(sandbox_mode=False, base_url=exchange.url,
+                  cache=ResponseCache(), single_flight=SingleFlight())
+        with ThreadPoolExecutor(2) as pool:
+            cached = pool.submit(api.get, 'time')
+            time.sleep(0.02)
+            fresh = pool.submit(api.get, 'time', use_cache=False)
+            cached, fresh = cached.result(), fresh.result()
+
+        assert api.single_flight.stats == {'sent': 2, 'shared': 0}
+        assert len(exchange.request_log) == 2
+
+        shared = [api.single_flight.do('x', {}, None, lambda: cached) for _ in range(2)]
+        shared[0].headers['X-Seen'] = '1'
+        assert 'X-Seen' not in shared[1].headers and 'X-Seen' not in cached.headers
+        assert shared[0].json() == shared[1].json() == cached.json()
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from cbp_client import AuthAPI, PublicAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.streaming import StreamStats, iter_array
+from tests.test_mock_server import CREDENTIALS
+
+ROWS = [{'id': 1, 'note': 'quote "]" inside', 'sizes': [1, 2]}, [3, 4], 5.5, 'é', None]
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=450, compress=True) as exchange:
+        yield exchange
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 64, 4096])
+def test_rows_split_across_any_chunks(chunk_size):
+    payload = json.dumps(ROWS, ensure_ascii=False, indent=1).encode()
+    chunks = (payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size))
+
+    assert list(iter_array(chunks)) == ROWS
+
+
+def test_rows_yielded_before_array_ends():
+    rows = iter_array(iter([b'[{"a": 1}, {"b"', b': 2}, 12', b'3]']))
+
+    assert next(rows) == {'a': 1}
+    assert next(rows) == {'b': 2}
+    assert list(rows) == [123]
+
+
+@pytest.mark.parametrize('payload', [b'{"a": 1}', b'[1, 2', b'[1] 2'])
+def test_rejects_anything_but_one_array(payload):
+    with pytest.raises(ValueError):
+        list(iter_array([payload]))
+
+
+def test_streamed_pages_match_whole_pages(exchange):
+    whole = AuthAPI(CREDENTIALS, base_url=exchange.url)
+    streamed = AuthAPI(CREDENTIALS, base_url=exchange.url, streaming=True)
+
+    expected = list(whole.orders('2000-01-01'))
+    assert list(streamed.orders('2000-01-01')) == expected
+
+    stats = streamed.api.stream_stats
+    assert stats.responses == 6 and stats.rows == len(expected) == 450
+    assert stats.bytes_on_wire < stats.bytes_decoded / 3
+    assert 0 < stats.mean_time_to_first_row < 1
+
+
+def test_stopping_early_releases_the_connection(exchange):
+    api = PublicAPI(base_url=exchange.url, streaming=True)
+    trades = api.trades('btc-usd', '2021-05-01')
+    first = [next(trades) for _ in range(3)]
+    trades.close()
+
+    assert api.api.stream_stats.rows == 3
+    assert next(api.trades('btc-usd', '2021-05-01')) == first[0]
+
+
+def test_iter_rows_of_any_array_endpoint(exchange):
+    api = PublicAPI(base_url=exchange.url)
+    products = list(api.api.iter_rows('products'))
+
+    assert products == api.api.get('products').json()
+    assert isinstance(api.api.stream_stats, StreamStats)
+    assert api.api.stream_stats.rows == len(products)
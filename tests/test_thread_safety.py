@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from cbp_client import AuthAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.rate_limit import RateLimiter
+from tests.test_mock_server import CREDENTIALS
+
+
+@pytest.fixture(scope='module')
+def exchange():
+    with MockExchange(order_count=0) as exchange:
+        yield exchange
+
+
+def test_shared_client_under_many_threads(exchange):
+    api = AuthAPI(CREDENTIALS, base_url=exchange.url)
+    symbols = ['BTC', 'ETH', 'LTC', 'USD']
+
+    def work(i):
+        if i % 10 == 0:
+            api.refresh_accounts()
+        accounts = api.accounts()
+        assert {a.currency for a in accounts} >= set(symbols)
+        assert Decimal(api.balance(symbols[i % len(symbols)])) >= 0
+        assert api.products(id='BTC-USD')
+        return Decimal(api.price('btc'))
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        prices = list(pool.map(work, range(400)))
+
+    assert len(prices) == 400
+    assert len(set(prices)) == 1
+    # products are loaded exactly once no matter how many threads race
+    assert sum(1 for _, path in exchange.request_log if path == 'products') == 1
+
+
+def test_rate_limiter_shared_between_threads():
+    limiter = RateLimiter(rate=200, burst=10)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        admitted = list(pool.map(lambda _: (limiter.acquire(), time.monotonic())[1],
+                                 range(70)))
+    elapsed = time.monotonic() - start
+
+    # 10 tokens up front, the other 60 at 200 per second
+    assert 0.28 <= elapsed < 1.5
+    after_burst = sorted(admitted)[10:]
+    assert len(after_burst) / (after_burst[-1] - start) <= 200 * 1.1
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from cbp_client import AuthAPI
+from cbp_client.mock_server import MockExchange
+from cbp_client.product import Product
+from cbp_client.valuation import PortfolioValuation, conversion_routes
+from tests.test_mock_server import CREDENTIALS
+
+
+def product(id_, live=True):
+    base, quote = id_.split('-')
+    return Product(id=id_, base_currency=base, quote_currency=quote, live=live)
+
+
+PRODUCTS = [product('BTC-USD'), product('ETH-BTC'), product('XLM-ETH'),
+            product('USDC-USD'), product('DOGE-USD', live=False)]
+
+
+def test_routes_use_indirect_pairs():
+    routes = conversion_routes(PRODUCTS, 'usd')
+
+    assert routes['USD'] == []
+    assert routes['BTC'] == [('BTC-USD', True)]
+    assert routes['XLM'] == [('XLM-ETH', True), ('ETH-BTC', True), ('BTC-USD', True)]
+    assert 'DOGE' not in routes
+
+    assert conversion_routes(PRODUCTS, 'BTC')['USD'] == [('BTC-USD', False)]
+
+
+def test_incremental_updates():
+    valuation = PortfolioValuation(PRODUCTS)
+    valuation.set_balances({'btc': '2', 'eth': '10', 'usd': '100.5', 'doge': '7'})
+
+    assert valuation.total == Decimal('100.5')
+    assert valuation.products_needed() == {'BTC-USD', 'ETH-BTC'}
+
+    valuation.set_price('BTC-USD', '30000')
+    valuation.handle_feed_message(
+        {'type': 'ticker', 'product_id': 'ETH-BTC', 'price': '0.05'})
+
+    assert valuation.values() == {'BTC': Decimal('60000'),
+                                  'ETH': Decimal('15000.00'),
+                                  'USD': Decimal('100.5')}
+    assert valuation.total == Decimal('75100.50')
+    assert valuation.unpriced() == {'DOGE'}
+
+    valuation.set_price('BTC-USD', '20000')
+    valuation.set_balance('ETH', 0)
+
+    assert valuation.total == Decimal('40100.5')
+    assert valuation.value('eth') is None
+
+
+def test_valuation_of_mock_accounts():
+    with MockExchange(order_count=0) as exchange:
+        api = AuthAPI(CREDENTIALS, base_url=exchange.url)
+        valuation = PortfolioValuation.from_auth_api(api)
+        valuation.refresh_prices(api)
+
+        expected = sum(
+            Decimal(a.balance) * (1 if a.currency == 'USD' else
+                                  Decimal(api.price(a.currency)))
+            for a in api.accounts() if a.currency in valuation.values()
+        )
+        assert valuation.unpriced() == set()
+        assert abs(valuation.total - expected) < Decimal('0.000001')
+
+        api.market_buy(funds=100, product_id='btc-usd')
+        api.refresh_accounts()
+
+        assert abs(valuation.total - expected) < 1